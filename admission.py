@@ -0,0 +1,238 @@
+"""数据库路由的准入控制与过载保护
+
+连接池只有 maxconn 个连接，突发的仪表盘加载、轮询会占满连接池，之后的请求
+全部走直连，在数据库最吃力的时候成倍增加负载。这里在访问数据库的路由前加一道闸：
+
+- 全局并发上限 ADMISSION_CAPACITY（小于连接池大小），每个路由可再单独限流
+- 超出时进入有界等待队列，按优先级出队：写入 > 普通查询 > 后台轮询
+- 队列已满时，高优先级请求挤掉队尾的低优先级请求
+- 排不上队、等待超时或被挤掉的请求立即返回 503 + Retry-After
+
+用法：
+
+    @order_bp.route('/api/add', methods=['POST'])
+    @admit(PRIORITY_WRITE)
+    def add_order(): ...
+"""
+import heapq
+import itertools
+import threading
+import time
+from functools import wraps
+
+from flask import jsonify, request
+
+from metrics import metrics
+
+# 优先级：数值越小越先出队
+PRIORITY_WRITE = 0
+PRIORITY_READ = 1
+PRIORITY_POLL = 2
+
+PRIORITY_NAMES = {PRIORITY_WRITE: 'write', PRIORITY_READ: 'read', PRIORITY_POLL: 'poll'}
+
+
+class Overloaded(Exception):
+    """请求被拒绝（reason: queue_full / timeout / evicted）"""
+
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class _Waiter:
+    __slots__ = ('priority', 'seq', 'key', 'limit', 'granted', 'evicted')
+
+    def __init__(self, priority, seq, key, limit):
+        self.priority = priority
+        self.seq = seq
+        self.key = key
+        self.limit = limit
+        self.granted = False
+        self.evicted = False
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class AdmissionController:
+    """全局并发 + 路由并发限制，带优先级的有界等待队列"""
+
+    def __init__(self, capacity=8, queue_size=32, timeout=3.0):
+        self.capacity = capacity
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        self._active = 0
+        self._active_by_key = {}
+        self._waiting = []
+        self._seq = itertools.count()
+
+    def configure(self, capacity, queue_size, timeout):
+        with self._cond:
+            self.capacity = capacity
+            self.queue_size = queue_size
+            self.timeout = timeout
+            self._grant()
+
+    def _can_run(self, key, limit):
+        if self._active >= self.capacity:
+            return False
+        return limit is None or self._active_by_key.get(key, 0) < limit
+
+    def _take(self, key):
+        self._active += 1
+        self._active_by_key[key] = self._active_by_key.get(key, 0) + 1
+
+    def _grant(self):
+        """按优先级把空出的名额分给等待中的请求（调用方持有锁）"""
+        if not self._waiting or self._active >= self.capacity:
+            return
+        granted = False
+        for waiter in sorted(self._waiting):
+            if self._active >= self.capacity:
+                break
+            if self._can_run(waiter.key, waiter.limit):
+                self._take(waiter.key)
+                waiter.granted = True
+                granted = True
+        if granted:
+            self._waiting = [waiter for waiter in self._waiting if not waiter.granted]
+            heapq.heapify(self._waiting)
+            self._cond.notify_all()
+
+    def _blocked_by_waiters(self, priority):
+        """是否有同等或更高优先级、且此刻能运行的请求在排队（调用方持有锁）"""
+        return any(
+            waiter.priority <= priority and self._can_run(waiter.key, waiter.limit)
+            for waiter in self._waiting
+        )
+
+    def try_acquire(self, key, priority=PRIORITY_READ, limit=None):
+        """不等待：能直接放行时占用名额并返回 True"""
+        with self._cond:
+            # 有空位、且没有更应该先运行的排队请求时直接放行；
+            # 只因自身路由限流而排队的请求不挡住其他路由
+            if self._can_run(key, limit) and not self._blocked_by_waiters(priority):
+                self._take(key)
+                return True
+            return False
+
+    def acquire(self, key, priority=PRIORITY_READ, limit=None):
+        """获取名额，返回等待的秒数；失败抛出 Overloaded"""
+        with self._cond:
+            if self.try_acquire(key, priority, limit):
+                return 0.0
+
+            if len(self._waiting) >= self.queue_size:
+                # 队列已满：挤掉优先级最低、最晚到达的请求，否则拒绝自己
+                lowest = max(self._waiting)
+                if lowest.priority <= priority:
+                    raise Overloaded('queue_full')
+                self._waiting.remove(lowest)
+                heapq.heapify(self._waiting)
+                lowest.evicted = True
+                self._cond.notify_all()
+
+            waiter = _Waiter(priority, next(self._seq), key, limit)
+            heapq.heappush(self._waiting, waiter)
+            # 全局仍有空位时可能立即轮到（包括自己），不必等下一次 release
+            self._grant()
+            if not waiter.granted:
+                metrics.incr('admission.queued')
+
+            started = time.perf_counter()
+            deadline = time.monotonic() + self.timeout
+            while not waiter.granted and not waiter.evicted:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            if waiter.granted:
+                return time.perf_counter() - started
+            if waiter.evicted:
+                raise Overloaded('evicted')
+            self._waiting.remove(waiter)
+            heapq.heapify(self._waiting)
+            raise Overloaded('timeout')
+
+    def release(self, key):
+        with self._cond:
+            self._active -= 1
+            count = self._active_by_key.get(key, 0) - 1
+            if count > 0:
+                self._active_by_key[key] = count
+            else:
+                self._active_by_key.pop(key, None)
+            self._grant()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'capacity': self.capacity,
+                'active': self._active,
+                'waiting': len(self._waiting),
+                'queue_size': self.queue_size,
+            }
+
+
+admission = AdmissionController()
+
+# 503 响应中建议客户端等待的秒数
+RETRY_AFTER = 1
+
+
+def overloaded_response(reason):
+    response = jsonify({'code': 1, 'msg': '服务繁忙，请稍后重试'})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(RETRY_AFTER)
+    metrics.incr('admission.shed')
+    metrics.incr(f'admission.shed.{reason}')
+    return response
+
+
+def admit(priority=PRIORITY_READ, limit=None):
+    """路由装饰器：获得名额后才执行视图
+
+    limit 为该路由自身的并发上限。流式响应（如 COPY 导出）在响应结束时才归还名额。
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = request.endpoint
+            try:
+                waited = admission.acquire(key, priority, limit)
+            except Overloaded as e:
+                return overloaded_response(e.reason)
+
+            metrics.incr(f'admission.admitted.{PRIORITY_NAMES[priority]}')
+            if waited:
+                metrics.observe('admission.wait', waited)
+
+            try:
+                response = view(*args, **kwargs)
+            except Exception:
+                admission.release(key)
+                raise
+
+            if getattr(response, 'is_streamed', False):
+                response.call_on_close(lambda: admission.release(key))
+            else:
+                admission.release(key)
+            return response
+        # ASGI 模式下异步实现的接口按同一优先级与并发上限准入
+        wrapper.admission = (priority, limit)
+        return wrapper
+    return decorator
+
+
+def init_admission(app):
+    """从配置读取容量、队列长度与等待超时"""
+    global RETRY_AFTER
+    admission.configure(
+        app.config.setdefault('ADMISSION_CAPACITY', 8),
+        app.config.setdefault('ADMISSION_QUEUE_SIZE', 32),
+        app.config.setdefault('ADMISSION_TIMEOUT', 3.0),
+    )
+    RETRY_AFTER = app.config.setdefault('ADMISSION_RETRY_AFTER', 1)
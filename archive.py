@@ -0,0 +1,276 @@
+"""已结束订单归档
+
+order_list / order_service / item 只保留仍在使用的数据：状态为 used / cancel
+且最近一次活动（购买或执行）早于 ARCHIVE_AFTER_DAYS 天的订单，连同其服务与
+执行记录一起移入 *_archive 表。表结构见 db/partition_archive.sql。
+
+每批订单在一个事务中用 DELETE ... RETURNING 直接写入归档表，批量提交，
+避免长事务锁住正式表。多个 worker 同时运行时由 advisory lock 保证只有一个执行。
+
+列表、搜索接口默认只查正式表，请求参数 include_archived=1 时合并归档表；
+仪表盘的累计统计始终合并归档表（archive_available() 为 True 时）。
+
+item 的月分区在应用启动时及每隔 PARTITION_CHECK_INTERVAL 秒提前创建
+（start_partition_scheduler），与是否开启自动归档无关。
+"""
+import threading
+import time
+from datetime import date, timedelta
+
+from bulk_import import TABLE_COLUMNS
+from cache import cache
+from changes import change_log
+from metrics import metrics
+
+# 可归档的订单状态
+ARCHIVE_STATUSES = ['used', 'cancel', 'cancelled']
+
+# 每批归档的订单数
+ARCHIVE_BATCH_SIZE = 500
+
+# 提前创建的 item 分区月数
+PARTITION_MONTHS_AHEAD = 3
+
+# 归档任务的 advisory lock 键
+ARCHIVE_LOCK_ID = 7350001
+
+# 检查 / 创建 item 分区的间隔（秒）
+PARTITION_CHECK_INTERVAL = 6 * 3600
+
+ARCHIVE_TABLES_SQL = "SELECT to_regclass('order_list_archive') IS NOT NULL"
+
+# 是否已执行 db/partition_archive.sql；None 表示尚未检查成功
+_archive_tables = None
+_get_connection = None
+_release = None
+
+COLUMNS = {table: ', '.join(columns) for table, columns in TABLE_COLUMNS.items()}
+
+# 最近活动早于截止日期的已结束订单，跳过被其他事务锁定的行
+CANDIDATES_SQL = """
+    SELECT o.order_id
+    FROM order_list o
+    WHERE o.order_status = ANY(%s)
+      AND o.order_buytime < %s
+      AND NOT EXISTS (
+          SELECT 1 FROM item i WHERE i.record_id = o.order_id AND i.exetime >= %s
+      )
+    ORDER BY o.order_id
+    LIMIT %s
+    FOR UPDATE SKIP LOCKED
+"""
+
+COUNT_SQL = """
+    SELECT COUNT(*)
+    FROM order_list o
+    WHERE o.order_status = ANY(%s)
+      AND o.order_buytime < %s
+      AND NOT EXISTS (
+          SELECT 1 FROM item i WHERE i.record_id = o.order_id AND i.exetime >= %s
+      )
+"""
+
+# (表, 外键列)：order_service 引用 order_list，必须先于订单移动
+MOVE_ORDER = [('item', 'record_id'), ('order_service', 'order_id'), ('order_list', 'order_id')]
+
+MOVE_SQL = {
+    table: f"""
+        WITH moved AS (
+            DELETE FROM {table} WHERE {key} = ANY(%s)
+            RETURNING {COLUMNS[table]}
+        )
+        INSERT INTO {table}_archive ({COLUMNS[table]})
+        SELECT {COLUMNS[table]} FROM moved
+    """
+    for table, key in MOVE_ORDER
+}
+
+
+def wants_archived(args):
+    """请求参数中是否要求包含归档数据"""
+    return str(args.get('include_archived', '')).lower() in ('1', 'true', 'yes')
+
+
+def table_source(table, include_archived=False, alias=None):
+    """FROM 子句中的表：包含归档时为正式表与归档表的 UNION ALL
+
+    alias 为空时以表名作为别名，原查询中的列引用不需要修改
+    """
+    if not include_archived:
+        return f"{table} {alias}" if alias else table
+    columns = COLUMNS[table]
+    return (f"(SELECT {columns} FROM {table} "
+            f"UNION ALL SELECT {columns} FROM {table}_archive) AS {alias or table}")
+
+
+def archive_available():
+    """数据库中是否有归档表（已执行 db/partition_archive.sql），结果在进程内缓存"""
+    global _archive_tables
+    if _archive_tables is None and _get_connection is not None:
+        try:
+            conn = _get_connection()
+            try:
+                cursor = conn.cursor()
+                cursor.execute(ARCHIVE_TABLES_SQL)
+                _archive_tables = cursor.fetchone()[0]
+                cursor.close()
+                conn.rollback()
+            finally:
+                _release(conn)
+        except Exception as e:
+            # 数据库暂时不可用：本次按没有归档表处理，下次再检查
+            print(f"⚠️ Failed to check archive tables: {e}")
+            return False
+    return bool(_archive_tables)
+
+
+def ensure_partitions(conn, months_ahead=PARTITION_MONTHS_AHEAD):
+    """提前创建 item 月分区，返回新建的分区数"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT ensure_item_partitions(CURRENT_DATE, %s)", (months_ahead,))
+        created = cursor.fetchone()[0]
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    metrics.incr('archive.partitions_created', created)
+    return created
+
+
+def count_archivable(conn, older_than_days):
+    """统计可归档的订单数（不做修改）"""
+    cutoff = date.today() - timedelta(days=older_than_days)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(COUNT_SQL, (ARCHIVE_STATUSES, cutoff, cutoff))
+        return cursor.fetchone()[0]
+    finally:
+        cursor.close()
+        conn.rollback()
+
+
+def archive_closed_orders(conn, older_than_days, batch_size=ARCHIVE_BATCH_SIZE):
+    """分批归档已结束的订单，返回各表移动的行数"""
+    started = time.perf_counter()
+    cutoff = date.today() - timedelta(days=older_than_days)
+    report = {'batches': 0, 'order_list': 0, 'order_service': 0, 'item': 0}
+
+    cursor = conn.cursor()
+    try:
+        while True:
+            cursor.execute(CANDIDATES_SQL, (ARCHIVE_STATUSES, cutoff, cutoff, batch_size))
+            order_ids = [row[0] for row in cursor.fetchall()]
+            if not order_ids:
+                conn.rollback()
+                break
+
+            for table, _ in MOVE_ORDER:
+                cursor.execute(MOVE_SQL[table], (order_ids,))
+                report[table] += cursor.rowcount
+            # 归档后的订单从正式表移出，对增量同步的客户端等同于删除
+            change_log.record_orders(cursor, order_ids, deleted=True)
+            conn.commit()
+            report['batches'] += 1
+
+            if len(order_ids) < batch_size:
+                break
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    report['seconds'] = round(time.perf_counter() - started, 2)
+    if report['order_list']:
+        cache.invalidate('orders')
+    metrics.incr('archive.orders', report['order_list'])
+    metrics.incr('archive.items', report['item'])
+    metrics.observe('archive.seconds', report['seconds'])
+    return report
+
+
+def run_archive_job(conn, older_than_days, batch_size=ARCHIVE_BATCH_SIZE):
+    """创建分区并归档；其他进程正在执行时返回 None"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT pg_try_advisory_lock(%s)", (ARCHIVE_LOCK_ID,))
+    locked = cursor.fetchone()[0]
+    conn.commit()
+    if not locked:
+        cursor.close()
+        return None
+
+    try:
+        report = {'partitions_created': ensure_partitions(conn)}
+        report.update(archive_closed_orders(conn, older_than_days, batch_size))
+        return report
+    finally:
+        cursor.execute("SELECT pg_advisory_unlock(%s)", (ARCHIVE_LOCK_ID,))
+        conn.commit()
+        cursor.close()
+
+
+def start_scheduler(get_connection, release, interval, older_than_days,
+                    batch_size=ARCHIVE_BATCH_SIZE):
+    """后台线程每 interval 秒执行一次归档任务"""
+    def loop():
+        while True:
+            conn = None
+            try:
+                conn = get_connection()
+                report = run_archive_job(conn, older_than_days, batch_size)
+                if report and report['order_list']:
+                    print(f"🗄️ Archived {report['order_list']} orders, "
+                          f"{report['item']} items in {report['seconds']}s")
+            except Exception as e:
+                metrics.incr('archive.failed')
+                print(f"❌ Archive job failed: {e}")
+            finally:
+                if conn is not None:
+                    release(conn)
+            time.sleep(interval)
+
+    thread = threading.Thread(target=loop, name='order-archive', daemon=True)
+    thread.start()
+    return thread
+
+
+def start_partition_scheduler(get_connection, release, interval=PARTITION_CHECK_INTERVAL):
+    """后台线程启动时立即、之后每 interval 秒提前创建 item 月分区
+
+    分区用完后新数据会落入 item_default；ensure_item_partitions 会把这些行移入新分区，
+    但默认分区越大移动越慢，因此不依赖（默认关闭的）自动归档来创建分区。
+    """
+    def loop():
+        while True:
+            conn = None
+            try:
+                conn = get_connection()
+                created = ensure_partitions(conn)
+                if created:
+                    print(f"🗄️ Created {created} item partitions")
+            except Exception as e:
+                metrics.incr('archive.partitions_failed')
+                print(f"❌ Failed to create item partitions: {e}")
+            finally:
+                if conn is not None:
+                    release(conn)
+            time.sleep(interval)
+
+    thread = threading.Thread(target=loop, name='item-partitions', daemon=True)
+    thread.start()
+    return thread
+
+
+def init_archive(app, get_connection, release):
+    """检查归档表；存在时启动 item 分区维护线程"""
+    global _get_connection, _release
+    _get_connection = get_connection
+    _release = release
+    if archive_available():
+        start_partition_scheduler(
+            get_connection, release,
+            app.config.setdefault('PARTITION_CHECK_INTERVAL', PARTITION_CHECK_INTERVAL),
+        )
@@ -0,0 +1,656 @@
+"""异步（ASGI）服务模式
+
+order_bp / exeitem_bp 中只读的 JSON 接口在这里用 asyncpg 连接池异步实现，
+URL 与响应格式和同步版本完全一致（共用同一份 SQL 与结果组装函数）；
+其余请求（页面、写接口、导出、登录等）原样转交给 Flask 应用（WsgiToAsgi）。
+服务目录（catalog.py）本身就在进程内存中，同样交给 Flask 应用处理 ETag / 304。
+
+慢查询只占用一个数据库连接，不再占住整个 worker，一个进程即可同时挂起
+大量轮询请求。启动方式：
+
+    uvicorn asgi:app --host 0.0.0.0 --port $PORT
+
+与同步版本一致的保护：
+    - 查询轮流走 READ_DATABASE_URLS 中的只读副本，会话在 READ_YOUR_WRITES_WINDOW
+      秒内写入过时走主库；副本不可用时回退主库
+    - 主库、每个副本各有一个熔断器（DB_BREAKER_* 配置），熔断中直接返回 503
+    - 经过同一个准入控制器（admission.py），优先级与并发上限取自对应的 Flask 视图
+    - 被选中剖析（profiling.py）的请求转交 Flask 应用，在 cProfile 下执行
+
+配置项（环境变量）：
+    ASYNC_POOL_MIN          每个连接池的最小连接数，默认 1
+    ASYNC_POOL_MAX          每个连接池的最大连接数，默认 20
+    ASYNC_ACQUIRE_TIMEOUT   等待空闲连接的最长秒数，超时返回 503，默认 3
+    ASYNC_COMMAND_TIMEOUT   单条查询超时秒数，默认 60
+"""
+import asyncio
+import contextvars
+import itertools
+import os
+import time
+import traceback
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import parse_qsl
+
+import asyncpg
+from asgiref.wsgi import WsgiToAsgi
+from werkzeug.datastructures import MultiDict
+from werkzeug.exceptions import HTTPException
+from werkzeug.http import parse_accept_header, parse_cookie
+
+import admission as admission_module
+import main
+import order_bp
+import exeitem_bp
+from admission import admission, Overloaded, PRIORITY_READ, PRIORITY_NAMES
+from archive import wants_archived, table_source
+from breaker import CircuitBreaker, CircuitOpenError
+from cache import cache
+from compression import negotiate_encoding, compress_bytes
+from metrics import metrics
+from prepared import numbered
+from profiling import profiler, HEADER, MEMORY_HEADER, SAMPLED_KEY
+from row_format import map_rows, parse_fields, select_fields, wants_flag
+
+flask_app = main.app
+
+POOL_MIN = int(os.environ.get('ASYNC_POOL_MIN', 1))
+POOL_MAX = int(os.environ.get('ASYNC_POOL_MAX', 20))
+ACQUIRE_TIMEOUT = float(os.environ.get('ASYNC_ACQUIRE_TIMEOUT', 3))
+COMMAND_TIMEOUT = float(os.environ.get('ASYNC_COMMAND_TIMEOUT', 60))
+
+# 批量取执行记录（started_items / to_use_services 一次取完，不再逐个订单查询）
+ITEMS_FOR_ORDERS_SQL = """
+    SELECT record_id, service_id, item_id, item_name, item_price, exetime, item_remark
+    FROM item
+    WHERE record_id = ANY(%s)
+    ORDER BY exetime DESC
+"""
+
+
+class Busy(Exception):
+    """等待数据库连接超时或数据库不可用"""
+
+
+# 当前请求是否可以走只读副本（handle 中按会话设置，gather / 缓存加载继承）
+_use_replica = contextvars.ContextVar('use_replica', default=True)
+
+# 连接断开类异常：计入熔断器
+CONNECTION_ERRORS = (OSError, asyncpg.PostgresConnectionError, asyncpg.ConnectionDoesNotExistError)
+
+
+# ==================== 连接池 ====================
+def _url(database_url):
+    """asyncpg 只接受 URL 形式的连接串"""
+    return main.normalize_database_url(database_url)
+
+
+def _dsn():
+    database_url = os.environ.get('DATABASE_URL')
+    if not database_url:
+        return "postgresql://postgres@localhost:5432/plorder"
+    return _url(database_url)
+
+
+def _read_dsns():
+    """只读副本连接串，与同步版本共用 READ_DATABASE_URLS"""
+    return [_url(url.strip()) for url in os.environ.get('READ_DATABASE_URLS', '').split(',') if url.strip()]
+
+
+def _new_breaker(name):
+    return CircuitBreaker(
+        name,
+        failure_threshold=int(os.environ.get('DB_BREAKER_THRESHOLD', 3)),
+        base_delay=float(os.environ.get('DB_BREAKER_BASE_DELAY', 1)),
+        max_delay=float(os.environ.get('DB_BREAKER_MAX_DELAY', 60)),
+    )
+
+
+class _Target:
+    """一个数据库（主库或只读副本）：连接池第一次使用时创建，熔断器保护建池与取连接"""
+
+    def __init__(self, name, dsn):
+        self.name = name
+        self.dsn = dsn
+        self.breaker = _new_breaker(f'async_{name}')
+        self.pool = None
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        """返回连接；熔断中、连接失败或等待超时抛出 Busy"""
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError as e:
+            metrics.incr('asgi.breaker_open')
+            raise Busy() from e
+        try:
+            if self.pool is None:
+                async with self.lock:
+                    if self.pool is None:
+                        self.pool = await asyncpg.create_pool(
+                            self.dsn,
+                            min_size=POOL_MIN,
+                            max_size=POOL_MAX,
+                            command_timeout=COMMAND_TIMEOUT,
+                        )
+                        print(f"✅ Async database pool created: {self.name} (max {POOL_MAX})")
+            conn = await self.pool.acquire(timeout=ACQUIRE_TIMEOUT)
+        except asyncio.TimeoutError:
+            # 连接池耗尽，数据库本身正常
+            self.breaker.record_success()
+            metrics.incr('asgi.acquire_timeout')
+            raise Busy()
+        except (OSError, asyncpg.PostgresError) as e:
+            self.breaker.record_failure(e)
+            metrics.incr('asgi.connection_error')
+            print(f"❌ Async database {self.name} unavailable: {e}")
+            raise Busy() from e
+        self.breaker.record_success()
+        return conn
+
+    async def close(self):
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    def stats(self):
+        pool = self.pool
+        return {
+            'size': pool.get_size() if pool else 0,
+            'idle': pool.get_idle_size() if pool else 0,
+            'max': POOL_MAX,
+            'breaker': self.breaker.stats(),
+        }
+
+
+class AsyncDatabase:
+    """主库与只读副本的 asyncpg 连接池，数据库不可用时下次请求重试"""
+
+    def __init__(self):
+        self._primary = None
+        self._replicas = None
+        self._read_cursor = itertools.count()
+
+    def _targets(self):
+        # 在事件循环中第一次使用时创建（asyncio.Lock 需要事件循环）
+        if self._primary is None:
+            self._primary = _Target('primary', _dsn())
+            self._replicas = [
+                _Target(f'replica{index + 1}', dsn) for index, dsn in enumerate(_read_dsns())
+            ]
+        return self._primary, self._replicas
+
+    async def connect(self, readonly=True):
+        """返回 (目标库, 连接)：只读时轮流尝试副本，全部不可用时回退主库"""
+        primary, replicas = self._targets()
+        if readonly and replicas:
+            start = next(self._read_cursor)
+            for offset in range(len(replicas)):
+                target = replicas[(start + offset) % len(replicas)]
+                try:
+                    conn = await target.acquire()
+                except Busy:
+                    continue
+                metrics.incr('db.replica')
+                return target, conn
+            metrics.incr('db.replica_fallback')
+        conn = await primary.acquire()
+        metrics.incr('db.primary')
+        return primary, conn
+
+    async def fetch(self, sql, *params):
+        """执行 psycopg2 风格（%s 占位符）的查询"""
+        target, conn = await self.connect(_use_replica.get())
+        try:
+            return await conn.fetch(numbered(sql)[0], *params)
+        except CONNECTION_ERRORS as e:
+            target.breaker.record_failure(e)
+            metrics.incr('asgi.connection_error')
+            raise Busy() from e
+        finally:
+            await target.pool.release(conn)
+
+    async def fetchval(self, sql, *params):
+        rows = await self.fetch(sql, *params)
+        return rows[0][0] if rows else None
+
+    async def start(self):
+        """启动时预先建立主库连接池，失败时照常启动"""
+        primary, _ = self._targets()
+        try:
+            conn = await primary.acquire()
+        except Busy:
+            return
+        await primary.pool.release(conn)
+
+    async def close(self):
+        if self._primary is not None:
+            for target in [self._primary] + self._replicas:
+                await target.close()
+
+    def stats(self):
+        if self._primary is None:
+            return {'primary': None, 'replicas': []}
+        return {
+            'primary': self._primary.stats(),
+            'replicas': [target.stats() for target in self._replicas],
+        }
+
+
+db = AsyncDatabase()
+
+
+def _session(scope):
+    """解出 Flask 会话（签名 Cookie），无效或不存在时返回空字典"""
+    cookie = dict(scope['headers']).get(b'cookie')
+    if not cookie:
+        return {}
+    value = parse_cookie(cookie.decode('latin-1')).get(flask_app.config['SESSION_COOKIE_NAME'])
+    serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+    if not value or serializer is None:
+        return {}
+    try:
+        return serializer.loads(value, max_age=int(flask_app.permanent_session_lifetime.total_seconds()))
+    except Exception:
+        return {}
+
+
+def recently_wrote(scope):
+    """与 main.recently_wrote 相同：会话在 READ_YOUR_WRITES_WINDOW 秒内写入过"""
+    written_at = _session(scope).get('_db_write_at')
+    return bool(written_at and time.time() - written_at < main.READ_YOUR_WRITES_WINDOW)
+
+
+async def cached(namespace, key, loader, ttl=None):
+    """经过共享查询缓存：cache 是同步实现，在线程中执行，未命中时回到事件循环查询"""
+    loop = asyncio.get_running_loop()
+
+    def load():
+        return asyncio.run_coroutine_threadsafe(loader(), loop).result()
+
+    return await asyncio.to_thread(cache.get_or_load, namespace, key, load, ttl)
+
+
+def _date_arg(args, name):
+    """asyncpg 的 ::date 参数需要 date 对象"""
+    value = args.get(name, '')
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else ''
+
+
+# ==================== 订单接口（order_bp） ====================
+async def get_orders_data(args):
+    fields = parse_fields(args, order_bp.ORDER_LIST_FIELDS)
+    page = args.get('page', 1, type=int)
+    limit = args.get('limit', 15, type=int)
+    offset = (page - 1) * limit
+
+    filter_args = MultiDict(args)
+    filter_args['start'] = _date_arg(args, 'start')
+    filter_args['end'] = _date_arg(args, 'end')
+    where_clause, params = order_bp.build_order_filters(filter_args)
+    orders_table = table_source('order_list', wants_archived(args))
+
+    total = await db.fetchval(
+        order_bp.ORDER_COUNT_SQL.format(source=orders_table, where=where_clause), *params
+    )
+    rows = await db.fetch(
+        order_bp.ORDER_PAGE_SQL.format(source=orders_table, where=where_clause),
+        *params, limit, offset
+    )
+    return {
+        'code': 0,
+        'msg': '成功',
+        'count': total or 0,
+        'data': select_fields(map_rows(rows, order_bp.ORDER_LIST_ROW), fields)
+    }
+
+
+async def get_order_detail(args, order_id):
+    rows = await db.fetch(order_bp.ORDER_DETAIL_SQL, int(order_id))
+    if not rows:
+        return {'code': 1, 'msg': '订单不存在'}
+    return {'code': 0, 'msg': '成功', 'data': order_bp.ORDER_DETAIL_ROW(rows[0])}
+
+
+async def fan_out(queries):
+    """fanout.run 的异步版本：各查询各自取连接，用 gather 并发执行"""
+    async def run_one(sql, params, mode):
+        if mode == 'value':
+            return await db.fetchval(sql, *params)
+        rows = await db.fetch(sql, *params)
+        if mode == 'one':
+            return rows[0] if rows else None
+        return rows
+
+    keys = list(queries)
+    results = await asyncio.gather(*(run_one(*queries[key]) for key in keys))
+    return dict(zip(keys, results))
+
+
+async def load_dashboard_stats():
+    results = await fan_out(order_bp.dashboard_queries())
+    return order_bp.build_dashboard_stats(results, results['recent_orders'])
+
+
+async def dashboard_stats(args):
+    return {'code': 0, 'data': await cached('orders', 'dashboard_stats', load_dashboard_stats)}
+
+
+async def service_trend(args):
+    current_year = datetime.now().year
+
+    async def load():
+        rows = await db.fetch(order_bp.SERVICE_TREND_SQL, current_year, current_year)
+        return order_bp.build_service_trend(rows)
+
+    return {'code': 0, 'data': await cached('orders', f'service_trend:{current_year}', load)}
+
+
+async def dashboard_bootstrap(args):
+    current_year = datetime.now().year
+
+    async def load():
+        queries = order_bp.dashboard_queries()
+        queries['service_trend'] = (order_bp.SERVICE_TREND_SQL, (current_year, current_year), 'all')
+        results = await fan_out(queries)
+        return {
+            'stats': order_bp.build_dashboard_stats(results, results['recent_orders']),
+            'service_trend': order_bp.build_service_trend(results['service_trend']),
+        }
+
+    return {'code': 0, 'data': await cached('orders', f'dashboard_bootstrap:{current_year}', load)}
+
+
+# ==================== 执行记录接口（exeitem_bp） ====================
+async def get_all_items(args):
+    rows = await db.fetch(
+        exeitem_bp.ITEMS_BY_DATE_SQL.format(source=table_source('item', wants_archived(args)))
+    )
+    return {'code': 0, 'data': exeitem_bp.group_items_by_date(rows)}
+
+
+async def _items_for_orders(order_ids):
+    """order_id -> 执行记录行（按执行时间倒序）"""
+    items = defaultdict(list)
+    if order_ids:
+        for row in await db.fetch(ITEMS_FOR_ORDERS_SQL, list(order_ids)):
+            items[row['record_id']].append(row)
+    return items
+
+
+async def load_started_items():
+    started_orders = await db.fetch(exeitem_bp.STARTED_ORDERS_SQL)
+    items = await _items_for_orders([order['order_id'] for order in started_orders])
+    return [
+        exeitem_bp.build_started_order(order, items.get(order['order_id'], []))
+        for order in started_orders
+    ]
+
+
+async def load_started_summary():
+    return [
+        exeitem_bp.started_progress(order, order['used_amount'], order['used_count'])
+        for order in await db.fetch(exeitem_bp.STARTED_SUMMARY_SQL)
+    ]
+
+
+async def get_started_items(args):
+    fields = parse_fields(args, exeitem_bp.STARTED_ITEM_FIELDS)
+    if wants_flag(args, 'summary'):
+        data = await cached('orders', 'started_items:summary', load_started_summary)
+    else:
+        data = await cached('orders', 'started_items', load_started_items)
+    return {'code': 0, 'data': select_fields(data, fields)}
+
+
+async def get_orders(args):
+    rows = await db.fetch(exeitem_bp.ORDER_OPTIONS_SQL)
+    return {'code': 0, 'data': map_rows(rows, exeitem_bp.ORDER_OPTION_ROW)}
+
+
+async def get_order_services(args, order_id):
+    rows = await db.fetch(exeitem_bp.ORDER_SERVICES_SQL, order_id)
+    return {'code': 0, 'data': map_rows(rows, exeitem_bp.ORDER_SERVICE_ROW)}
+
+
+async def get_to_use_services(args):
+    fields = parse_fields(args, exeitem_bp.TO_USE_FIELDS)
+    rows = await db.fetch(exeitem_bp.TO_USE_SERVICES_SQL)
+    results = [exeitem_bp.ToUseServiceRecord._make(row) for row in rows]
+
+    service_items = None
+    if wants_flag(args, 'history'):
+        items = await _items_for_orders({item.order_id for item in results})
+        by_service = defaultdict(list)
+        for order_id, rows in items.items():
+            for row in rows:
+                by_service[(order_id, row['service_id'])].append(tuple(row)[2:])
+
+        def service_items(order_id, service_id):
+            return by_service.get((order_id, service_id), [])
+
+    data = exeitem_bp.build_to_use_services(results, service_items)
+    if wants_flag(args, 'summary'):
+        data = exeitem_bp.summarize_to_use_services(data)
+    return {'code': 0, 'data': select_fields(data, fields)}
+
+
+# ==================== 准入控制 ====================
+# 排队等待名额的线程（admission 是同步实现）；排队数超过 ADMISSION_QUEUE_SIZE 时
+# acquire 立即拒绝，不会占满默认线程池
+_admission_executor = None
+
+
+def _admission_for(path):
+    """对应 Flask 视图的 (准入键, 优先级, 并发上限)，与同步版本共用名额与限流"""
+    try:
+        endpoint, _ = flask_app.url_map.bind('localhost').match(path, method='GET')
+    except HTTPException:
+        return path, PRIORITY_READ, None
+    priority, limit = getattr(flask_app.view_functions[endpoint], 'admission', (PRIORITY_READ, None))
+    return endpoint, priority, limit
+
+
+async def admit(key, priority, limit):
+    """获取准入名额，返回等待秒数；失败抛出 Overloaded"""
+    global _admission_executor
+    if admission.try_acquire(key, priority, limit):
+        return 0.0
+    if _admission_executor is None:
+        _admission_executor = ThreadPoolExecutor(admission.queue_size + 1, thread_name_prefix='asgi-admission')
+    future = asyncio.get_running_loop().run_in_executor(
+        _admission_executor, admission.acquire, key, priority, limit
+    )
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        # 客户端已断开：等线程拿到名额后立即归还
+        def release_later(done):
+            if not done.cancelled() and done.exception() is None:
+                admission.release(key)
+        future.add_done_callback(release_later)
+        raise
+
+
+# ==================== 路由 ====================
+def _int_segment(value):
+    return int(value) if value.isdigit() else None
+
+
+# (路径段, 处理函数, 失败时的消息前缀, 失败时额外返回的字段)
+ROUTES = {
+    ('orders', 'api', 'orders'): (get_orders_data, '获取数据失败', {'count': 0, 'data': []}),
+    ('orders', 'api', 'dashboard-stats'): (dashboard_stats, '获取数据失败', {}),
+    ('orders', 'api', 'service-trend'): (service_trend, '获取服务趋势失败', {}),
+    ('orders', 'api', 'dashboard-bootstrap'): (dashboard_bootstrap, '获取数据失败', {}),
+    ('item', 'api', 'items'): (get_all_items, '获取数据失败', {}),
+    ('item', 'api', 'started_items'): (get_started_items, '获取进行中订单失败', {}),
+    ('item', 'api', 'orders'): (get_orders, '获取订单列表失败', {}),
+    ('item', 'api', 'to_use_services'): (get_to_use_services, '获取待使用服务失败', {}),
+}
+
+# 带路径参数的路由：(前缀, 参数转换)
+PARAM_ROUTES = {
+    ('orders', 'api', 'order'): (get_order_detail, '获取订单详情失败', {}, str),
+    ('item', 'api', 'order_services'): (get_order_services, '获取订单服务失败', {}, _int_segment),
+}
+
+
+def resolve(path):
+    """返回 (处理函数, 消息前缀, 额外字段, 路径参数列表)，不是异步接口时返回 None"""
+    segments = tuple(path.split('/')[1:])
+    route = ROUTES.get(segments)
+    if route is not None:
+        return route + ([],)
+    route = PARAM_ROUTES.get(segments[:-1])
+    if route is not None and segments[-1]:
+        handler, prefix, extra, convert = route
+        value = convert(segments[-1])
+        if value is not None:
+            return handler, prefix, extra, [value]
+    return None
+
+
+async def send_json(send, scope, payload, status=200, headers=()):
+    """与 Flask 同步版本相同的 JSON 输出（含压缩协商）"""
+    body = flask_app.json.dumps(payload).encode('utf-8') + b'\n'
+    response_headers = [
+        (b'content-type', b'application/json'),
+        (b'vary', b'Accept-Encoding'),
+    ]
+    response_headers.extend(headers)
+
+    config = flask_app.config
+    if len(body) >= config['COMPRESS_MIN_SIZE']:
+        request_headers = dict(scope['headers'])
+        accept = parse_accept_header(request_headers.get(b'accept-encoding', b'').decode('latin-1'))
+        encoding = negotiate_encoding(accept)
+        if encoding:
+            metrics.incr('compress.bytes_in', len(body))
+            body = compress_bytes(body, encoding, config)
+            metrics.incr('compress.bytes_out', len(body))
+            response_headers.append((b'content-encoding', encoding.encode()))
+
+    response_headers.append((b'content-length', str(len(body)).encode()))
+    await send({'type': 'http.response.start', 'status': status, 'headers': response_headers})
+    await send({
+        'type': 'http.response.body',
+        'body': b'' if scope['method'] == 'HEAD' else body,
+    })
+
+
+async def send_busy(send, scope):
+    await send_json(
+        send, scope, {'code': 1, 'msg': '服务繁忙，请稍后重试'}, status=503,
+        headers=[(b'retry-after', str(admission_module.RETRY_AFTER).encode())]
+    )
+
+
+async def handle(scope, send, route):
+    handler, prefix, extra, path_args = route
+    key, priority, limit = _admission_for(scope['path'])
+    try:
+        waited = await admit(key, priority, limit)
+    except Overloaded as e:
+        metrics.incr('admission.shed')
+        metrics.incr(f'admission.shed.{e.reason}')
+        await send_busy(send, scope)
+        return
+    metrics.incr(f'admission.admitted.{PRIORITY_NAMES[priority]}')
+    if waited:
+        metrics.observe('admission.wait', waited)
+
+    args = MultiDict(parse_qsl(scope.get('query_string', b'').decode('latin-1')))
+    _use_replica.set(not recently_wrote(scope))
+    started = time.perf_counter()
+    try:
+        payload = await handler(args, *path_args)
+    except Busy:
+        await send_busy(send, scope)
+        return
+    except Exception as e:
+        print(f"API错误: {str(e)}")
+        print(f"详细错误: {traceback.format_exc()}")
+        payload = {'code': 1, 'msg': f'{prefix}: {str(e)}', **extra}
+    finally:
+        admission.release(key)
+        metrics.observe('asgi.' + handler.__name__, time.perf_counter() - started)
+    await send_json(send, scope, payload)
+
+
+def _profile_environ(scope):
+    """profiler.wanted 用到的 environ 字段"""
+    headers = dict(scope['headers'])
+    environ = {'QUERY_STRING': scope.get('query_string', b'').decode('latin-1')}
+    for name, header in ((HEADER, b'x-profile'), (MEMORY_HEADER, b'x-profile-memory')):
+        if header in headers:
+            environ[name] = headers[header].decode('latin-1')
+    return environ
+
+
+def _closing(wsgi_app):
+    """WsgiToAsgi 迭代完响应后不调用 close()（WSGI 规范要求调用），这里补上：
+
+    流式导出在 call_on_close 中归还准入名额，剖析在 close 时保存结果
+    """
+    def closing_app(environ, start_response):
+        result = wsgi_app(environ, start_response)
+        try:
+            # 不用 yield from：生成器被关闭时它会再调用一次 result.close()
+            for chunk in result:
+                yield chunk
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+    return closing_app
+
+
+def _mark_sampled(wsgi_app):
+    """ASGI 层已抽样选中的请求，Flask 侧的剖析中间件不再重复抽样"""
+    def sampled_app(environ, start_response):
+        environ[SAMPLED_KEY] = True
+        return wsgi_app(environ, start_response)
+    return sampled_app
+
+
+class AsyncApp:
+    """只读 JSON 接口走异步实现，其余请求交给 Flask"""
+
+    def __init__(self, wsgi_app):
+        self.fallback = WsgiToAsgi(_closing(wsgi_app))
+        self.sampled = WsgiToAsgi(_closing(_mark_sampled(wsgi_app)))
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] == 'http' and scope['method'] in ('GET', 'HEAD'):
+            route = resolve(scope['path'])
+            if route is not None:
+                if profiler.enabled:
+                    wanted, _, reason = profiler.wanted(_profile_environ(scope))
+                    if wanted:
+                        # 剖析的请求交给 Flask 应用，在 cProfile 下执行
+                        fallback = self.sampled if reason == 'sampled' else self.fallback
+                        await fallback(scope, receive, send)
+                        return
+                await handle(scope, send, route)
+                return
+        await self.fallback(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                # 数据库暂时不可用时照常启动，之后的请求会重试建池
+                await db.start()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await db.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+app = AsyncApp(flask_app)
@@ -0,0 +1,186 @@
+"""静态资源指纹与长缓存
+
+启动时扫描 static 目录，为每个文件计算内容哈希并生成带指纹的文件名
+（如 css/layui.1a2b3c4d5e.css），写入构建目录并生成 manifest。
+CSS 中引用的字体等资源同样替换为指纹文件名。文本类资源预先压缩成
+.gz / .br 副本，请求时按 Accept-Encoding 直接返回，不再实时压缩。
+
+模板中使用 asset_url('css/layui.css') 获取资源地址；指纹地址内容不变，
+因此以一年期 immutable 缓存头返回。
+"""
+import hashlib
+import mimetypes
+import os
+import re
+import zlib
+
+from flask import Blueprint, abort, current_app, request, send_file, url_for
+
+from compression import negotiate_encoding
+from metrics import metrics
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - 未安装时只生成 gzip 副本
+    brotli = None
+
+assets_bp = Blueprint('assets', __name__, url_prefix='/assets')
+
+# 一年期不可变缓存
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+
+# 需要预压缩的文本类资源（woff/woff2 本身已压缩）
+PRECOMPRESS_EXTENSIONS = {'.css', '.js', '.svg', '.ttf', '.eot', '.json', '.txt', '.html'}
+
+# CSS 中的 url(...) 引用
+CSS_URL_PATTERN = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+
+
+class AssetManifest:
+    """逻辑文件名 -> 指纹文件名"""
+
+    def __init__(self, static_folder, build_folder):
+        self.static_folder = static_folder
+        self.build_folder = build_folder
+        self.files = {}
+        self.paths = {}
+
+    def build(self):
+        """扫描 static 目录，生成指纹文件与预压缩副本"""
+        sources = []
+        for root, _, names in os.walk(self.static_folder):
+            for name in names:
+                path = os.path.join(root, name)
+                logical = os.path.relpath(path, self.static_folder).replace(os.sep, '/')
+                sources.append(logical)
+
+        # CSS 会引用其他资源，最后处理以便替换为指纹文件名
+        sources.sort(key=lambda logical: (logical.endswith('.css'), logical))
+        for logical in sources:
+            with open(os.path.join(self.static_folder, logical), 'rb') as f:
+                content = f.read()
+            if logical.endswith('.css'):
+                content = self._rewrite_css(logical, content)
+            hashed = self._hashed_name(logical, content)
+            self._write(hashed, content)
+            self.files[logical] = hashed
+            self.paths[hashed] = logical
+
+        print(f"📦 Static assets fingerprinted: {len(self.files)} files")
+
+    @staticmethod
+    def _hashed_name(logical, content):
+        digest = hashlib.sha256(content).hexdigest()[:10]
+        base, ext = os.path.splitext(logical)
+        return f"{base}.{digest}{ext}"
+
+    def _rewrite_css(self, logical, content):
+        """将 CSS 中的相对引用替换为指纹文件名"""
+        css_dir = os.path.dirname(logical)
+        text = content.decode('utf-8')
+
+        def replace(match):
+            quote, target = match.group(1), match.group(2)
+            if target.startswith(('data:', 'http:', 'https:', '//', '/')):
+                return match.group(0)
+            # 去掉版本参数，保留 #iefix 等片段
+            path, _, fragment = target.partition('#')
+            path = path.split('?', 1)[0]
+            resolved = os.path.normpath(os.path.join(css_dir, path)).replace(os.sep, '/')
+            hashed = self.files.get(resolved)
+            if hashed is None:
+                return match.group(0)
+            new_path = os.path.relpath(hashed, css_dir or '.').replace(os.sep, '/')
+            if fragment:
+                new_path += '#' + fragment
+            return f'url({quote}{new_path}{quote})'
+
+        return CSS_URL_PATTERN.sub(replace, text).encode('utf-8')
+
+    def _write(self, hashed, content):
+        """写入指纹文件及压缩副本（先写临时文件再替换，多 worker 并发安全）"""
+        target = os.path.join(self.build_folder, hashed)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        _atomic_write(target, content)
+
+        if os.path.splitext(hashed)[1] in PRECOMPRESS_EXTENSIONS:
+            gz = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            _atomic_write(target + '.gz', gz.compress(content) + gz.flush())
+            if brotli is not None:
+                _atomic_write(target + '.br', brotli.compress(content, quality=11))
+
+    def get(self, logical):
+        """逻辑文件名对应的指纹文件名，未知文件返回 None"""
+        return self.files.get(logical)
+
+
+def _atomic_write(path, content):
+    if os.path.exists(path):
+        return
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(content)
+    os.replace(tmp, path)
+
+
+@assets_bp.route('/<path:filename>')
+def serve_asset(filename):
+    """返回指纹资源，优先使用预压缩副本"""
+    manifest = current_app.extensions['assets']
+    logical = manifest.paths.get(filename)
+    if logical is None:
+        abort(404)
+
+    path = os.path.join(manifest.build_folder, filename)
+    mimetype = None
+    encoding = negotiate_encoding(request.accept_encodings)
+    if encoding is not None:
+        suffix = '.br' if encoding == 'br' else '.gz'
+        if os.path.exists(path + suffix):
+            # 预压缩副本的 MIME 类型仍按原文件判断
+            mimetype = _guess_mimetype(filename)
+            path = path + suffix
+        else:
+            encoding = None
+
+    response = send_file(path, mimetype=mimetype, conditional=True, max_age=31536000)
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE
+    response.vary.add('Accept-Encoding')
+    if encoding is not None:
+        response.headers['Content-Encoding'] = encoding
+        metrics.incr(f'assets.precompressed.{encoding}')
+    metrics.incr('assets.served')
+    return response
+
+
+def _guess_mimetype(filename):
+    return mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+
+def asset_url(filename):
+    """模板函数：返回指纹资源地址"""
+    hashed = current_app.extensions['assets'].get(filename)
+    if hashed is None:
+        return url_for('static', filename=filename)
+    return url_for('assets.serve_asset', filename=hashed)
+
+
+def init_assets(app):
+    """构建资源 manifest 并注册路由与模板函数"""
+    build_folder = app.config.setdefault(
+        'ASSET_BUILD_FOLDER', os.path.join(app.root_path, 'static_build')
+    )
+    manifest = AssetManifest(app.static_folder, build_folder)
+    try:
+        manifest.build()
+    except Exception as e:
+        # 构建失败时退回原始 /static 地址
+        print(f"⚠️ Failed to build static assets: {e}")
+        app.add_template_global(
+            lambda filename: url_for('static', filename=filename), 'asset_url'
+        )
+        return
+
+    app.extensions['assets'] = manifest
+    app.register_blueprint(assets_bp)
+    app.add_template_global(asset_url)
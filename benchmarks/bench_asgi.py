@@ -0,0 +1,112 @@
+"""并发基准测试：同步（gunicorn + Flask）vs 异步（uvicorn + asgi.py）
+
+两种服务连同一个数据库分别启动，例如：
+
+    gunicorn main:app --workers 1 --bind 127.0.0.1:8001
+    uvicorn asgi:app --workers 1 --port 8002
+
+然后按逐级增加的并发数，对同一个只读接口持续请求 duration 秒，
+统计吞吐（请求/秒）、成功率与延迟分位数。同步版本一个 worker 同一时刻只能处理
+一个请求，并发上去后延迟线性增长；异步版本的上限取决于连接池大小。
+
+用法：
+    python benchmarks/bench_asgi.py \\
+        --sync http://127.0.0.1:8001 --async http://127.0.0.1:8002 \\
+        --path /item/api/to_use_services --concurrency 1,8,32,128 --duration 10
+"""
+import argparse
+import http.client
+import statistics
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+def worker(base, path, deadline, latencies, failures, lock):
+    """单个客户端：保持长连接循环请求直到 deadline"""
+    parts = urlsplit(base)
+    conn = None
+    local_latencies = []
+    local_failures = 0
+    while time.perf_counter() < deadline:
+        if conn is None:
+            conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=60)
+        start = time.perf_counter()
+        try:
+            conn.request('GET', path)
+            response = conn.getresponse()
+            body = response.read()
+            ok = response.status == 200 and b'"code":0' in body.replace(b' ', b'')
+        except (OSError, http.client.HTTPException):
+            ok = False
+            conn.close()
+            conn = None
+        elapsed = time.perf_counter() - start
+        if ok:
+            local_latencies.append(elapsed)
+        else:
+            local_failures += 1
+    if conn is not None:
+        conn.close()
+    with lock:
+        latencies.extend(local_latencies)
+        failures.append(local_failures)
+
+
+def run(base, path, concurrency, duration):
+    latencies = []
+    failures = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+    threads = [
+        threading.Thread(target=worker, args=(base, path, deadline, latencies, failures, lock))
+        for _ in range(concurrency)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return latencies, sum(failures), elapsed
+
+
+def percentile(values, pct):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def report(name, concurrency, latencies, failures, elapsed):
+    total = len(latencies) + failures
+    print(
+        f"{name:<6} c={concurrency:<4} {len(latencies) / elapsed:9.1f} 请求/秒  "
+        f"失败 {failures:>5}/{total:<6} "
+        f"p50 {percentile(latencies, 50) * 1000:8.1f}ms  "
+        f"p95 {percentile(latencies, 95) * 1000:8.1f}ms  "
+        f"p99 {percentile(latencies, 99) * 1000:8.1f}ms  "
+        f"平均 {(statistics.mean(latencies) if latencies else float('nan')) * 1000:8.1f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sync vs async serving benchmark')
+    parser.add_argument('--sync', dest='sync_url', default='http://127.0.0.1:8001')
+    parser.add_argument('--async', dest='async_url', default='http://127.0.0.1:8002')
+    parser.add_argument('--path', default='/item/api/to_use_services')
+    parser.add_argument('--concurrency', default='1,8,32,128')
+    parser.add_argument('--duration', type=float, default=10)
+    args = parser.parse_args()
+
+    levels = [int(value) for value in args.concurrency.split(',')]
+    print(f"📊 并发基准测试：{args.path}，每级 {args.duration:g}s")
+    for concurrency in levels:
+        for name, base in (('sync', args.sync_url), ('async', args.async_url)):
+            # 预热：建立连接池、填充缓存
+            run(base, args.path, 1, 0.5)
+            report(name, concurrency, *run(base, args.path, concurrency, args.duration))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""报表计算基准测试：NumPy 向量化 vs 逐行循环
+
+在内存中生成与报表 SQL 返回的数组同形的数据（默认 100 万条执行记录），
+分别用 reports.compute_* 与等价的逐行 Python 循环计算，比较耗时并校验结果一致。
+
+配置了 DATABASE_URL 时另外对真实数据库执行一遍完整报表（列式取数 + 计算）。
+
+用法：
+    python benchmarks/bench_reports.py [执行记录条数]
+    DATABASE_URL=postgresql://... python benchmarks/bench_reports.py 1000000
+"""
+import os
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+import reports
+
+FIRST_MONTH = 2020 * 12
+LAST_MONTH = 2025 * 12 + 11
+
+
+def make_data(items, seed=42):
+    rng = np.random.default_rng(seed)
+    orders = max(items // 10, 1)
+    services = 200
+    return {
+        'order_ids': np.arange(1, orders + 1, dtype=np.int64),
+        'order_months': rng.integers(FIRST_MONTH, LAST_MONTH + 1, orders),
+        'order_amounts': rng.integers(100, 500000, orders) / 100,
+        'item_order_ids': rng.integers(1, orders + 1, items),
+        'item_months': rng.integers(FIRST_MONTH, LAST_MONTH + 1, items),
+        'item_amounts': rng.integers(100, 50000, items) / 100,
+        'service_ids': rng.integers(1, services + 1, orders * 3),
+        'quantity': rng.integers(1, 20, orders * 3),
+        'completed_ratio': rng.random(orders * 3),
+        'services': [
+            {'service_id': i, 'desc': f'服务{i}', 'package': f'套餐{i % 12}'}
+            for i in range(1, services + 1)
+        ],
+    }
+
+
+# ==================== 逐行循环版本（对照） ====================
+def loop_revenue(data):
+    revenue = defaultdict(float)
+    consumed = defaultdict(float)
+    for month, amount in zip(data['order_months'].tolist(), data['order_amounts'].tolist()):
+        revenue[month] += amount
+    for month, amount in zip(data['item_months'].tolist(), data['item_amounts'].tolist()):
+        consumed[month] += amount
+    return [round(revenue[month], 2) for month in range(FIRST_MONTH, LAST_MONTH + 1)], \
+        [round(consumed[month], 2) for month in range(FIRST_MONTH, LAST_MONTH + 1)]
+
+
+def loop_utilization(data, completed):
+    totals = defaultdict(lambda: [0, 0])
+    for service_id, quantity, done in zip(data['service_ids'].tolist(), data['quantity'].tolist(), completed.tolist()):
+        totals[service_id][0] += quantity
+        totals[service_id][1] += done
+    return totals
+
+
+def loop_liability(data):
+    consumed = defaultdict(float)
+    for order_id, amount in zip(data['item_order_ids'].tolist(), data['item_amounts'].tolist()):
+        consumed[order_id] += amount
+    outstanding = 0.0
+    for order_id, prepaid in zip(data['order_ids'].tolist(), data['order_amounts'].tolist()):
+        outstanding += max(prepaid - consumed[order_id], 0)
+    return round(outstanding, 2)
+
+
+def timed(name, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    print(f"  {name:<10} {time.perf_counter() - start:8.3f}s")
+    return result
+
+
+def bench_memory(items):
+    data = make_data(items)
+    completed = (data['quantity'] * data['completed_ratio']).astype(np.int64)
+    print(f"📊 报表计算：{items:,} 条执行记录，{len(data['order_ids']):,} 个订单")
+
+    print("按月收入与消耗")
+    vectorized = timed('numpy', reports.compute_revenue, FIRST_MONTH, LAST_MONTH,
+                       data['order_months'], data['order_amounts'], data['item_months'], data['item_amounts'])
+    revenue, consumed = timed('loop', loop_revenue, data)
+    assert np.allclose(vectorized['revenue'], revenue) and np.allclose(vectorized['consumed'], consumed)
+
+    print("服务使用率")
+    vectorized = timed('numpy', reports.compute_utilization,
+                       data['service_ids'], data['quantity'], completed, data['services'])
+    totals = timed('loop', loop_utilization, data, completed)
+    for row in vectorized['services']:
+        assert totals[row['service_id']] == [row['quantity'], row['completed']]
+
+    print("预收款余额")
+    vectorized = timed('numpy', reports.compute_liability,
+                       data['order_ids'], data['order_amounts'], data['order_months'],
+                       data['item_order_ids'], data['item_amounts'])
+    outstanding = timed('loop', loop_liability, data)
+    assert abs(vectorized['outstanding'] - outstanding) < 0.05
+
+
+def bench_database(dsn):
+    import psycopg2
+
+    conn = psycopg2.connect(dsn)
+    try:
+        cursor = conn.cursor()
+        cursor.execute('SELECT service_id, "desc", package FROM service')
+        services = [{'service_id': row[0], 'desc': row[1], 'package': row[2]} for row in cursor.fetchall()]
+        cursor.execute('SELECT COUNT(*) FROM item')
+        print(f"📊 数据库完整报表（item 表 {cursor.fetchone()[0]:,} 行）")
+        timed('revenue', reports.revenue_report, cursor, FIRST_MONTH, LAST_MONTH)
+        timed('utilization', reports.utilization_report, cursor, services)
+        timed('liability', reports.liability_report, cursor)
+        cursor.close()
+    finally:
+        conn.close()
+
+
+def main():
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    bench_memory(items)
+    dsn = os.environ.get('DATABASE_URL')
+    if dsn:
+        bench_database(dsn)
+
+
+if __name__ == '__main__':
+    main()
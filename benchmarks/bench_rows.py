@@ -0,0 +1,115 @@
+"""行映射基准测试：DictCursor vs 普通元组游标
+
+用 generate_series 在数据库端生成与 item 表同形的结果集，比较三种取数方式
+的耗时与峰值内存（tracemalloc）：
+
+    dictcursor  DictCursor + 每行再构造 dict（改造前的写法）
+    records     普通游标 + namedtuple 记录 + 按下标映射
+    tuples      普通游标 + 直接解包 tuple
+
+用法：
+    DATABASE_URL=postgresql://... python benchmarks/bench_rows.py [行数]
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import psycopg2
+from psycopg2.extras import DictCursor
+
+from row_format import record_type, fetch_records, record_mapper, as_text, as_float, as_time, MINUTE_FMT
+
+QUERY = """
+    SELECT
+        n AS item_id,
+        'item-' || n AS item_name,
+        (n % 500)::numeric(10, 2) AS item_price,
+        TIMESTAMP '2024-01-01' + (n || ' minutes')::interval AS exetime,
+        CASE WHEN n % 3 = 0 THEN NULL ELSE 'remark' END AS item_remark
+    FROM generate_series(1, %s) AS n
+"""
+
+ItemRecord = record_type('ItemRecord', ['item_id', 'item_name', 'item_price', 'exetime', 'item_remark'])
+ITEM_ROW = record_mapper(
+    ItemRecord,
+    ('item_id', 'item_id', None),
+    ('item_name', 'item_name', as_text('未命名')),
+    ('item_price', 'item_price', as_float()),
+    ('exetime', 'exetime', as_time(MINUTE_FMT)),
+    ('item_remark', 'item_remark', as_text('')),
+)
+
+
+def run_dictcursor(conn, rows):
+    cursor = conn.cursor(cursor_factory=DictCursor)
+    cursor.execute(QUERY, (rows,))
+    result = []
+    for item in cursor.fetchall():
+        result.append({
+            'item_id': item['item_id'],
+            'item_name': item['item_name'] or '未命名',
+            'item_price': float(item['item_price']) if item['item_price'] is not None else 0,
+            'exetime': item['exetime'].strftime(MINUTE_FMT) if item['exetime'] else '-',
+            'item_remark': item['item_remark'] or '',
+        })
+    cursor.close()
+    return result
+
+
+def run_records(conn, rows):
+    cursor = conn.cursor()
+    cursor.execute(QUERY, (rows,))
+    result = [ITEM_ROW(record) for record in fetch_records(cursor, ItemRecord)]
+    cursor.close()
+    return result
+
+
+def run_tuples(conn, rows):
+    cursor = conn.cursor()
+    cursor.execute(QUERY, (rows,))
+    result = [
+        {
+            'item_id': item_id,
+            'item_name': item_name or '未命名',
+            'item_price': float(item_price) if item_price is not None else 0,
+            'exetime': exetime.strftime(MINUTE_FMT) if exetime else '-',
+            'item_remark': item_remark or '',
+        }
+        for item_id, item_name, item_price, exetime, item_remark in cursor
+    ]
+    cursor.close()
+    return result
+
+
+def measure(name, func, conn, rows):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(conn, rows)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<12} {elapsed:8.3f}s  {rows / elapsed:12,.0f} 行/秒  峰值内存 {peak / 1024 / 1024:8.1f} MB")
+    return result
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    dsn = os.environ.get('DATABASE_URL', "host=localhost dbname=plorder user=postgres password='' port=5432")
+    conn = psycopg2.connect(dsn)
+    try:
+        print(f"📊 行映射基准测试：{rows:,} 行")
+        # 预热，排除首次执行的计划/缓存开销
+        run_tuples(conn, min(rows, 1000))
+        baseline = measure('dictcursor', run_dictcursor, conn, rows)
+        for name, func in (('records', run_records), ('tuples', run_tuples)):
+            result = measure(name, func, conn, rows)
+            assert result == baseline, f"{name} 输出与基线不一致"
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
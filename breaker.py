@@ -0,0 +1,108 @@
+"""数据库连接熔断器
+
+连续失败 failure_threshold 次后熔断（open），在退避时间内直接拒绝，不再尝试连接；
+退避结束进入半开（half_open），只放行一个探测请求：成功则恢复（closed），
+失败则再次熔断，退避时间指数增长（base_delay * 2^n，上限 max_delay）并加随机抖动，
+避免数据库恢复时所有 worker 同时重连。
+"""
+import random
+import threading
+import time
+
+from metrics import metrics
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """熔断中，retry_after 秒后再试"""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"{name} unavailable, retry in {retry_after:.1f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+
+    def __init__(self, name, failure_threshold=3, base_delay=1.0, max_delay=60.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._trips = 0
+        self._open_until = 0.0
+        self._probing = False
+        self._last_error = None
+
+    def _backoff(self):
+        delay = min(self.max_delay, self.base_delay * (2 ** (self._trips - 1)))
+        # 抖动：在 [delay/2, delay] 之间随机
+        return delay / 2 + random.random() * delay / 2
+
+    def before_call(self):
+        """尝试前调用：熔断中抛出 CircuitOpenError，半开时只放行一个探测"""
+        with self._lock:
+            if self._state == CLOSED:
+                return
+            now = time.monotonic()
+            if self._state == OPEN:
+                if now < self._open_until:
+                    metrics.incr(f'breaker.{self.name}.rejected')
+                    raise CircuitOpenError(self.name, self._open_until - now)
+                self._state = HALF_OPEN
+                self._probing = False
+            if self._probing:
+                metrics.incr(f'breaker.{self.name}.rejected')
+                raise CircuitOpenError(self.name, self.base_delay)
+            self._probing = True
+
+    def record_success(self):
+        with self._lock:
+            if self._state != CLOSED:
+                print(f"✅ Circuit {self.name} closed")
+                metrics.incr(f'breaker.{self.name}.closed')
+            self._state = CLOSED
+            self._failures = 0
+            self._trips = 0
+            self._probing = False
+
+    def record_failure(self, error=None):
+        with self._lock:
+            self._failures += 1
+            self._last_error = str(error) if error else None
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._trips += 1
+                delay = self._backoff()
+                self._state = OPEN
+                self._open_until = time.monotonic() + delay
+                self._probing = False
+                print(f"⚠️ Circuit {self.name} open for {delay:.1f}s: {error}")
+                metrics.incr(f'breaker.{self.name}.opened')
+
+    def call(self, func, *args, **kwargs):
+        """在熔断保护下执行 func"""
+        self.before_call()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            self.record_failure(e)
+            raise
+        self.record_success()
+        return result
+
+    def stats(self):
+        with self._lock:
+            retry_after = max(self._open_until - time.monotonic(), 0) if self._state == OPEN else 0
+            return {
+                'state': self._state,
+                'failures': self._failures,
+                'trips': self._trips,
+                'retry_after': round(retry_after, 1),
+                'last_error': self._last_error,
+            }
@@ -0,0 +1,423 @@
+"""历史数据批量导入
+
+支持两种数据来源：
+    1. 每张表一个 CSV 文件（首行为列名）：order_list / order_service / item
+    2. 旧系统导出的 MySQL 转储（db/plorder.sql 格式的 INSERT 语句）
+
+流程：
+    1. COPY FROM STDIN 写入临时暂存表（类型不合法的行在这一步直接报错）
+    2. 集合方式校验引用关系：服务、执行记录只能引用本次导入的订单
+    3. 分配正式表主键：
+       - 与已有订单内容相同、订单号也相同的订单视为之前导入过，连同其服务与执行记录跳过，
+         重复导入同一份数据不会产生重复数据
+       - 订单号 / 执行记录号未被占用（含归档表）时沿用原编号
+       - 已被其他数据占用时由自增序列重新分配，服务与执行记录随订单改用新编号；
+         导入的数据永远不会挂到已有订单上。重新分配过编号的订单无法识别为
+         “之前导入过”，同一份数据不要重复导入（报告中的 remapped_orders 为其数量）
+    4. INSERT ... SELECT 合并到正式表
+    5. 按 exeitem_bp.update_order_status 的规则批量重算完成数量与状态
+
+全部在一个事务中完成，校验失败时整体回滚。
+"""
+import csv
+import io
+import os
+import re
+import tempfile
+import time
+
+from changes import change_log
+from metrics import metrics
+
+# 正式表可导入的列（与 db/plorder.sql 中的表结构一致）
+TABLE_COLUMNS = {
+    'order_list': [
+        'order_id', 'order_info', 'order_price', 'order_disprice',
+        'order_buytime', 'order_remark', 'order_status',
+    ],
+    'order_service': [
+        'id', 'order_id', 'service_id', 'quantity', 'completed_quantity', 'service_status',
+    ],
+    'item': [
+        'item_id', 'record_id', 'service_id', 'item_name', 'exetime', 'item_price', 'item_remark',
+    ],
+}
+
+# 暂存表结构
+STAGE_DDL = {
+    'order_list': """
+        CREATE TEMP TABLE stage_order_list (
+            order_id integer,
+            order_info text,
+            order_price numeric(10, 2),
+            order_disprice numeric(10, 2),
+            order_buytime timestamp,
+            order_remark text,
+            order_status text,
+            target_id integer,
+            existing boolean NOT NULL DEFAULT false
+        ) ON COMMIT DROP
+    """,
+    'order_service': """
+        CREATE TEMP TABLE stage_order_service (
+            id integer,
+            order_id integer,
+            service_id integer,
+            quantity integer,
+            completed_quantity integer,
+            service_status text
+        ) ON COMMIT DROP
+    """,
+    'item': """
+        CREATE TEMP TABLE stage_item (
+            item_id integer,
+            record_id integer,
+            service_id integer,
+            item_name text,
+            exetime timestamp,
+            item_price numeric(10, 2),
+            item_remark text,
+            target_id integer
+        ) ON COMMIT DROP
+    """,
+}
+
+# 引用校验：(说明, 统计不合法行数的 SQL, 删除不合法行的 SQL)
+# 服务与执行记录只能引用本次导入的订单，不会挂到已有订单上
+REFERENCE_CHECKS = [
+    (
+        'order_list 订单号重复',
+        """SELECT COUNT(*) FROM stage_order_list a
+           WHERE EXISTS (SELECT 1 FROM stage_order_list b
+                         WHERE b.order_id = a.order_id AND b.ctid < a.ctid)""",
+        """DELETE FROM stage_order_list a USING stage_order_list b
+           WHERE b.order_id = a.order_id AND b.ctid < a.ctid""",
+    ),
+    (
+        'item 执行记录号重复',
+        """SELECT COUNT(*) FROM stage_item a
+           WHERE EXISTS (SELECT 1 FROM stage_item b
+                         WHERE b.item_id = a.item_id AND b.ctid < a.ctid)""",
+        """DELETE FROM stage_item a USING stage_item b
+           WHERE b.item_id = a.item_id AND b.ctid < a.ctid""",
+    ),
+    (
+        'order_service 引用了不在本次导入中的订单',
+        """SELECT COUNT(*) FROM stage_order_service s
+           WHERE NOT EXISTS (SELECT 1 FROM stage_order_list o WHERE o.order_id = s.order_id)""",
+        """DELETE FROM stage_order_service s
+           WHERE NOT EXISTS (SELECT 1 FROM stage_order_list o WHERE o.order_id = s.order_id)""",
+    ),
+    (
+        'order_service 引用了不存在的服务',
+        """SELECT COUNT(*) FROM stage_order_service s
+           WHERE NOT EXISTS (SELECT 1 FROM service sv WHERE sv.service_id = s.service_id)""",
+        """DELETE FROM stage_order_service s
+           WHERE NOT EXISTS (SELECT 1 FROM service sv WHERE sv.service_id = s.service_id)""",
+    ),
+    (
+        'item 引用了不在本次导入中的订单',
+        """SELECT COUNT(*) FROM stage_item i
+           WHERE NOT EXISTS (SELECT 1 FROM stage_order_list o WHERE o.order_id = i.record_id)""",
+        """DELETE FROM stage_item i
+           WHERE NOT EXISTS (SELECT 1 FROM stage_order_list o WHERE o.order_id = i.record_id)""",
+    ),
+    (
+        'item 的服务不属于该订单',
+        """SELECT COUNT(*) FROM stage_item i
+           WHERE i.service_id IS NOT NULL
+             AND NOT EXISTS (SELECT 1 FROM stage_order_service s
+                             WHERE s.order_id = i.record_id AND s.service_id = i.service_id)""",
+        """DELETE FROM stage_item i
+           WHERE i.service_id IS NOT NULL
+             AND NOT EXISTS (SELECT 1 FROM stage_order_service s
+                             WHERE s.order_id = i.record_id AND s.service_id = i.service_id)""",
+    ),
+]
+
+# 分配编号到提交前阻止并发写入：等待进行中的写事务提交，之后的新增订单 / 执行记录
+# 排队到导入提交之后，MAX() 能看到所有已分配的编号。先锁 item 再锁 order_list，
+# 与新增执行记录（先写 item 再更新订单）的加锁顺序一致，不会死锁
+LOCK_SQL = "LOCK TABLE item, order_list IN SHARE ROW EXCLUSIVE MODE"
+
+# 分配正式表主键；{orders} / {items} 为正式表（已执行分区归档迁移时含归档表）
+ASSIGN_SQL = [
+    # 之前导入过的订单：订单号相同且内容一致（状态会随执行记录变化，不参与比较）
+    """UPDATE stage_order_list s SET existing = true, target_id = s.order_id
+       FROM {orders}
+       WHERE o.order_id = s.order_id
+         AND (o.order_info, o.order_price, o.order_disprice, o.order_remark)
+             IS NOT DISTINCT FROM (s.order_info, s.order_price, s.order_disprice, s.order_remark)
+         AND (s.order_buytime IS NULL OR s.order_buytime = o.order_buytime)""",
+    # 未被占用的编号沿用
+    """UPDATE stage_order_list s SET target_id = s.order_id
+       WHERE NOT s.existing AND s.order_id IS NOT NULL
+         AND NOT EXISTS (SELECT 1 FROM {orders} WHERE o.order_id = s.order_id)""",
+    """UPDATE stage_item i SET target_id = i.item_id
+       FROM stage_order_list o
+       WHERE o.order_id = i.record_id AND NOT o.existing AND i.item_id IS NOT NULL
+         AND NOT EXISTS (SELECT 1 FROM {items} WHERE x.item_id = i.item_id)""",
+    # 先把自增序列推进到正式表与导入数据的最大编号之后，再为其余行分配新编号。
+    # setval 不随事务回滚、立即生效：只前进不后退（最新的行被删除或归档后 MAX 会变小）
+    """SELECT setval(pg_get_serial_sequence('order_list', 'order_id'),
+                     GREATEST((SELECT MAX(order_id) FROM {orders}),
+                              (SELECT MAX(order_id) FROM stage_order_list),
+                              pg_sequence_last_value(pg_get_serial_sequence('order_list', 'order_id'))))""",
+    """SELECT setval(pg_get_serial_sequence('item', 'item_id'),
+                     GREATEST((SELECT MAX(item_id) FROM {items}),
+                              (SELECT MAX(item_id) FROM stage_item),
+                              pg_sequence_last_value(pg_get_serial_sequence('item', 'item_id'))))""",
+    """UPDATE stage_order_list SET target_id = nextval(pg_get_serial_sequence('order_list', 'order_id'))
+       WHERE target_id IS NULL""",
+    """UPDATE stage_item i SET target_id = nextval(pg_get_serial_sequence('item', 'item_id'))
+       FROM stage_order_list o
+       WHERE o.order_id = i.record_id AND NOT o.existing AND i.target_id IS NULL""",
+]
+
+ASSIGN_REPORT_SQL = """
+    SELECT (SELECT COUNT(*) FROM stage_order_list WHERE existing),
+           (SELECT COUNT(*) FROM stage_order_list
+            WHERE NOT existing AND target_id IS DISTINCT FROM order_id),
+           (SELECT COUNT(*) FROM stage_item i JOIN stage_order_list o ON o.order_id = i.record_id
+            WHERE NOT o.existing AND i.target_id IS DISTINCT FROM i.item_id)
+"""
+
+# 合并到正式表（order_service 的 id 由数据库重新分配），之前导入过的订单整体跳过
+MERGE_SQL = {
+    'order_list': """
+        INSERT INTO order_list (order_id, order_info, order_price, order_disprice,
+                                order_buytime, order_remark, order_status)
+        SELECT target_id, order_info, order_price, order_disprice,
+               COALESCE(order_buytime, NOW()), order_remark, COALESCE(order_status, 'pending')
+        FROM stage_order_list
+        WHERE NOT existing
+    """,
+    'order_service': """
+        INSERT INTO order_service (order_id, service_id, quantity, completed_quantity, service_status)
+        SELECT o.target_id, s.service_id, COALESCE(s.quantity, 1), 0, 'pending'
+        FROM stage_order_service s
+        JOIN stage_order_list o ON o.order_id = s.order_id
+        WHERE NOT o.existing
+        ON CONFLICT DO NOTHING
+    """,
+    'item': """
+        INSERT INTO item (item_id, record_id, service_id, item_name, exetime, item_price, item_remark)
+        SELECT i.target_id, o.target_id, i.service_id, i.item_name,
+               -- exetime 是 item 的分区键，不能为空：缺失时取订单购买日期
+               COALESCE(i.exetime, o.order_buytime, CURRENT_DATE),
+               i.item_price, i.item_remark
+        FROM stage_item i
+        JOIN stage_order_list o ON o.order_id = i.record_id
+        WHERE NOT o.existing
+    """,
+}
+
+IMPORT_ORDER = ['order_list', 'order_service', 'item']
+
+
+class BulkImportError(Exception):
+    """导入数据校验失败"""
+
+
+# ==================== MySQL 转储解析 ====================
+INSERT_PATTERN = re.compile(
+    r"INSERT\s+INTO\s+`?(\w+)`?\s*(?:\(([^)]*)\))?\s*VALUES\s*", re.IGNORECASE
+)
+VALUE_TOKEN = re.compile(
+    r"\s*(?:'((?:[^'\\]|\\.|'')*)'|(NULL)|([-+0-9.eE]+)|(\()|(\))|(,)|(;))", re.DOTALL
+)
+MYSQL_ESCAPES = {
+    '0': '\0', 'b': '\b', 'n': '\n', 'r': '\r', 't': '\t', 'Z': '\x1a',
+}
+ESCAPE_PATTERN = re.compile(r"\\(.)|''", re.DOTALL)
+
+# 转储转换后的 NULL 标记
+DUMP_NULL = r'\N'
+
+
+def _unescape(value):
+    def replace(match):
+        char = match.group(1)
+        if char is None:
+            return "'"
+        return MYSQL_ESCAPES.get(char, char)
+    return ESCAPE_PATTERN.sub(replace, value)
+
+
+def parse_mysql_dump(text):
+    """解析 MySQL INSERT 语句，转换为 run_import 使用的 CSV 来源
+
+    只处理可导入的三张表，其余表的 INSERT 忽略。
+    返回 {表名: 可读的 CSV 文件对象（首行为列名）}，NULL 写为 DUMP_NULL，
+    以便与空字符串区分，导入时需传入 null_marker=DUMP_NULL。
+    """
+    writers = {}
+    files = {}
+    pos = 0
+    while True:
+        match = INSERT_PATTERN.search(text, pos)
+        if match is None:
+            break
+        table = match.group(1)
+        columns = (
+            [c.strip().strip('`') for c in match.group(2).split(',')]
+            if match.group(2) else TABLE_COLUMNS.get(table)
+        )
+        pos = match.end()
+
+        row, rows = [], []
+        while True:
+            token = VALUE_TOKEN.match(text, pos)
+            if token is None:
+                raise BulkImportError(f"无法解析的 INSERT 语句（位置 {pos}）")
+            pos = token.end()
+            string, null, number, _, close, _, end = token.groups()
+            if string is not None:
+                row.append(_unescape(string))
+            elif null:
+                row.append(None)
+            elif number is not None:
+                row.append(number)
+            elif close:
+                rows.append(row)
+                row = []
+            elif end:
+                break
+
+        if table not in TABLE_COLUMNS:
+            continue
+        if table not in writers:
+            files[table] = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024, mode='w+', newline='')
+            writers[table] = csv.writer(files[table])
+            writers[table].writerow(columns)
+        writers[table].writerows(
+            [DUMP_NULL if v is None else v for v in r] for r in rows
+        )
+
+    for f in files.values():
+        f.seek(0)
+    return files
+
+
+# ==================== 导入 ====================
+def _read_header(source):
+    """读取 CSV 首行列名，返回列名与剩余内容（文本流）"""
+    if isinstance(source, (bytes, bytearray)):
+        source = io.StringIO(source.decode('utf-8-sig'), newline='')
+    elif isinstance(source.read(0), bytes):
+        source = io.TextIOWrapper(source, encoding='utf-8-sig', newline='')
+    columns = next(csv.reader([source.readline()]), [])
+    return [c.strip().lstrip('\ufeff') for c in columns], source
+
+
+def run_import(conn, sources, skip_invalid=False, null_marker=None):
+    """执行导入
+
+    sources: {表名: CSV 文件对象或 bytes}，首行为列名
+    skip_invalid: True 时丢弃引用不合法的行，False 时整体回滚并报错
+    null_marker: NULL 的表示方式，默认空字段即 NULL
+
+    返回导入报告 dict。
+    """
+    start = time.perf_counter()
+    report = {'tables': {}, 'invalid': {}}
+    cursor = conn.cursor()
+    try:
+        # 1. COPY 写入暂存表
+        copy_options = "FORMAT csv"
+        if null_marker is not None:
+            copy_options += f", NULL {cursor.mogrify('%s', (null_marker,)).decode('utf-8')}"
+
+        staged_total = 0
+        for table in IMPORT_ORDER:
+            cursor.execute(STAGE_DDL[table])
+            source = sources.get(table)
+            staged = 0
+            if source is not None:
+                columns, body = _read_header(source)
+                unknown = [c for c in columns if c not in TABLE_COLUMNS[table]]
+                if unknown:
+                    raise BulkImportError(f"{table} 包含未知列: {', '.join(unknown)}")
+                cursor.copy_expert(
+                    f"COPY stage_{table} ({', '.join(columns)}) FROM STDIN WITH ({copy_options})",
+                    body,
+                )
+                staged = cursor.rowcount
+            report['tables'][table] = {'staged': staged}
+            staged_total += staged
+
+        # 2. 集合方式校验引用
+        for description, count_sql, delete_sql in REFERENCE_CHECKS:
+            cursor.execute(count_sql)
+            invalid = cursor.fetchone()[0]
+            if not invalid:
+                continue
+            report['invalid'][description] = invalid
+            if not skip_invalid:
+                raise BulkImportError(f"{description}: {invalid} 行")
+            cursor.execute(delete_sql)
+
+        # 3. 分配主键：沿用未被占用的编号，其余重新分配
+        from archive import table_source
+        cursor.execute(LOCK_SQL)
+        cursor.execute("SELECT to_regclass('order_list_archive') IS NOT NULL")
+        archived = cursor.fetchone()[0]
+        sources = {
+            'orders': table_source('order_list', archived, alias='o'),
+            'items': table_source('item', archived, alias='x'),
+        }
+        for sql in ASSIGN_SQL:
+            cursor.execute(sql.format(**sources))
+        cursor.execute(ASSIGN_REPORT_SQL)
+        report['existing_orders'], report['remapped_orders'], report['remapped_items'] = cursor.fetchone()
+
+        # 4. 合并到正式表
+        for table in IMPORT_ORDER:
+            cursor.execute(MERGE_SQL[table])
+            report['tables'][table]['inserted'] = cursor.rowcount
+
+        # 5. 批量重算本次新增订单的完成数量与状态
+        from exeitem_bp import refresh_orders_bulk
+        cursor.execute("SELECT target_id FROM stage_order_list WHERE NOT existing")
+        order_ids = [row[0] for row in cursor.fetchall()]
+        report['orders_refreshed'] = len(order_ids)
+        report['status_changed'] = refresh_orders_bulk(cursor, order_ids)
+        # 导入的订单可能很多，增量同步的客户端整体重新加载
+        change_log.record_reset(cursor)
+
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        metrics.incr('import.failed')
+        raise
+    finally:
+        cursor.close()
+
+    elapsed = time.perf_counter() - start
+    report['rows'] = staged_total
+    report['seconds'] = round(elapsed, 3)
+    report['rows_per_second'] = round(staged_total / elapsed) if elapsed > 0 else staged_total
+    metrics.incr('import.rows', staged_total)
+    metrics.observe('import.run', elapsed)
+    return report
+
+
+def load_paths(paths):
+    """根据文件路径准备导入来源
+
+    .sql 文件按 MySQL 转储解析；.csv 文件以文件名（不含扩展名）作为表名。
+    返回 (sources, null_marker)。
+    """
+    sources = {}
+    null_marker = None
+    for path in paths:
+        name, ext = os.path.splitext(os.path.basename(path))
+        if ext.lower() == '.sql':
+            with open(path, encoding='utf-8') as f:
+                sources.update(parse_mysql_dump(f.read()))
+            null_marker = DUMP_NULL
+        elif ext.lower() == '.csv' and name in TABLE_COLUMNS:
+            sources[name] = open(path, 'rb')
+        else:
+            raise BulkImportError(f"无法识别的导入文件: {path}")
+    return sources, null_marker
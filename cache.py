@@ -0,0 +1,268 @@
+"""查询结果缓存
+
+两种后端：
+    - LRUBackend：进程内 LRU，单 worker 或本地开发使用
+    - RedisBackend：Redis / RESP 兼容服务，多个 gunicorn worker、多节点共享（配置 REDIS_URL）
+
+键按命名空间组织：cache:<namespace>:<版本>:<key>。写接口调用 invalidate(namespace)
+只递增版本号，旧版本的键不再被读取，随 TTL 自然过期，无需逐个删除。
+
+配置只读副本时，写入后的 fill_delay 秒内（副本复制延迟窗口）未命中只查库、不回填：
+否则别的请求从尚未同步的副本读到旧数据，会以新版本号写回缓存。
+
+命中与未命中返回的都是经过 JSON 序列化往返后的值（日期为字符串、元组为列表），
+调用方看到的类型不取决于是否命中。
+
+get_or_load 对同一个键做请求合并：进程内只有一个线程执行 loader，其余线程等待结果；
+Redis 后端下再用 SET NX 锁保证多个 worker 中只有一个去查库，其余轮询结果。
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import metrics
+from redis_support import get_redis, redis_errors
+from row_format import json_default
+
+try:
+    import orjson
+
+    def _dumps(value):
+        return orjson.dumps(value, default=json_default, option=orjson.OPT_NON_STR_KEYS)
+
+    _loads = orjson.loads
+except ImportError:  # pragma: no cover - 未安装 orjson 时使用标准库
+    import json
+
+    def _dumps(value):
+        return json.dumps(value, default=json_default, ensure_ascii=False).encode('utf-8')
+
+    _loads = json.loads
+
+
+class LRUBackend:
+    """进程内 LRU，条目数超过 maxsize 时淘汰最久未使用的
+
+    计数器（命名空间版本号）单独保存，不参与淘汰
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._counters:
+                return str(self._counters[key]).encode()
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires is not None and expires <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None, nx=False):
+        with self._lock:
+            if nx and self._data.get(key) is not None:
+                entry = self._data[key]
+                if entry[1] is None or entry[1] > time.monotonic():
+                    return False
+            expires = time.monotonic() + ttl if ttl else None
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+
+class RedisBackend:
+    """Redis 后端，只使用 GET / SET / DEL / INCR"""
+
+    def __init__(self, client):
+        self._client = client
+
+    def get(self, key):
+        return self._client.get(key)
+
+    def set(self, key, value, ttl=None, nx=False):
+        px = int(ttl * 1000) if ttl else None
+        return bool(self._client.set(key, value, px=px, nx=nx))
+
+    def delete(self, key):
+        self._client.delete(key)
+
+    def incr(self, key):
+        return self._client.incr(key)
+
+
+class _Flight:
+    """进程内正在执行的 loader"""
+    __slots__ = ('done', 'value', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class Cache:
+
+    # 等待其他 worker 填充缓存的最长时间与轮询间隔
+    LOCK_TTL = 10
+    LOCK_WAIT = 3.0
+    POLL_INTERVAL = 0.05
+
+    def __init__(self, backend=None, default_ttl=30, shared=False, fill_delay=0):
+        self.backend = backend or LRUBackend()
+        self.default_ttl = default_ttl
+        # 共享后端才需要跨进程的锁
+        self.shared = shared
+        # 写入后暂停回填的秒数（只读副本的复制延迟）
+        self.fill_delay = fill_delay
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def configure(self, backend, default_ttl, shared, fill_delay=0):
+        self.backend = backend
+        self.default_ttl = default_ttl
+        self.shared = shared
+        self.fill_delay = fill_delay
+
+    def version(self, namespace):
+        """命名空间当前版本号，每次 invalidate 递增"""
+        raw = self.backend.get(f"cache:{namespace}:version")
+        return int(raw) if raw else 0
+
+    def _key(self, namespace, key):
+        return f"cache:{namespace}:{self.version(namespace)}:{key}"
+
+    def invalidate(self, *namespaces):
+        """递增命名空间版本号，该命名空间下所有缓存失效
+
+        先写入暂停回填的标记再递增版本号：读到新版本号的请求一定能看到标记
+        """
+        for namespace in namespaces:
+            try:
+                if self.fill_delay:
+                    self.backend.set(f"cache:{namespace}:written", b'1', ttl=self.fill_delay)
+                self.backend.incr(f"cache:{namespace}:version")
+                metrics.incr('cache.invalidate')
+            except redis_errors() as e:
+                metrics.incr('cache.backend_error')
+                print(f"⚠️ Failed to invalidate cache {namespace}: {e}")
+
+    def get_or_load(self, namespace, key, loader, ttl=None):
+        """读取缓存，未命中时调用 loader()，并发请求只执行一次 loader"""
+        ttl = ttl or self.default_ttl
+        try:
+            full_key = self._key(namespace, key)
+            raw = self.backend.get(full_key)
+        except redis_errors() as e:
+            # 缓存不可用时直接查库
+            metrics.incr('cache.backend_error')
+            print(f"⚠️ Cache backend unavailable: {e}")
+            return _loads(_dumps(loader()))
+
+        if raw is not None:
+            metrics.incr('cache.hit')
+            return _loads(raw)
+
+        with self._lock:
+            flight = self._flights.get(full_key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[full_key] = _Flight()
+
+        if not leader:
+            metrics.incr('cache.coalesced')
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = self._load(namespace, full_key, loader, ttl)
+            return flight.value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(full_key, None)
+            flight.done.set()
+
+    def _load(self, namespace, full_key, loader, ttl):
+        metrics.incr('cache.miss')
+        lock_key = full_key + ':lock'
+        locked = False
+        if self.shared:
+            try:
+                locked = self.backend.set(lock_key, b'1', ttl=self.LOCK_TTL, nx=True)
+                if not locked:
+                    value = self._wait_for(full_key)
+                    if value is not None:
+                        metrics.incr('cache.coalesced')
+                        return value
+            except redis_errors() as e:
+                metrics.incr('cache.backend_error')
+                print(f"⚠️ Cache backend unavailable: {e}")
+
+        try:
+            raw = _dumps(loader())
+            try:
+                if self.fill_delay and self.backend.get(f"cache:{namespace}:written") is not None:
+                    # 刚写入过：数据可能来自尚未同步的副本，不回填
+                    metrics.incr('cache.fill_skipped')
+                else:
+                    self.backend.set(full_key, raw, ttl=ttl)
+            except redis_errors() as e:
+                metrics.incr('cache.backend_error')
+                print(f"⚠️ Failed to store cache {full_key}: {e}")
+            return _loads(raw)
+        finally:
+            if locked:
+                try:
+                    self.backend.delete(lock_key)
+                except redis_errors():
+                    pass
+
+    def _wait_for(self, full_key):
+        """其他 worker 正在加载：轮询结果，超时返回 None 由自己加载"""
+        deadline = time.monotonic() + self.LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(self.POLL_INTERVAL)
+            raw = self.backend.get(full_key)
+            if raw is not None:
+                return _loads(raw)
+        return None
+
+
+cache = Cache()
+
+
+def init_cache(app):
+    """配置了 REDIS_URL 时使用共享的 Redis 后端，否则使用进程内 LRU"""
+    default_ttl = app.config.setdefault('CACHE_DEFAULT_TTL', 30)
+    fill_delay = app.config.setdefault('CACHE_FILL_DELAY', 0)
+    client = get_redis(app.config.get('REDIS_URL'))
+    if client is not None:
+        cache.configure(RedisBackend(client), default_ttl, shared=True, fill_delay=fill_delay)
+        print("🗃️ Cache backend: redis")
+    else:
+        cache.configure(LRUBackend(app.config.setdefault('CACHE_MAX_ENTRIES', 1024)), default_ttl,
+                        shared=False, fill_delay=fill_delay)
+        print("🗃️ Cache backend: in-process LRU")
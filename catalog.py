@@ -0,0 +1,159 @@
+"""服务目录（套餐 → 类型 → 部位 → 服务）
+
+服务表很少变化，但新增订单页每次打开都要查询全部服务、在浏览器里分组。这里把目录
+整体构建一次放在进程内存中：
+
+- 构建结果包括扁平列表、层级树和按描述排序的前缀索引，接口响应体预先序列化
+- service 表上的语句级触发器在每次修改后递增 catalog_version（db/catalog.sql），
+  每个进程最多每隔 CATALOG_CHECK_INTERVAL 秒读一次版本号，变化时才重新构建
+- ETag 为响应体的摘要，客户端在 Cache-Control 的有效期后用 If-None-Match 重新验证，
+  目录未变时返回 304
+"""
+import bisect
+import hashlib
+import json
+import threading
+import time
+
+from psycopg2.extras import DictCursor
+
+from metrics import metrics
+from row_format import row_mapper, map_rows
+
+# 检查目录版本的间隔（秒）
+DEFAULT_CHECK_INTERVAL = 30
+
+# 前缀搜索最多返回的服务数
+SEARCH_MAX_LIMIT = 50
+
+VERSION_SQL = "SELECT version FROM catalog_version WHERE name = 'service'"
+
+# PostgreSQL 中 desc 是关键字，需要引号
+SERVICES_SQL = 'SELECT service_id, "desc", package, type, part FROM service ORDER BY "desc"'
+
+SERVICE_ROW = row_mapper(
+    ('service_id', 'service_id', None),
+    ('desc', 'desc', None),
+    ('package', 'package', None),
+    ('type', 'type', None),
+    ('part', 'part', None),
+)
+
+
+def _dumps(data):
+    return json.dumps({'code': 0, 'data': data}, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def build_tree(services):
+    """按 套餐 → 类型 → 部位 分组，各层按名称排序，服务按描述排序"""
+    packages = {}
+    for service in services:
+        parts = packages.setdefault(service['package'] or '', {}).setdefault(service['type'] or '', {})
+        parts.setdefault(service['part'] or '', []).append({
+            'service_id': service['service_id'],
+            'desc': service['desc'],
+        })
+    return [
+        {
+            'package': package,
+            'types': [
+                {
+                    'type': type_name,
+                    'parts': [
+                        {'part': part, 'services': parts[part]}
+                        for part in sorted(parts)
+                    ],
+                }
+                for type_name, parts in sorted(types.items())
+            ],
+        }
+        for package, types in sorted(packages.items())
+    ]
+
+
+class CatalogSnapshot:
+    """某个版本的目录，构建后只读"""
+
+    def __init__(self, version, services):
+        self.version = version
+        self.services = services
+        self.tree = build_tree(services)
+        self.services_body = _dumps(services)
+        self.tree_body = _dumps(self.tree)
+        self.services_etag = hashlib.sha1(self.services_body).hexdigest()
+        self.tree_etag = hashlib.sha1(self.tree_body).hexdigest()
+        # 前缀索引：(小写描述, 服务下标) 按描述排序
+        self._keys = sorted(
+            ((service['desc'] or '').casefold(), index)
+            for index, service in enumerate(services)
+        )
+
+    def search(self, prefix, limit):
+        """描述以 prefix 开头（不区分大小写）的服务，按描述排序"""
+        prefix = prefix.casefold()
+        start = bisect.bisect_left(self._keys, (prefix, -1))
+        result = []
+        for key, index in self._keys[start:start + limit]:
+            if not key.startswith(prefix):
+                break
+            result.append(self.services[index])
+        return result
+
+
+class Catalog:
+
+    def __init__(self, check_interval=DEFAULT_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._get_connection = None
+        self._release = None
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def configure(self, get_connection, release, check_interval):
+        self._get_connection = get_connection
+        self._release = release
+        self.check_interval = check_interval
+
+    def current(self):
+        """当前目录；距上次检查超过 check_interval 秒时先比较版本号"""
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return snapshot
+
+        with self._lock:
+            # 等锁期间其他线程可能已经检查过
+            if self._snapshot is not None and time.monotonic() - self._checked_at < self.check_interval:
+                return self._snapshot
+            # 目录只读，走只读副本；副本延迟最多让新版本晚一个检查间隔生效
+            conn = self._get_connection(readonly=True)
+            try:
+                cursor = conn.cursor(cursor_factory=DictCursor)
+                cursor.execute(VERSION_SQL)
+                row = cursor.fetchone()
+                version = row['version'] if row else 0
+                if self._snapshot is None or self._snapshot.version != version:
+                    cursor.execute(SERVICES_SQL)
+                    self._snapshot = CatalogSnapshot(version, map_rows(cursor.fetchall(), SERVICE_ROW))
+                    metrics.incr('catalog.rebuilt')
+                cursor.close()
+                conn.rollback()
+            finally:
+                self._release(conn)
+            self._checked_at = time.monotonic()
+            return self._snapshot
+
+    def invalidate(self):
+        """下次访问时重新检查版本号"""
+        self._checked_at = 0.0
+
+
+catalog = Catalog()
+
+
+def init_catalog(app, get_connection, release):
+    """从配置读取目录版本检查间隔"""
+    catalog.configure(
+        get_connection, release,
+        app.config.setdefault('CATALOG_CHECK_INTERVAL', DEFAULT_CHECK_INTERVAL),
+    )
@@ -0,0 +1,210 @@
+"""订单变更流水（增量同步）
+
+进度页、待使用服务页每次轮询都重新下载全部进行中订单。这里为每次写入记录一条
+单调递增的变更版本，客户端只拉取某个版本之后变化的订单：
+
+- 变更记录在 change_log 表（db/changes.sql），version 为 bigserial
+- 写事务在提交前的最后一步调用 change_log.record_orders / record_item：先取事务级
+  advisory 锁再插入，锁持有到提交，因此版本号按提交顺序递增，读取方不会在看到
+  N+1 之后才看到 N
+- 删除订单时记录墓碑（deleted = true），其服务与执行记录随订单一并删除
+- 批量导入等一次修改大量订单的操作调用 change_log.record_reset，客户端收到后整体重新加载
+- 超过 CHANGE_RETENTION_DAYS 天的记录定期删除（始终保留最新一条），
+  更早的版本同样需要整体重新加载
+- 未执行 db/changes.sql（没有 change_log 表）时写入照常进行、不记录变更，
+  读取始终返回 reset；每隔 TABLE_RECHECK_INTERVAL 秒重新检查表是否已创建
+
+用法：
+
+    ...  # 执行写入（幂等键之后）
+    change_log.record_orders(cursor, [order_id])
+    conn.commit()
+"""
+import threading
+import time
+
+from metrics import metrics
+
+# 写入变更的事务级 advisory 锁
+CHANGE_LOCK_ID = 2024061501
+
+# 变更保留天数与过期记录清理间隔（秒）
+DEFAULT_RETENTION_DAYS = 7
+PURGE_INTERVAL = 3600
+
+# change_log 表不存在时重新检查的间隔（秒）
+TABLE_RECHECK_INTERVAL = 60
+
+ENTITY_ORDER = 'order'
+ENTITY_ITEM = 'item'
+ENTITY_RESET = 'reset'
+
+RECORD_ORDERS_SQL = """
+    INSERT INTO change_log (entity, entity_id, order_id, deleted)
+    SELECT 'order', order_id, order_id, %s
+    FROM unnest(%s::int[]) AS t(order_id)
+"""
+
+RECORD_ITEM_SQL = """
+    INSERT INTO change_log (entity, entity_id, order_id, deleted)
+    VALUES ('item', %s, %s, false)
+"""
+
+RECORD_RESET_SQL = """
+    INSERT INTO change_log (entity, entity_id, order_id, deleted)
+    VALUES ('reset', 0, NULL, false)
+"""
+
+TABLE_SQL = "SELECT to_regclass('change_log') IS NOT NULL"
+
+RANGE_SQL = "SELECT MIN(version), MAX(version) FROM change_log"
+
+SINCE_SQL = """
+    SELECT version, entity, entity_id, order_id, deleted
+    FROM change_log
+    WHERE version > %s
+    ORDER BY version
+    LIMIT %s
+"""
+
+PURGE_SQL = """
+    DELETE FROM change_log
+    WHERE changed_at < now() - %s * interval '1 day'
+      AND version < (SELECT MAX(version) FROM change_log)
+"""
+
+
+class ChangeSet:
+    """某个版本之后的变更
+
+    reset 为 True 时客户端需要整体重新加载（记录已清理、变更过多或发生了批量导入）
+    """
+    __slots__ = ('version', 'reset', 'order_ids', 'deleted_ids', 'item_ids')
+
+    def __init__(self, version, reset=False):
+        self.version = version
+        self.reset = reset
+        self.order_ids = []
+        self.deleted_ids = []
+        self.item_ids = []
+
+
+class ChangeLog:
+
+    def __init__(self, retention_days=DEFAULT_RETENTION_DAYS):
+        self.retention_days = retention_days
+        self._last_purge = time.monotonic()
+        # change_log 表是否存在：None 为尚未检查
+        self._table = None
+        self._table_checked = 0.0
+        self._lock = threading.Lock()
+
+    def configure(self, retention_days):
+        self.retention_days = retention_days
+
+    def available(self, cursor):
+        """change_log 表是否存在；用调用方的游标检查，结果在进程内缓存"""
+        with self._lock:
+            if self._table or (
+                self._table is False and time.monotonic() - self._table_checked < TABLE_RECHECK_INTERVAL
+            ):
+                return self._table
+        cursor.execute(TABLE_SQL)
+        exists = bool(cursor.fetchone()[0])
+        with self._lock:
+            if not exists and self._table is None:
+                print("⚠️ change_log table not found (run db/changes.sql): "
+                      "changes are not recorded and /api/changes always returns reset")
+            self._table = exists
+            self._table_checked = time.monotonic()
+        return exists
+
+    # ---------- 写入 ----------
+    def _lock_versions(self, cursor):
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", (CHANGE_LOCK_ID,))
+
+    def record_orders(self, cursor, order_ids, deleted=False):
+        """记录订单（含其服务）的变更或删除"""
+        order_ids = sorted(set(order_ids))
+        if not order_ids or not self.available(cursor):
+            return
+        self._lock_versions(cursor)
+        cursor.execute(RECORD_ORDERS_SQL, (deleted, order_ids))
+        metrics.incr('changes.recorded', len(order_ids))
+        self._maybe_purge(cursor)
+
+    def record_item(self, cursor, item_id, order_id):
+        """记录新增的执行记录，同时记录所属订单的变更（完成数量、状态）"""
+        if not self.available(cursor):
+            return
+        self._lock_versions(cursor)
+        cursor.execute(RECORD_ITEM_SQL, (item_id, order_id))
+        cursor.execute(RECORD_ORDERS_SQL, (False, [order_id]))
+        metrics.incr('changes.recorded', 2)
+        self._maybe_purge(cursor)
+
+    def record_reset(self, cursor):
+        """记录一次需要客户端整体重新加载的变更"""
+        if not self.available(cursor):
+            return
+        self._lock_versions(cursor)
+        cursor.execute(RECORD_RESET_SQL)
+        metrics.incr('changes.reset')
+
+    def _maybe_purge(self, cursor):
+        """每个进程每隔 PURGE_INTERVAL 秒顺带删除一次过期的变更"""
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_purge < PURGE_INTERVAL:
+                return
+            self._last_purge = now
+        cursor.execute(PURGE_SQL, (self.retention_days,))
+        metrics.incr('changes.purged', cursor.rowcount)
+
+    # ---------- 读取 ----------
+    def since(self, cursor, version, limit):
+        """读取 version 之后的变更；version 为 None 时只返回当前版本"""
+        if not self.available(cursor):
+            return ChangeSet(0, reset=True)
+        cursor.execute(RANGE_SQL)
+        oldest, latest = cursor.fetchone()
+        latest = latest or 0
+        if version is None:
+            return ChangeSet(latest)
+        # 版本之后的记录已被清理，或客户端的版本来自另一个数据库
+        if version > latest or (oldest is not None and version < oldest - 1):
+            return ChangeSet(latest, reset=True)
+        if version == latest:
+            return ChangeSet(latest)
+
+        cursor.execute(SINCE_SQL, (version, limit + 1))
+        rows = cursor.fetchall()
+        if not rows:
+            return ChangeSet(version)
+        if len(rows) > limit:
+            return ChangeSet(latest, reset=True)
+
+        # 只返回本次读到的最后一个版本，之后提交的变更留给下一次轮询
+        changes = ChangeSet(rows[-1][0])
+        changed, deleted, items = set(), set(), set()
+        for _, entity, entity_id, order_id, is_deleted in rows:
+            if entity == ENTITY_RESET:
+                changes.reset = True
+            elif entity == ENTITY_ITEM:
+                items.add(entity_id)
+            elif is_deleted:
+                deleted.add(order_id)
+            else:
+                changed.add(order_id)
+        changes.deleted_ids = sorted(deleted)
+        changes.order_ids = sorted(changed - deleted)
+        changes.item_ids = sorted(items)
+        return changes
+
+
+change_log = ChangeLog()
+
+
+def init_changes(app):
+    """从配置读取变更保留天数"""
+    change_log.configure(app.config.setdefault('CHANGE_RETENTION_DAYS', DEFAULT_RETENTION_DAYS))
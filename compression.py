@@ -0,0 +1,162 @@
+"""响应压缩
+
+根据 Accept-Encoding 协商 br / gzip，对超过阈值的文本类响应压缩。
+流式响应逐块压缩，不会把整个响应读入内存；304、小响应、
+已带 Content-Encoding 的响应（如预压缩静态文件）跳过。
+
+配置项：
+    COMPRESS_MIN_SIZE    最小压缩字节数，默认 1024
+    COMPRESS_GZIP_LEVEL  gzip 级别，默认 6
+    COMPRESS_BR_LEVEL    brotli 级别，默认 4
+    COMPRESS_MIMETYPES   可压缩的 MIME 类型集合
+"""
+import time
+import zlib
+
+from flask import request
+
+from metrics import metrics
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - 未安装时只提供 gzip
+    brotli = None
+
+DEFAULT_MIMETYPES = frozenset({
+    'text/html',
+    'text/css',
+    'text/plain',
+    'text/csv',
+    'text/javascript',
+    'application/javascript',
+    'application/json',
+    'image/svg+xml',
+})
+
+
+# ==================== 压缩器 ====================
+class _GzipEncoder:
+    name = 'gzip'
+
+    def __init__(self, level):
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def process(self, data):
+        return self._obj.compress(data)
+
+    def finish(self):
+        return self._obj.flush()
+
+
+class _BrotliEncoder:
+    name = 'br'
+
+    def __init__(self, level):
+        self._obj = brotli.Compressor(quality=level)
+
+    def process(self, data):
+        return self._obj.process(data)
+
+    def finish(self):
+        return self._obj.finish()
+
+
+def negotiate_encoding(accept_encodings):
+    """根据 Accept-Encoding 选择编码，优先 br"""
+    if brotli is not None and accept_encodings['br']:
+        return 'br'
+    if accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def _make_encoder(encoding, config):
+    if encoding == 'br':
+        return _BrotliEncoder(config['COMPRESS_BR_LEVEL'])
+    return _GzipEncoder(config['COMPRESS_GZIP_LEVEL'])
+
+
+def compress_bytes(data, encoding, config):
+    """一次性压缩整段数据"""
+    encoder = _make_encoder(encoding, config)
+    return encoder.process(data) + encoder.finish()
+
+
+def _compress_stream(chunks, encoder):
+    """逐块压缩流式响应"""
+    bytes_in = bytes_out = 0
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            bytes_in += len(chunk)
+            out = encoder.process(chunk)
+            if out:
+                bytes_out += len(out)
+                yield out
+        out = encoder.finish()
+        bytes_out += len(out)
+        yield out
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+        metrics.incr('compress.bytes_in', bytes_in)
+        metrics.incr('compress.bytes_out', bytes_out)
+
+
+# ==================== Flask 集成 ====================
+def init_compression(app):
+    """注册响应压缩"""
+    app.config.setdefault('COMPRESS_MIN_SIZE', 1024)
+    app.config.setdefault('COMPRESS_GZIP_LEVEL', 6)
+    app.config.setdefault('COMPRESS_BR_LEVEL', 4)
+    app.config.setdefault('COMPRESS_MIMETYPES', DEFAULT_MIMETYPES)
+
+    @app.after_request
+    def compress_response(response):
+        config = app.config
+        status = response.status_code
+
+        if (status < 200 or status in (204, 206, 304)
+                or response.direct_passthrough
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in config['COMPRESS_MIMETYPES']):
+            return response
+
+        # 无论是否压缩，缓存都需要按编码区分
+        response.vary.add('Accept-Encoding')
+
+        encoding = negotiate_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            # 流式响应：长度未知，逐块压缩
+            response.response = _compress_stream(response.response, _make_encoder(encoding, config))
+            response.headers.pop('Content-Length', None)
+            response.headers['Content-Encoding'] = encoding
+            metrics.incr(f'compress.responses.{encoding}')
+            metrics.incr('compress.streamed')
+            return response
+
+        data = response.get_data()
+        if len(data) < config['COMPRESS_MIN_SIZE']:
+            metrics.incr('compress.skipped_small')
+            return response
+
+        start = time.perf_counter()
+        compressed = compress_bytes(data, encoding, config)
+        metrics.observe(f'compress.{encoding}', time.perf_counter() - start)
+
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        # 压缩后的实体与原实体不同，强 ETag 降为弱 ETag
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+
+        metrics.incr(f'compress.responses.{encoding}')
+        metrics.incr('compress.bytes_in', len(data))
+        metrics.incr('compress.bytes_out', len(compressed))
+        return response
@@ -0,0 +1,142 @@
+"""COPY ... TO STDOUT 流式导出
+
+PostgreSQL 直接生成 CSV，后台线程把 COPY 输出写入有界队列，
+响应生成器逐块取出发送。队列满时 COPY 线程阻塞，内存占用恒定，
+与导出的行数无关。
+"""
+import queue
+import threading
+from datetime import datetime
+
+from flask import Response
+
+from metrics import metrics
+
+# COPY 每次读取的字节数与队列中最多缓存的块数
+COPY_CHUNK_SIZE = 64 * 1024
+QUEUE_CHUNKS = 16
+
+# Excel 打开 UTF-8 CSV 需要 BOM，否则中文乱码
+UTF8_BOM = b'\xef\xbb\xbf'
+
+_EOF = object()
+
+
+class ExportCancelled(Exception):
+    """客户端断开，停止导出"""
+
+
+class _QueueWriter:
+    """供 copy_expert 写入的类文件对象"""
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self.cancelled = False
+
+    def write(self, data):
+        if self.cancelled:
+            raise ExportCancelled()
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        # 队列满时阻塞，形成背压
+        self._chunks.put(data)
+        return len(data)
+
+
+def build_copy_sql(cursor, query, params):
+    """COPY 不支持绑定参数，先用 mogrify 安全地内联参数"""
+    inner = cursor.mogrify(query, params).decode('utf-8')
+    return f"COPY ({inner}) TO STDOUT WITH (FORMAT csv, HEADER true)"
+
+
+def stream_copy(conn, release, query, params, filename, excel=False):
+    """流式导出查询结果
+
+    conn 在导出结束（或客户端断开）后通过 release(conn, close) 归还，
+    被中断的连接 COPY 状态不确定，close 为 True 时应直接关闭。
+    """
+    cursor = conn.cursor()
+    try:
+        copy_sql = build_copy_sql(cursor, query, params)
+    finally:
+        cursor.close()
+
+    chunks = queue.Queue(maxsize=QUEUE_CHUNKS)
+    writer = _QueueWriter(chunks)
+    state = {'started': False}
+
+    def produce():
+        cur = conn.cursor()
+        try:
+            cur.copy_expert(copy_sql, writer, size=COPY_CHUNK_SIZE)
+            chunks.put(_EOF)
+        except Exception as e:
+            if not writer.cancelled:
+                chunks.put(e)
+        finally:
+            cur.close()
+
+    def generate():
+        state['started'] = True
+        thread = threading.Thread(target=produce, name='copy-export', daemon=True)
+        thread.start()
+        total = 0
+        completed = False
+        try:
+            if excel:
+                yield UTF8_BOM
+            while True:
+                chunk = chunks.get()
+                if chunk is _EOF:
+                    completed = True
+                    break
+                if isinstance(chunk, Exception):
+                    raise chunk
+                total += len(chunk)
+                yield chunk
+        finally:
+            if not completed:
+                # 客户端断开或出错：通知 COPY 线程停止并清空队列使其退出阻塞
+                writer.cancelled = True
+                while thread.is_alive():
+                    try:
+                        chunks.get(timeout=0.1)
+                    except queue.Empty:
+                        pass
+            thread.join()
+            if completed:
+                conn.rollback()
+            release(conn, not completed)
+            metrics.incr('export.bytes', total)
+            metrics.incr('export.completed' if completed else 'export.aborted')
+
+    headers = {
+        'Content-Disposition': f'attachment; filename="{filename}"',
+        'X-Accel-Buffering': 'no',
+    }
+    response = Response(generate(), mimetype='text/csv', headers=headers)
+
+    @response.call_on_close
+    def release_unstarted():
+        # 响应体未被迭代（如 HEAD 请求）时生成器的 finally 不会执行
+        if not state['started']:
+            release(conn, False)
+
+    return response
+
+
+def copy_to_file(conn, query, params, out, excel=False):
+    """把查询结果以 CSV 写入二进制文件对象（后台任务导出使用）"""
+    cursor = conn.cursor()
+    try:
+        copy_sql = build_copy_sql(cursor, query, params)
+        if excel:
+            out.write(UTF8_BOM)
+        cursor.copy_expert(copy_sql, out, size=COPY_CHUNK_SIZE)
+    finally:
+        cursor.close()
+
+
+def export_filename(prefix):
+    """导出文件名，如 orders_20250101_120000.csv"""
+    return f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
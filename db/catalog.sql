@@ -0,0 +1,33 @@
+-- ----------------------------
+-- 服务目录版本号（PostgreSQL）
+--
+--   psql "$DATABASE_URL" -f db/catalog.sql
+--
+-- service 表每次修改（语句级触发器）后 catalog_version 递增，
+-- catalog.py 定期读取版本号，变化时才重新构建内存中的服务目录。
+-- ----------------------------
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS catalog_version (
+    name    varchar(50) PRIMARY KEY,
+    version bigint NOT NULL DEFAULT 0
+);
+
+INSERT INTO catalog_version (name, version) VALUES ('service', 0)
+ON CONFLICT (name) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_catalog_version()
+RETURNS trigger AS $$
+BEGIN
+    UPDATE catalog_version SET version = version + 1 WHERE name = TG_ARGV[0];
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS service_catalog_version ON service;
+CREATE TRIGGER service_catalog_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON service
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_version('service');
+
+COMMIT;
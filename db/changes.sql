@@ -0,0 +1,27 @@
+-- ----------------------------
+-- 订单变更流水（PostgreSQL）
+--
+--   psql "$DATABASE_URL" -f db/changes.sql
+--
+-- 每次写入订单、订单服务或执行记录时由 changes.py 记录一行，version 单调递增，
+-- /item/api/changes?since=<version> 据此返回增量。
+-- entity: order（entity_id 为订单ID）/ item（entity_id 为执行记录ID）/ reset（需整体重新加载）
+-- 过期的记录由 changes.py 定期删除。
+-- ----------------------------
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS change_log (
+    version     bigserial PRIMARY KEY,
+    entity      varchar(10) NOT NULL,
+    entity_id   bigint NOT NULL,
+    order_id    integer,
+    deleted     boolean NOT NULL DEFAULT false,
+    changed_at  timestamptz NOT NULL DEFAULT now(),
+    CONSTRAINT change_log_entity_check CHECK (entity IN ('order', 'item', 'reset'))
+);
+
+-- 清理过期记录
+CREATE INDEX IF NOT EXISTS change_log_changed_at_idx ON change_log (changed_at);
+
+COMMIT;
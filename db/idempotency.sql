@@ -0,0 +1,22 @@
+-- ----------------------------
+-- 写接口幂等键（PostgreSQL）
+--
+--   psql "$DATABASE_URL" -f db/idempotency.sql
+--
+-- key_hash 为 接口 + 用户 + Idempotency-Key 的 SHA-1（20 字节），
+-- request_hash 为请求体的 SHA-1，response 为第一次请求返回的 JSON。
+-- 过期的键由 idempotency.py 定期删除。
+-- ----------------------------
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS idempotency_key (
+    key_hash     bytea PRIMARY KEY,
+    request_hash bytea NOT NULL,
+    response     jsonb NOT NULL,
+    created_at   timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idempotency_key_created_at_idx ON idempotency_key (created_at);
+
+COMMIT;
@@ -0,0 +1,39 @@
+-- ----------------------------
+-- 后台任务表（PostgreSQL）
+--
+--   psql "$DATABASE_URL" -f db/jobs.sql
+--
+-- 报表与大批量导出由 jobs.py 在后台线程中执行，这里只记录任务状态；
+-- 结果文件保存在 JOB_RESULT_DIR，按 cache_key 命名，相同参数的请求直接复用。
+-- ----------------------------
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS background_job (
+    job_id      bigserial PRIMARY KEY,
+    kind        varchar(50) NOT NULL,
+    params      jsonb NOT NULL DEFAULT '{}',
+    -- 任务类型 + 参数 + 数据版本的摘要，同时作为结果文件名
+    cache_key   char(40) NOT NULL,
+    status      varchar(20) NOT NULL DEFAULT 'queued',
+    error       text,
+    created_at  timestamptz NOT NULL DEFAULT now(),
+    started_at  timestamptz,
+    finished_at timestamptz,
+    -- 执行进程定期刷新；长时间未更新的排队 / 执行中任务视为已中断
+    heartbeat_at timestamptz NOT NULL DEFAULT now(),
+    CONSTRAINT background_job_status_check CHECK (status IN ('queued', 'running', 'done', 'failed'))
+);
+
+-- 早于心跳字段创建的表
+ALTER TABLE background_job ADD COLUMN IF NOT EXISTS heartbeat_at timestamptz NOT NULL DEFAULT now();
+
+-- 提交时按 cache_key 查找可复用的任务
+CREATE INDEX IF NOT EXISTS background_job_cache_key_idx ON background_job (cache_key, job_id DESC);
+-- 清理旧任务
+CREATE INDEX IF NOT EXISTS background_job_created_at_idx ON background_job (created_at);
+-- 查找心跳超时的任务
+CREATE INDEX IF NOT EXISTS background_job_heartbeat_idx ON background_job (heartbeat_at)
+    WHERE status IN ('queued', 'running');
+
+COMMIT;
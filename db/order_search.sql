@@ -0,0 +1,24 @@
+-- ----------------------------
+-- 添加服务记录时的订单搜索索引（PostgreSQL）
+--
+--   psql "$DATABASE_URL" -f db/order_search.sql
+--
+-- /item/api/orders/search 按订单ID前缀、订单信息与备注搜索未完成的订单：
+-- 1. 订单ID前缀：order_id::text 的 text_pattern_ops 索引，支持 LIKE '12%'
+-- 2. 订单信息与备注：pg_trgm 三元组 GIN 索引，支持 ILIKE '%关键字%'
+-- 两个索引都只包含 pending / started 订单，表达式须与 exeitem_bp.ORDER_SEARCH_SQL 一致。
+-- ----------------------------
+
+BEGIN;
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS order_list_open_id_prefix_idx
+    ON order_list ((order_id::text) text_pattern_ops)
+    WHERE order_status IN ('pending', 'started');
+
+CREATE INDEX IF NOT EXISTS order_list_open_search_idx
+    ON order_list USING gin ((COALESCE(order_info, '') || ' ' || COALESCE(order_remark, '')) gin_trgm_ops)
+    WHERE order_status IN ('pending', 'started');
+
+COMMIT;
@@ -0,0 +1,141 @@
+-- ----------------------------
+-- 分区与归档（PostgreSQL）
+--
+--   psql "$DATABASE_URL" -f db/partition_archive.sql
+--
+-- 1. item 改为按 exetime 按月分区（item_pYYYYMM），无法归入已有分区的行进入 item_default
+-- 2. 新建归档表 order_list_archive / order_service_archive / item_archive
+-- 3. 未完成订单的部分索引，热点查询只扫描 pending / started 订单
+--
+-- 只需执行一次；之后的分区由应用启动时及每隔 PARTITION_CHECK_INTERVAL 秒
+-- 调用 ensure_item_partitions 提前创建（archive.start_partition_scheduler，始终开启）
+-- ----------------------------
+
+BEGIN;
+
+-- ----------------------------
+-- 按月创建 item 分区：从 start_month 所在月份到当前月份之后 months_ahead 个月
+--
+-- 默认分区 item_default 中已有某月的行时，直接 CREATE TABLE ... PARTITION OF 会失败，
+-- 因此先建独立表、把该月的行从默认分区移过去，再 ATTACH 为分区。
+-- 多个进程同时调用时由事务级 advisory lock 串行执行。
+-- 函数可重复执行本段更新（CREATE OR REPLACE）
+-- ----------------------------
+CREATE OR REPLACE FUNCTION ensure_item_partitions(start_month date, months_ahead integer)
+RETURNS integer AS $$
+DECLARE
+    month date := date_trunc('month', start_month)::date;
+    last_month date := (date_trunc('month', CURRENT_DATE) + make_interval(months => months_ahead))::date;
+    next_month date;
+    partition_name text;
+    created integer := 0;
+BEGIN
+    PERFORM pg_advisory_xact_lock(7350002);
+    WHILE month <= last_month LOOP
+        partition_name := 'item_p' || to_char(month, 'YYYYMM');
+        next_month := (month + interval '1 month')::date;
+        IF to_regclass(partition_name) IS NULL THEN
+            IF to_regclass('item_default') IS NULL THEN
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF item FOR VALUES FROM (%L) TO (%L)',
+                    partition_name, month, next_month
+                );
+            ELSE
+                -- 移动期间阻止写入默认分区
+                LOCK TABLE item_default IN SHARE ROW EXCLUSIVE MODE;
+                EXECUTE format(
+                    'CREATE TABLE %I (LIKE item INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+                    partition_name
+                );
+                EXECUTE format(
+                    'WITH moved AS (DELETE FROM item_default WHERE exetime >= %L AND exetime < %L RETURNING *) '
+                    'INSERT INTO %I SELECT * FROM moved',
+                    month, next_month, partition_name
+                );
+                EXECUTE format(
+                    'ALTER TABLE item ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                    partition_name, month, next_month
+                );
+            END IF;
+            created := created + 1;
+        END IF;
+        month := next_month;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ----------------------------
+-- item 分区表
+-- 分区键必须包含在主键中，exetime 为空的旧数据用订单购买日期补齐
+-- ----------------------------
+ALTER TABLE item RENAME TO item_unpartitioned;
+
+CREATE SEQUENCE item_id_seq;
+SELECT setval('item_id_seq', COALESCE(MAX(item_id), 0) + 1, false) FROM item_unpartitioned;
+
+CREATE TABLE item (
+    item_id integer NOT NULL DEFAULT nextval('item_id_seq'),
+    record_id integer NOT NULL,
+    service_id integer,
+    item_name varchar(255),
+    exetime date NOT NULL,
+    item_price numeric(10, 2),
+    item_remark varchar(255),
+    PRIMARY KEY (item_id, exetime)
+) PARTITION BY RANGE (exetime);
+
+ALTER SEQUENCE item_id_seq OWNED BY item.item_id;
+
+SELECT ensure_item_partitions(
+    COALESCE((SELECT MIN(COALESCE(i.exetime, o.order_buytime::date))
+              FROM item_unpartitioned i
+              LEFT JOIN order_list o ON o.order_id = i.record_id), CURRENT_DATE),
+    3
+);
+CREATE TABLE item_default PARTITION OF item DEFAULT;
+
+CREATE INDEX item_record_id_idx ON item (record_id, service_id);
+
+INSERT INTO item (item_id, record_id, service_id, item_name, exetime, item_price, item_remark)
+SELECT i.item_id, i.record_id, i.service_id, i.item_name,
+       COALESCE(i.exetime, o.order_buytime::date, CURRENT_DATE),
+       i.item_price, i.item_remark
+FROM item_unpartitioned i
+LEFT JOIN order_list o ON o.order_id = i.record_id;
+
+DROP TABLE item_unpartitioned;
+
+-- ----------------------------
+-- 归档表（结构与正式表一致，另记录归档时间）
+-- ----------------------------
+CREATE TABLE IF NOT EXISTS order_list_archive (
+    LIKE order_list,
+    archived_at timestamptz NOT NULL DEFAULT now(),
+    PRIMARY KEY (order_id)
+);
+
+CREATE TABLE IF NOT EXISTS order_service_archive (
+    LIKE order_service,
+    archived_at timestamptz NOT NULL DEFAULT now(),
+    PRIMARY KEY (id)
+);
+CREATE INDEX IF NOT EXISTS order_service_archive_order_id_idx ON order_service_archive (order_id);
+
+CREATE TABLE IF NOT EXISTS item_archive (
+    LIKE item,
+    archived_at timestamptz NOT NULL DEFAULT now(),
+    PRIMARY KEY (item_id)
+);
+CREATE INDEX IF NOT EXISTS item_archive_record_id_idx ON item_archive (record_id);
+CREATE INDEX IF NOT EXISTS item_archive_exetime_idx ON item_archive (exetime);
+
+-- ----------------------------
+-- 热点查询只关心未完成的订单
+-- ----------------------------
+CREATE INDEX IF NOT EXISTS order_list_open_idx ON order_list (order_id)
+    WHERE order_status IN ('pending', 'started');
+CREATE INDEX IF NOT EXISTS order_service_open_idx ON order_service (order_id, service_id)
+    WHERE service_status IN ('pending', 'started');
+
+COMMIT;
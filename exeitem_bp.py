@@ -1,578 +1,1177 @@
-from flask import Blueprint, render_template, request, jsonify, current_app
-from datetime import datetime
-from flask_login import current_user
-import psycopg2
-from psycopg2.extras import DictCursor
-
-# 创建项目执行蓝图
-exeitem_bp = Blueprint('exeitem_bp', __name__, url_prefix='/item')
-
-def get_db_connection():
-    """获取数据库连接 - 使用主应用的连接池"""
-    from main import DatabasePool
-    return DatabasePool.get_connection()
-
-def close_db_connection(conn):
-    """关闭数据库连接"""
-    from main import DatabasePool
-    DatabasePool.return_connection(conn)
-
-@exeitem_bp.route('/all')
-def exeitem_all():
-    """显示所有执行项目页面"""
-    return render_template('item/exeitems.html')
-
-@exeitem_bp.route('/api/items')
-def get_all_items():
-    """获取所有执行项目"""
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=DictCursor)
-
-        query = """
-            SELECT exetime, item_name, item_price, item_remark 
-            FROM item
-            ORDER BY exetime DESC
-        """
-
-        cursor.execute(query)
-        items = cursor.fetchall()
-
-        # 按日期分组并计算总价
-        grouped_items = {}
-
-        for item in items:
-            # PostgreSQL 的日期时间处理
-            if item['exetime']:
-                if isinstance(item['exetime'], datetime):
-                    date_str = item['exetime'].strftime('%Y-%m-%d')
-                else:
-                    date_str = str(item['exetime'])[:10]  # 取前10个字符作为日期
-            else:
-                date_str = '未知日期'
-
-            if date_str not in grouped_items:
-                grouped_items[date_str] = {
-                    'items': [],
-                    'total_price': 0
-                }
-            
-            # 添加当前item到分组
-            item_price = float(item['item_price']) if item['item_price'] is not None else 0
-            grouped_items[date_str]['items'].append({
-                'item_name': item['item_name'] or '未命名',
-                'item_price': item_price,
-                'item_remark': item['item_remark'] or ''
-            })
-
-            # 累加总价
-            grouped_items[date_str]['total_price'] += item_price
-
-        # 转换为前端易处理的列表格式
-        result = [
-            {
-                'date': date,
-                'items': group['items'],
-                'total_price': round(group['total_price'], 2)  # 保留两位小数
-            }
-            for date, group in grouped_items.items()
-        ]
-        
-        cursor.close()
-        close_db_connection(conn)
-
-        return jsonify({
-            'code': 0,
-            'data': result
-        })
-
-    except Exception as e:
-        current_app.logger.error(f"获取数据失败: {str(e)}")
-        return jsonify({
-            'code': 1,
-            'msg': f'获取数据失败: {str(e)}'
-        })
-
-@exeitem_bp.route('/api/started_items')
-def get_started_items():
-    """获取所有started状态的订单进度"""
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=DictCursor)
-
-        # 首先获取所有started状态的订单
-        order_query = """
-            SELECT order_id, order_info, order_price, order_disprice
-            FROM order_list 
-            WHERE order_status = 'started'
-            ORDER BY order_id
-        """
-        cursor.execute(order_query)
-        started_orders = cursor.fetchall()
-
-        result = []
-        
-        for order in started_orders:
-            order_id = order['order_id']
-            
-            # 获取这个订单对应的所有item（已执行的）
-            item_query = """
-                SELECT item_id, item_name, item_price, item_remark, exetime
-                FROM item 
-                WHERE record_id = %s
-                ORDER BY exetime DESC
-            """
-            cursor.execute(item_query, (order_id,))
-            order_items = cursor.fetchall()
-            
-            # 计算已使用金额和项目数量（处理None值）
-            used_amount = 0
-            for item in order_items:
-                if item['item_price'] is not None:
-                    used_amount += float(item['item_price'])
-            used_count = len(order_items)
-            
-            # 处理订单价格中的None值
-            order_price = float(order['order_price']) if order['order_price'] is not None else 0
-            order_disprice = float(order['order_disprice']) if order['order_disprice'] is not None else 0
-            
-            # 根据订单折扣价和已使用金额计算剩余金额
-            remaining_amount = order_disprice - used_amount
-            remaining_amount = max(remaining_amount, 0)  # 确保不为负数
-            
-            # 估算剩余项目数量（基于平均价格）
-            if used_count > 0 and used_amount > 0:
-                avg_price = used_amount / used_count
-                estimated_remaining_count = round(remaining_amount / avg_price) if avg_price > 0 else 0
-            else:
-                estimated_remaining_count = 0
-            
-            # 计算完成进度百分比
-            if order_disprice > 0:
-                progress_percentage = round((used_amount / order_disprice) * 100, 1)
-            else:
-                progress_percentage = 0
-            
-            # 格式化最近项目
-            recent_items = []
-            for item in order_items[:12]:  # 显示最近12个项目
-                recent_items.append({
-                    'item_id': item['item_id'],
-                    'item_name': item['item_name'] or '未命名',
-                    'item_price': float(item['item_price']) if item['item_price'] is not None else 0,
-                    'item_remark': item['item_remark'] or '',
-                    'exetime': item['exetime'].strftime('%Y-%m-%d %H:%M') if item['exetime'] else '-'
-                })
-            
-            result.append({
-                'order_id': order_id,
-                'order_info': order['order_info'] or '未命名订单',
-                'order_price': order_price,
-                'order_disprice': order_disprice,
-                'used_amount': round(used_amount, 2),
-                'used_count': used_count,
-                'remaining_amount': round(remaining_amount, 2),
-                'estimated_remaining_count': estimated_remaining_count,
-                'progress_percentage': progress_percentage,
-                'recent_items': recent_items
-            })
-        
-        cursor.close()
-        close_db_connection(conn)
-
-        return jsonify({
-            'code': 0,
-            'data': result
-        })
-
-    except Exception as e:
-        current_app.logger.error(f"获取进行中订单失败: {str(e)}")
-        return jsonify({
-            'code': 1,
-            'msg': f'获取进行中订单失败: {str(e)}'
-        })
-
-@exeitem_bp.route('/progress')
-def order_progress():
-    """显示订单进度页面"""
-    return render_template('item/started_items.html')
-
-@exeitem_bp.route('/api/orders')
-def get_orders():
-    """获取所有订单"""
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=DictCursor)
-        
-        # 只查询pending或started状态的订单
-        cursor.execute("""
-            SELECT order_id, order_info, order_status 
-            FROM order_list 
-            WHERE order_status IN ('pending', 'started')
-            ORDER BY order_status, order_id DESC
-        """)
-        orders = cursor.fetchall()
-        
-        cursor.close()
-        close_db_connection(conn)
-        
-        return jsonify({
-            'code': 0,
-            'data': orders
-        })
-        
-    except Exception as e:
-        current_app.logger.error(f"获取订单列表失败: {str(e)}")
-        return jsonify({
-            'code': 1,
-            'msg': f'获取订单列表失败: {str(e)}'
-        })
-
-@exeitem_bp.route('/api/order_services/<int:order_id>')
-def get_order_services(order_id):
-    """获取订单对应的服务项目"""
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=DictCursor)
-        
-        query = """
-            SELECT 
-                s.service_id,
-                s."desc" as service_desc,
-                s.package,
-                s.type,
-                s.part
-            FROM order_service os
-            JOIN service s ON os.service_id = s.service_id
-            WHERE os.order_id = %s
-        """
-        cursor.execute(query, (order_id,))
-        services = cursor.fetchall()
-        
-        cursor.close()
-        close_db_connection(conn)
-        
-        return jsonify({
-            'code': 0,
-            'data': services
-        })
-        
-    except Exception as e:
-        current_app.logger.error(f"获取订单服务失败: {str(e)}")
-        return jsonify({
-            'code': 1,
-            'msg': f'获取订单服务失败: {str(e)}'
-        })
-
-@exeitem_bp.route('/api/add', methods=['POST'])
-def add_exeitem():
-    """添加服务执行记录"""
-    conn = None
-    try:
-        data = request.get_json()
-        
-        # 验证必要字段
-        required_fields = ['record_id', 'service_id', 'item_name', 'item_price', 'exetime']
-        for field in required_fields:
-            if not data.get(field):
-                return jsonify({'code': 1, 'msg': f'缺少必要字段: {field}'})
-        
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # 1. 验证选择的service_id确实属于这个订单
-        validate_query = """
-            SELECT COUNT(*) as count 
-            FROM order_service 
-            WHERE order_id = %s AND service_id = %s
-        """
-        cursor.execute(validate_query, (int(data['record_id']), int(data['service_id'])))
-        validation_result = cursor.fetchone()
-        
-        if validation_result['count'] == 0:
-            return jsonify({
-                'code': 1, 
-                'msg': '选择的服务不属于该订单'
-            })
-        
-        # 2. 获取服务详细信息，用于填充item记录
-        service_query = """
-            SELECT s."desc", s.package, s.type, s.part, s.service_remark
-            FROM service s
-            WHERE s.service_id = %s
-        """
-        cursor.execute(service_query, (int(data['service_id']),))
-        service_info = cursor.fetchone()
-        
-        # 3. 如果用户没有填写item_name，使用服务描述作为默认值
-        item_name = data['item_name']
-        if not item_name and service_info:
-            item_name = service_info['desc']
-        
-        # 4. 插入执行记录
-        query = """
-            INSERT INTO item (record_id, service_id, item_name, item_price, item_remark, exetime)
-            VALUES (%s, %s, %s, %s, %s, %s)
-            RETURNING item_id
-        """
-        cursor.execute(query, (
-            int(data['record_id']),
-            int(data['service_id']),
-            item_name,
-            float(data['item_price']),
-            data.get('item_remark', ''),
-            data['exetime']
-        ))
-        
-        item_id = cursor.fetchone()[0]
-        
-        # 5. 更新order_service表中的完成数量
-        update_service_query = """
-            UPDATE order_service 
-            SET completed_quantity = COALESCE(completed_quantity, 0) + 1
-            WHERE order_id = %s AND service_id = %s
-        """
-        cursor.execute(update_service_query, (data['record_id'], data['service_id']))
-        
-        # 6. 检查并更新服务状态
-        check_status_query = """
-            UPDATE order_service 
-            SET service_status = CASE 
-                WHEN completed_quantity >= quantity THEN 'used'
-                WHEN completed_quantity > 0 THEN 'started'
-                ELSE 'pending'
-            END
-            WHERE order_id = %s AND service_id = %s
-        """
-        cursor.execute(check_status_query, (data['record_id'], data['service_id']))
-        
-        # 7. 更新订单状态
-        update_order_status(conn, data['record_id'])
-        
-        conn.commit()
-        cursor.close()
-        
-        return jsonify({
-            'code': 0,
-            'msg': '服务记录添加成功',
-            'data': {'item_id': item_id}
-        })
-        
-    except Exception as e:
-        if conn:
-            conn.rollback()
-        current_app.logger.error(f"添加服务记录失败: {str(e)}")
-        return jsonify({
-            'code': 1,
-            'msg': f'添加服务记录失败: {str(e)}'
-        })
-    finally:
-        if conn:
-            close_db_connection(conn)
-
-def update_order_status(conn, order_id):
-    """更新订单状态"""
-    cursor = conn.cursor()
-    
-    try:
-        # 1. 获取当前订单状态
-        cursor.execute("SELECT order_status FROM order_list WHERE order_id = %s", (order_id,))
-        current_order = cursor.fetchone()
-        if not current_order:
-            return
-        current_status = current_order[0]
-        
-        # 2. 检查订单中所有服务的完成情况 - 使用 'used' 作为完成状态
-        check_query = """
-            SELECT 
-                COUNT(*) as total_services,
-                SUM(CASE WHEN service_status = 'used' THEN 1 ELSE 0 END) as used_services,
-                SUM(CASE WHEN service_status = 'pending' THEN 1 ELSE 0 END) as pending_services,
-                SUM(CASE WHEN service_status = 'started' THEN 1 ELSE 0 END) as started_services
-            FROM order_service 
-            WHERE order_id = %s
-        """
-        cursor.execute(check_query, (order_id,))
-        result = cursor.fetchone()
-        
-        total_services = result[0] or 0
-        used_services = result[1] or 0
-        pending_services = result[2] or 0
-        started_services = result[3] or 0
-        
-        # 3. 根据完成情况更新订单状态
-        new_order_status = None
-        
-        if used_services == total_services:
-            # 所有服务都完成 -> used
-            new_order_status = 'used'
-        elif used_services > 0 or started_services > 0:
-            # 有服务完成或进行中 -> started
-            new_order_status = 'started'
-        elif pending_services == total_services:
-            # 所有服务都未完成 -> pending
-            new_order_status = 'pending'
-        
-        # 4. 更新订单状态
-        if new_order_status and new_order_status != current_status:
-            update_query = "UPDATE order_list SET order_status = %s WHERE order_id = %s"
-            cursor.execute(update_query, (new_order_status, order_id))
-            
-            # 记录状态变更日志
-            current_app.logger.info(f"订单 {order_id} 状态从 {current_status} 变更为 {new_order_status}")
-
-    except Exception as e:
-        current_app.logger.error(f"更新订单状态失败: {str(e)}")
-        raise e
-    finally:
-        cursor.close()
-
-@exeitem_bp.route('/add')
-def add_exeitem_page():
-    """添加服务记录页面"""
-    return render_template('item/add_exeitem.html')
-
-@exeitem_bp.route('/to_use_services')
-def to_use_services():
-    """显示所有待使用服务页面"""
-    return render_template('item/to_use_services.html')
-
-@exeitem_bp.route('/api/to_use_services')
-def get_to_use_services():
-    """获取所有待使用服务（pending和started订单）"""
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=DictCursor)
-        
-        # 查询pending和started状态的订单及其服务详情
-        query = """
-            SELECT 
-                ol.order_id,
-                ol.order_info,
-                ol.order_status as order_status,
-                ol.order_buytime,
-                s.service_id,
-                s."desc" as service_desc,
-                s.package,
-                s.type,
-                s.part,
-                os.service_status,
-                os.quantity,
-                os.completed_quantity,
-                (os.quantity - COALESCE(os.completed_quantity, 0)) as remaining_quantity,
-                (SELECT COUNT(*) FROM item i WHERE i.record_id = ol.order_id AND i.service_id = s.service_id) as used_count
-            FROM order_list ol
-            JOIN order_service os ON ol.order_id = os.order_id
-            JOIN service s ON os.service_id = s.service_id
-            WHERE ol.order_status IN ('pending', 'started')
-            ORDER BY 
-                ol.order_status DESC,
-                ol.order_id,
-                s.service_id
-        """
-        cursor.execute(query)
-        results = cursor.fetchall()
-        
-        # 按订单分组处理数据
-        orders = {}
-        for item in results:
-            order_id = item['order_id']
-            if order_id not in orders:
-                # 格式化日期
-                order_buytime = item['order_buytime']
-                if order_buytime:
-                    if isinstance(order_buytime, datetime):
-                        order_buytime_str = order_buytime.strftime('%Y-%m-%d %H:%M')
-                    else:
-                        order_buytime_str = str(order_buytime)[:19]
-                else:
-                    order_buytime_str = '-'
-                
-                orders[order_id] = {
-                    'order_id': order_id,
-                    'order_info': item['order_info'] or '未命名订单',
-                    'order_status': item['order_status'],
-                    'order_buytime': order_buytime_str,
-                    'services': []
-                }
-            
-            # 查询该服务下所有的item记录
-            item_query = """
-                SELECT item_id, item_name, item_price, exetime, item_remark
-                FROM item 
-                WHERE record_id = %s AND service_id = %s
-                ORDER BY exetime DESC
-            """
-            cursor.execute(item_query, (order_id, item['service_id']))
-            item_records = cursor.fetchall()
-            
-            # 格式化item记录
-            formatted_item_records = []
-            for item_record in item_records:
-                exetime = item_record['exetime']
-                if exetime:
-                    if isinstance(exetime, datetime):
-                        exetime_str = exetime.strftime('%Y-%m-%d %H:%M')
-                    else:
-                        exetime_str = str(exetime)[:19]
-                else:
-                    exetime_str = '-'
-                
-                formatted_item_records.append({
-                    'item_id': item_record['item_id'],
-                    'item_name': item_record['item_name'] or '未命名',
-                    'item_price': float(item_record['item_price']) if item_record['item_price'] is not None else 0,
-                    'exetime': exetime_str,
-                    'item_remark': item_record['item_remark'] or ''
-                })
-            
-            # 计算服务使用状态
-            service_status = item['service_status'] or 'pending'
-            used_count = item['used_count'] or 0
-            total_quantity = item['quantity'] or 1
-            completed_quantity = item['completed_quantity'] or 0
-            remaining = item['remaining_quantity'] or total_quantity
-            
-            # 确定显示状态
-            display_status = service_status
-            if service_status == 'started' and used_count > 0:
-                display_status = 'used'
-            
-            # 计算进度
-            progress = 0
-            if total_quantity > 0:
-                progress = round((completed_quantity / total_quantity) * 100, 1)
-            
-            orders[order_id]['services'].append({
-                'service_id': item['service_id'],
-                'service_desc': item['service_desc'] or '未命名服务',
-                'package': item['package'] or '',
-                'type': item['type'] or '',
-                'part': item['part'] or '',
-                'service_status': service_status,
-                'display_status': display_status,
-                'quantity': total_quantity,
-                'completed_quantity': completed_quantity,
-                'remaining_quantity': remaining,
-                'used_count': used_count,
-                'item_records': formatted_item_records,
-                'progress': progress
-            })
-        
-        # 转换为列表
-        orders_list = list(orders.values())
-        
-        cursor.close()
-        close_db_connection(conn)
-        
-        return jsonify({
-            'code': 0,
-            'data': orders_list
-        })
-        
-    except Exception as e:
-        current_app.logger.error(f"获取待使用服务失败: {str(e)}")
-        return jsonify({
-            'code': 1,
-            'msg': f'获取待使用服务失败: {str(e)}'
-        })
+from flask import Blueprint, render_template, request, jsonify, current_app
+from datetime import datetime
+from flask_login import current_user
+import psycopg2
+from psycopg2.extras import DictCursor
+from row_format import (
+    row_mapper, map_rows, fmt_time, to_float,
+    as_text, as_float, as_time, DATE_FMT, MINUTE_FMT,
+    record_type, fetch_records, record_mapper,
+    parse_fields, select_fields, wants_flag,
+)
+from copy_export import stream_copy, export_filename
+from archive import wants_archived, table_source
+from cache import cache
+from breaker import CircuitOpenError
+from admission import admit, PRIORITY_WRITE, PRIORITY_READ, PRIORITY_POLL
+from idempotency import idempotency, IdempotencyError, error_response
+from changes import change_log
+import prepared
+
+# 创建项目执行蓝图
+exeitem_bp = Blueprint('exeitem_bp', __name__, url_prefix='/item')
+
+# ==================== 行格式 ====================
+# 订单进度中的最近项目
+RECENT_ITEM_ROW = row_mapper(
+    ('item_id', 'item_id', None),
+    ('item_name', 'item_name', as_text('未命名')),
+    ('item_price', 'item_price', as_float()),
+    ('item_remark', 'item_remark', as_text('')),
+    ('exetime', 'exetime', as_time(MINUTE_FMT)),
+)
+
+# 服务下的执行记录（普通元组游标）
+ItemRecord = record_type('ItemRecord', ['item_id', 'item_name', 'item_price', 'exetime', 'item_remark'])
+ITEM_RECORD_ROW = record_mapper(
+    ItemRecord,
+    ('item_id', 'item_id', None),
+    ('item_name', 'item_name', as_text('未命名')),
+    ('item_price', 'item_price', as_float()),
+    ('exetime', 'exetime', as_time(MINUTE_FMT)),
+    ('item_remark', 'item_remark', as_text('')),
+)
+
+# 待使用服务查询行（普通元组游标）
+ToUseServiceRecord = record_type('ToUseServiceRecord', [
+    'order_id', 'order_info', 'order_status', 'order_buytime',
+    'service_id', 'service_desc', 'package', 'type', 'part',
+    'service_status', 'quantity', 'completed_quantity', 'remaining_quantity', 'used_count',
+])
+
+# 可选订单
+ORDER_OPTION_ROW = row_mapper(
+    ('order_id', 'order_id', None),
+    ('order_info', 'order_info', None),
+    ('order_status', 'order_status', None),
+)
+
+# 订单服务项目
+ORDER_SERVICE_ROW = row_mapper(
+    ('service_id', 'service_id', None),
+    ('service_desc', 'service_desc', None),
+    ('package', 'package', None),
+    ('type', 'type', None),
+    ('part', 'part', None),
+)
+
+# ==================== 预编译语句 ====================
+ORDER_SERVICES_SQL = """
+    SELECT s.service_id, s."desc" AS service_desc, s.package, s.type, s.part
+    FROM order_service os
+    JOIN service s ON os.service_id = s.service_id
+    WHERE os.order_id = %s
+"""
+prepared.register('order_services', ORDER_SERVICES_SQL)
+prepared.register('validate_order_service', """
+    SELECT COUNT(*) FROM order_service WHERE order_id = %s AND service_id = %s
+""")
+prepared.register('service_info', """
+    SELECT s."desc", s.package, s.type, s.part, s.service_remark
+    FROM service s
+    WHERE s.service_id = %s
+""")
+prepared.register('insert_item', """
+    INSERT INTO item (record_id, service_id, item_name, item_price, item_remark, exetime)
+    VALUES (%s, %s, %s, %s, %s, %s)
+    RETURNING item_id
+""")
+prepared.register('incr_completed', """
+    UPDATE order_service
+    SET completed_quantity = COALESCE(completed_quantity, 0) + 1
+    WHERE order_id = %s AND service_id = %s
+""")
+prepared.register('refresh_service_status', """
+    UPDATE order_service
+    SET service_status = CASE
+        WHEN completed_quantity >= quantity THEN 'used'
+        WHEN completed_quantity > 0 THEN 'started'
+        ELSE 'pending'
+    END
+    WHERE order_id = %s AND service_id = %s
+""")
+prepared.register('order_status', "SELECT order_status FROM order_list WHERE order_id = %s")
+prepared.register('order_service_progress', """
+    SELECT
+        COUNT(*),
+        SUM(CASE WHEN service_status = 'used' THEN 1 ELSE 0 END),
+        SUM(CASE WHEN service_status = 'pending' THEN 1 ELSE 0 END),
+        SUM(CASE WHEN service_status = 'started' THEN 1 ELSE 0 END)
+    FROM order_service
+    WHERE order_id = %s
+""")
+prepared.register('set_order_status', "UPDATE order_list SET order_status = %s WHERE order_id = %s")
+
+def get_db_connection():
+    """获取数据库连接 - 使用主应用的连接池（GET 请求走只读副本）"""
+    from main import DatabasePool, use_read_replica
+    return DatabasePool.get_connection(readonly=use_read_replica())
+
+def close_db_connection(conn, close=False):
+    """关闭数据库连接"""
+    from main import DatabasePool
+    DatabasePool.return_connection(conn, close)
+
+@exeitem_bp.route('/all')
+def exeitem_all():
+    """显示所有执行项目页面"""
+    return render_template('item/exeitems.html')
+
+# 执行记录（按日期倒序），{source} 为 item 表（可能包含归档）
+ITEMS_BY_DATE_SQL = """
+    SELECT exetime, item_name, item_price, item_remark 
+    FROM {source}
+    ORDER BY exetime DESC
+"""
+
+def group_items_by_date(rows):
+    """按日期分组并计算总价，rows 为 (exetime, item_name, item_price, item_remark)"""
+    grouped_items = {}
+    # 同一天的记录很多，日期文本只格式化一次
+    date_texts = {}
+
+    for exetime, item_name, item_price, item_remark in rows:
+        # PostgreSQL 的日期时间处理
+        date_str = date_texts.get(exetime)
+        if date_str is None:
+            date_str = date_texts[exetime] = fmt_time(exetime, DATE_FMT, '未知日期')
+
+        group = grouped_items.get(date_str)
+        if group is None:
+            group = grouped_items[date_str] = {
+                'items': [],
+                'total_price': 0
+            }
+        
+        # 添加当前item到分组
+        item_price = to_float(item_price)
+        group['items'].append({
+            'item_name': item_name or '未命名',
+            'item_price': item_price,
+            'item_remark': item_remark or ''
+        })
+
+        # 累加总价
+        group['total_price'] += item_price
+
+    # 转换为前端易处理的列表格式
+    return [
+        {
+            'date': date,
+            'items': group['items'],
+            'total_price': round(group['total_price'], 2)  # 保留两位小数
+        }
+        for date, group in grouped_items.items()
+    ]
+
+@exeitem_bp.route('/api/items')
+@admit(PRIORITY_READ)
+def get_all_items():
+    """获取所有执行项目"""
+    try:
+        conn = get_db_connection()
+        # 普通游标：每行只是一个 tuple，直接解包
+        cursor = conn.cursor()
+
+        # include_archived=1 时合并归档的执行记录
+        cursor.execute(ITEMS_BY_DATE_SQL.format(source=table_source('item', wants_archived(request.args))))
+        result = group_items_by_date(cursor)
+        
+        cursor.close()
+        close_db_connection(conn)
+
+        return jsonify({
+            'code': 0,
+            'data': result
+        })
+
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        current_app.logger.error(f"获取数据失败: {str(e)}")
+        return jsonify({
+            'code': 1,
+            'msg': f'获取数据失败: {str(e)}'
+        })
+
+def items_export_query(args):
+    """执行记录导出查询：start / end 为执行日期范围（YYYY-MM-DD，包含两端），
+    关联订单信息与服务名称"""
+    where_conditions = []
+    params = []
+    
+    start = args.get('start', '')
+    if start:
+        where_conditions.append("i.exetime >= %s::date")
+        params.append(start)
+    end = args.get('end', '')
+    if end:
+        where_conditions.append("i.exetime < %s::date + 1")
+        params.append(end)
+    
+    where_clause = "WHERE " + " AND ".join(where_conditions) if where_conditions else ""
+    include_archived = wants_archived(args)
+    
+    query = f"""
+        SELECT 
+            i.item_id AS "记录ID",
+            to_char(i.exetime, 'YYYY-MM-DD') AS "执行日期",
+            i.record_id AS "订单ID",
+            ol.order_info AS "订单信息",
+            i.service_id AS "服务ID",
+            s."desc" AS "服务名称",
+            s.package AS "套餐",
+            i.item_name AS "服务记录",
+            i.item_price AS "项目单价",
+            i.item_remark AS "备注"
+        FROM {table_source('item', include_archived, 'i')}
+        LEFT JOIN {table_source('order_list', include_archived, 'ol')} ON ol.order_id = i.record_id
+        LEFT JOIN service s ON s.service_id = i.service_id
+        {where_clause}
+        ORDER BY i.exetime, i.item_id
+    """
+    return query, params
+
+@exeitem_bp.route('/api/export')
+@admit(PRIORITY_READ, limit=2)
+def export_items():
+    """导出服务执行记录（CSV，format=excel 时带 BOM 便于 Excel 打开）
+
+    由 PostgreSQL COPY 直接流式输出；数据量很大时可改用后台任务（/jobs）。
+    """
+    conn = None
+    try:
+        query, params = items_export_query(request.args)
+        conn = get_db_connection()
+        return stream_copy(
+            conn, close_db_connection, query, params,
+            export_filename('items'),
+            excel=request.args.get('format') == 'excel'
+        )
+
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        if conn:
+            close_db_connection(conn)
+        current_app.logger.error(f"导出服务记录失败: {str(e)}")
+        return jsonify({
+            'code': 1,
+            'msg': f'导出失败: {str(e)}'
+        })
+
+# 所有started状态的订单
+STARTED_ORDERS_SQL = """
+    SELECT order_id, order_info, order_price, order_disprice
+    FROM order_list 
+    WHERE order_status = 'started'
+    ORDER BY order_id
+"""
+
+# 订单对应的所有item（已执行的）
+ORDER_ITEMS_SQL = """
+    SELECT item_id, item_name, item_price, item_remark, exetime
+    FROM item 
+    WHERE record_id = %s
+    ORDER BY exetime DESC
+"""
+
+# 进行中订单的汇总（不含最近项目，执行记录在数据库中聚合）
+STARTED_SUMMARY_SQL = """
+    SELECT ol.order_id, ol.order_info, ol.order_price, ol.order_disprice,
+           COUNT(i.item_id) AS used_count,
+           COALESCE(SUM(i.item_price), 0) AS used_amount
+    FROM order_list ol
+    LEFT JOIN item i ON i.record_id = ol.order_id
+    WHERE ol.order_status = 'started'
+    GROUP BY ol.order_id
+    ORDER BY ol.order_id
+"""
+
+# started_items 可选字段（?fields=）
+STARTED_ITEM_FIELDS = (
+    'order_id', 'order_info', 'order_price', 'order_disprice', 'used_amount', 'used_count',
+    'remaining_amount', 'estimated_remaining_count', 'progress_percentage', 'recent_items',
+)
+
+def build_started_order(order, order_items):
+    """计算单个进行中订单的进度，order_items 按执行时间倒序"""
+    # 计算已使用金额和项目数量（处理None值）
+    used_amount = sum(to_float(item['item_price']) for item in order_items)
+    progress = started_progress(order, used_amount, len(order_items))
+    # 格式化最近项目
+    progress['recent_items'] = map_rows(order_items[:12], RECENT_ITEM_ROW)  # 显示最近12个项目
+    return progress
+
+def started_progress(order, used_amount, used_count):
+    """根据已使用金额与次数计算订单进度（不含最近项目）"""
+    used_amount = to_float(used_amount)
+    
+    # 处理订单价格中的None值
+    order_price = to_float(order['order_price'])
+    order_disprice = to_float(order['order_disprice'])
+    
+    # 根据订单折扣价和已使用金额计算剩余金额
+    remaining_amount = order_disprice - used_amount
+    remaining_amount = max(remaining_amount, 0)  # 确保不为负数
+    
+    # 估算剩余项目数量（基于平均价格）
+    if used_count > 0 and used_amount > 0:
+        avg_price = used_amount / used_count
+        estimated_remaining_count = round(remaining_amount / avg_price) if avg_price > 0 else 0
+    else:
+        estimated_remaining_count = 0
+    
+    # 计算完成进度百分比
+    if order_disprice > 0:
+        progress_percentage = round((used_amount / order_disprice) * 100, 1)
+    else:
+        progress_percentage = 0
+    
+    return {
+        'order_id': order['order_id'],
+        'order_info': order['order_info'] or '未命名订单',
+        'order_price': order_price,
+        'order_disprice': order_disprice,
+        'used_amount': round(used_amount, 2),
+        'used_count': used_count,
+        'remaining_amount': round(remaining_amount, 2),
+        'estimated_remaining_count': estimated_remaining_count,
+        'progress_percentage': progress_percentage,
+    }
+
+def load_started_items():
+    """查询所有started状态的订单进度"""
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor(cursor_factory=DictCursor)
+
+        # 首先获取所有started状态的订单
+        cursor.execute(STARTED_ORDERS_SQL)
+        started_orders = cursor.fetchall()
+
+        result = []
+        
+        for order in started_orders:
+            cursor.execute(ORDER_ITEMS_SQL, (order['order_id'],))
+            result.append(build_started_order(order, cursor.fetchall()))
+        
+        cursor.close()
+    finally:
+        close_db_connection(conn)
+
+    return result
+
+def load_started_summary():
+    """查询所有started状态的订单进度汇总（一次聚合查询）"""
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor(cursor_factory=DictCursor)
+        cursor.execute(STARTED_SUMMARY_SQL)
+        result = [
+            started_progress(order, order['used_amount'], order['used_count'])
+            for order in cursor.fetchall()
+        ]
+        cursor.close()
+    finally:
+        close_db_connection(conn)
+    return result
+
+@exeitem_bp.route('/api/started_items')
+@admit(PRIORITY_POLL)
+def get_started_items():
+    """获取所有started状态的订单进度（缓存，订单或执行记录写入后失效）
+
+    summary=1 时不返回最近项目，只做一次聚合查询；fields=a,b 只返回指定字段
+    """
+    try:
+        fields = parse_fields(request.args, STARTED_ITEM_FIELDS)
+        if wants_flag(request.args, 'summary'):
+            data = cache.get_or_load('orders', 'started_items:summary', load_started_summary)
+        else:
+            data = cache.get_or_load('orders', 'started_items', load_started_items)
+        return jsonify({
+            'code': 0,
+            'data': select_fields(data, fields)
+        })
+
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        current_app.logger.error(f"获取进行中订单失败: {str(e)}")
+        return jsonify({
+            'code': 1,
+            'msg': f'获取进行中订单失败: {str(e)}'
+        })
+
+@exeitem_bp.route('/progress')
+def order_progress():
+    """显示订单进度页面"""
+    return render_template('item/started_items.html')
+
+# 只查询pending或started状态的订单
+ORDER_OPTIONS_SQL = """
+    SELECT order_id, order_info, order_status 
+    FROM order_list 
+    WHERE order_status IN ('pending', 'started')
+    ORDER BY order_status, order_id DESC
+"""
+
+@exeitem_bp.route('/api/orders')
+@admit(PRIORITY_READ)
+def get_orders():
+    """获取所有订单"""
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor(cursor_factory=DictCursor)
+        
+        cursor.execute(ORDER_OPTIONS_SQL)
+        orders = map_rows(cursor.fetchall(), ORDER_OPTION_ROW)
+        
+        cursor.close()
+        close_db_connection(conn)
+        
+        return jsonify({
+            'code': 0,
+            'data': orders
+        })
+        
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        current_app.logger.error(f"获取订单列表失败: {str(e)}")
+        return jsonify({
+            'code': 1,
+            'msg': f'获取订单列表失败: {str(e)}'
+        })
+
+@exeitem_bp.route('/api/order_services/<int:order_id>')
+@admit(PRIORITY_READ)
+def get_order_services(order_id):
+    """获取订单对应的服务项目"""
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor(cursor_factory=DictCursor)
+        
+        prepared.execute(cursor, 'order_services', (order_id,))
+        services = map_rows(cursor.fetchall(), ORDER_SERVICE_ROW)
+        
+        cursor.close()
+        close_db_connection(conn)
+        
+        return jsonify({
+            'code': 0,
+            'data': services
+        })
+        
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        current_app.logger.error(f"获取订单服务失败: {str(e)}")
+        return jsonify({
+            'code': 1,
+            'msg': f'获取订单服务失败: {str(e)}'
+        })
+
+# ==================== 订单搜索 ====================
+# 搜索结果条数
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 50
+
+# 未完成订单按ID前缀或订单信息、备注搜索（索引见 db/order_search.sql）
+ORDER_SEARCH_SQL = """
+    SELECT order_id, order_info, order_status
+    FROM order_list
+    WHERE order_status IN ('pending', 'started')
+      AND (order_id::text LIKE %(prefix)s
+           OR (COALESCE(order_info, '') || ' ' || COALESCE(order_remark, '')) ILIKE %(pattern)s)
+    ORDER BY order_id::text LIKE %(prefix)s DESC, order_id DESC
+    LIMIT %(limit)s
+"""
+
+# 不带关键字时返回最新的未完成订单
+RECENT_OPEN_ORDERS_SQL = """
+    SELECT order_id, order_info, order_status
+    FROM order_list
+    WHERE order_status IN ('pending', 'started')
+    ORDER BY order_id DESC
+    LIMIT %s
+"""
+
+# 搜索结果订单的服务项目
+SEARCH_ORDER_SERVICES_SQL = """
+    SELECT os.order_id, s.service_id, s."desc" AS service_desc, s.package, s.type, s.part
+    FROM order_service os
+    JOIN service s ON os.service_id = s.service_id
+    WHERE os.order_id = ANY(%s)
+    ORDER BY os.order_id, s.service_id
+"""
+
+def like_escape(value):
+    """转义 LIKE 通配符"""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+@exeitem_bp.route('/api/orders/search')
+@admit(PRIORITY_READ)
+def search_orders():
+    """搜索未完成的订单（q 为订单ID前缀或订单信息、备注中的关键字），结果附带服务项目"""
+    try:
+        q = request.args.get('q', '').strip()
+        try:
+            limit = min(max(int(request.args.get('limit', SEARCH_DEFAULT_LIMIT)), 1), SEARCH_MAX_LIMIT)
+        except ValueError:
+            limit = SEARCH_DEFAULT_LIMIT
+        
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor(cursor_factory=DictCursor)
+            
+            if q:
+                escaped = like_escape(q)
+                # 只有纯数字才可能匹配订单ID前缀
+                cursor.execute(ORDER_SEARCH_SQL, {
+                    'prefix': escaped + '%' if q.isdigit() else '',
+                    'pattern': '%' + escaped + '%',
+                    'limit': limit,
+                })
+            else:
+                cursor.execute(RECENT_OPEN_ORDERS_SQL, (limit,))
+            orders = map_rows(cursor.fetchall(), ORDER_OPTION_ROW)
+            
+            services = {order['order_id']: [] for order in orders}
+            if orders:
+                cursor.execute(SEARCH_ORDER_SERVICES_SQL, (list(services),))
+                for row in cursor.fetchall():
+                    services[row['order_id']].append(ORDER_SERVICE_ROW(row))
+            for order in orders:
+                order['services'] = services[order['order_id']]
+            
+            cursor.close()
+        finally:
+            close_db_connection(conn)
+        
+        return jsonify({
+            'code': 0,
+            'data': orders
+        })
+        
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        current_app.logger.error(f"搜索订单失败: {str(e)}")
+        return jsonify({
+            'code': 1,
+            'msg': f'搜索订单失败: {str(e)}'
+        })
+
+@exeitem_bp.route('/api/add', methods=['POST'])
+@admit(PRIORITY_WRITE)
+def add_exeitem():
+    """添加服务执行记录（支持 Idempotency-Key，重试不会重复累加完成数量）"""
+    conn = None
+    try:
+        data = request.get_json()
+        idempotency_key = idempotency.request_key('item.add')
+        
+        # 验证必要字段
+        required_fields = ['record_id', 'service_id', 'item_name', 'item_price', 'exetime']
+        for field in required_fields:
+            if not data.get(field):
+                return jsonify({'code': 1, 'msg': f'缺少必要字段: {field}'})
+        
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        # 同一个幂等键已经添加过：不再写入，直接返回第一次的结果
+        replay = idempotency.claim(cursor, idempotency_key)
+        if replay is not None:
+            conn.rollback()
+            return replay
+        
+        # 1. 验证选择的service_id确实属于这个订单
+        prepared.execute(cursor, 'validate_order_service', (int(data['record_id']), int(data['service_id'])))
+        validation_result = cursor.fetchone()
+        
+        if validation_result[0] == 0:
+            conn.rollback()
+            return jsonify({
+                'code': 1, 
+                'msg': '选择的服务不属于该订单'
+            })
+        
+        # 2. 获取服务详细信息，用于填充item记录
+        prepared.execute(cursor, 'service_info', (int(data['service_id']),))
+        service_info = cursor.fetchone()
+        
+        # 3. 如果用户没有填写item_name，使用服务描述作为默认值
+        item_name = data['item_name']
+        if not item_name and service_info:
+            item_name = service_info[0]
+        
+        # 4. 插入执行记录
+        prepared.execute(cursor, 'insert_item', (
+            int(data['record_id']),
+            int(data['service_id']),
+            item_name,
+            float(data['item_price']),
+            data.get('item_remark', ''),
+            data['exetime']
+        ))
+        
+        item_id = cursor.fetchone()[0]
+        
+        # 5. 更新order_service表中的完成数量
+        prepared.execute(cursor, 'incr_completed', (data['record_id'], data['service_id']))
+        
+        # 6. 检查并更新服务状态
+        prepared.execute(cursor, 'refresh_service_status', (data['record_id'], data['service_id']))
+        
+        # 7. 更新订单状态
+        update_order_status(conn, data['record_id'])
+        
+        result = {
+            'code': 0,
+            'msg': '服务记录添加成功',
+            'data': {'item_id': item_id}
+        }
+        idempotency.save(cursor, idempotency_key, result)
+        change_log.record_item(cursor, item_id, int(data['record_id']))
+        
+        conn.commit()
+        cursor.close()
+        cache.invalidate('orders')
+        
+        return jsonify(result)
+        
+    except IdempotencyError as e:
+        if conn:
+            conn.rollback()
+        return error_response(e)
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        current_app.logger.error(f"添加服务记录失败: {str(e)}")
+        return jsonify({
+            'code': 1,
+            'msg': f'添加服务记录失败: {str(e)}'
+        })
+    finally:
+        if conn:
+            close_db_connection(conn)
+
+def update_order_status(conn, order_id):
+    """更新订单状态"""
+    cursor = conn.cursor()
+    
+    try:
+        # 1. 获取当前订单状态
+        prepared.execute(cursor, 'order_status', (order_id,))
+        current_order = cursor.fetchone()
+        if not current_order:
+            return
+        current_status = current_order[0]
+        
+        # 2. 检查订单中所有服务的完成情况 - 使用 'used' 作为完成状态
+        prepared.execute(cursor, 'order_service_progress', (order_id,))
+        result = cursor.fetchone()
+        
+        total_services = result[0] or 0
+        used_services = result[1] or 0
+        pending_services = result[2] or 0
+        started_services = result[3] or 0
+        
+        # 3. 根据完成情况更新订单状态
+        new_order_status = None
+        
+        if used_services == total_services:
+            # 所有服务都完成 -> used
+            new_order_status = 'used'
+        elif used_services > 0 or started_services > 0:
+            # 有服务完成或进行中 -> started
+            new_order_status = 'started'
+        elif pending_services == total_services:
+            # 所有服务都未完成 -> pending
+            new_order_status = 'pending'
+        
+        # 4. 更新订单状态
+        if new_order_status and new_order_status != current_status:
+            prepared.execute(cursor, 'set_order_status', (new_order_status, order_id))
+            
+            # 记录状态变更日志
+            current_app.logger.info(f"订单 {order_id} 状态从 {current_status} 变更为 {new_order_status}")
+
+    except Exception as e:
+        current_app.logger.error(f"更新订单状态失败: {str(e)}")
+        raise e
+    finally:
+        cursor.close()
+
+def refresh_orders_bulk(cursor, order_ids):
+    """批量重算订单进度（集合操作版 update_order_status）
+
+    1. completed_quantity 按 item 记录数重算
+    2. service_status 按完成数量重算（与 add_exeitem 规则相同）
+    3. order_status 按服务完成情况重算（与 update_order_status 规则相同），
+       已取消的订单保持不变
+
+    返回状态发生变化的订单数。
+    """
+    if not order_ids:
+        return 0
+    order_ids = list(order_ids)
+
+    cursor.execute("""
+        UPDATE order_service os
+        SET completed_quantity = (
+            SELECT COUNT(*) FROM item i
+            WHERE i.record_id = os.order_id AND i.service_id = os.service_id
+        )
+        WHERE os.order_id = ANY(%s)
+    """, (order_ids,))
+
+    cursor.execute("""
+        UPDATE order_service 
+        SET service_status = CASE 
+            WHEN completed_quantity >= quantity THEN 'used'
+            WHEN completed_quantity > 0 THEN 'started'
+            ELSE 'pending'
+        END
+        WHERE order_id = ANY(%s)
+    """, (order_ids,))
+
+    cursor.execute("""
+        WITH stats AS (
+            SELECT 
+                order_id,
+                COUNT(*) AS total_services,
+                SUM(CASE WHEN service_status = 'used' THEN 1 ELSE 0 END) AS used_services,
+                SUM(CASE WHEN service_status = 'pending' THEN 1 ELSE 0 END) AS pending_services,
+                SUM(CASE WHEN service_status = 'started' THEN 1 ELSE 0 END) AS started_services
+            FROM order_service
+            WHERE order_id = ANY(%s)
+            GROUP BY order_id
+        ), target AS (
+            SELECT 
+                order_id,
+                CASE 
+                    WHEN used_services = total_services THEN 'used'
+                    WHEN used_services > 0 OR started_services > 0 THEN 'started'
+                    WHEN pending_services = total_services THEN 'pending'
+                END AS new_status
+            FROM stats
+        )
+        UPDATE order_list ol
+        SET order_status = target.new_status
+        FROM target
+        WHERE ol.order_id = target.order_id
+          AND target.new_status IS NOT NULL
+          AND ol.order_status IS DISTINCT FROM target.new_status
+          AND COALESCE(ol.order_status, '') NOT IN ('cancel', 'cancelled')
+    """, (order_ids,))
+    return cursor.rowcount
+
+@exeitem_bp.route('/add')
+def add_exeitem_page():
+    """添加服务记录页面"""
+    return render_template('item/add_exeitem.html')
+
+@exeitem_bp.route('/to_use_services')
+def to_use_services():
+    """显示所有待使用服务页面"""
+    return render_template('item/to_use_services.html')
+
+# pending和started状态的订单及其服务详情（{order_filter} 用于增量同步时只查询变化的订单）
+TO_USE_SERVICES_QUERY = """
+    SELECT 
+        ol.order_id,
+        ol.order_info,
+        ol.order_status as order_status,
+        ol.order_buytime,
+        s.service_id,
+        s."desc" as service_desc,
+        s.package,
+        s.type,
+        s.part,
+        os.service_status,
+        os.quantity,
+        os.completed_quantity,
+        (os.quantity - COALESCE(os.completed_quantity, 0)) as remaining_quantity,
+        (SELECT COUNT(*) FROM item i WHERE i.record_id = ol.order_id AND i.service_id = s.service_id) as used_count
+    FROM order_list ol
+    JOIN order_service os ON ol.order_id = os.order_id
+    JOIN service s ON os.service_id = s.service_id
+    WHERE ol.order_status IN ('pending', 'started'){order_filter}
+    ORDER BY 
+        ol.order_status DESC,
+        ol.order_id,
+        s.service_id
+"""
+TO_USE_SERVICES_SQL = TO_USE_SERVICES_QUERY.format(order_filter='')
+
+def build_to_use_services(results, service_items=None):
+    """按订单分组待使用服务
+
+    results 为 ToUseServiceRecord 列表，service_items(order_id, service_id)
+    返回该服务的执行记录行（item_id, item_name, item_price, exetime, item_remark）；
+    service_items 为 None 时不附带执行记录（item_records），由前端展开时分页加载
+    """
+    orders = {}
+    for item in results:
+        order_id = item.order_id
+        if order_id not in orders:
+            orders[order_id] = {
+                'order_id': order_id,
+                'order_info': item.order_info or '未命名订单',
+                'order_status': item.order_status,
+                'order_buytime': fmt_time(item.order_buytime, MINUTE_FMT),
+                'services': []
+            }
+        
+        # 计算服务使用状态
+        service_status = item.service_status or 'pending'
+        used_count = item.used_count or 0
+        total_quantity = item.quantity or 1
+        completed_quantity = item.completed_quantity or 0
+        remaining = item.remaining_quantity or total_quantity
+        
+        # 确定显示状态
+        display_status = service_status
+        if service_status == 'started' and used_count > 0:
+            display_status = 'used'
+        
+        # 计算进度
+        progress = 0
+        if total_quantity > 0:
+            progress = round((completed_quantity / total_quantity) * 100, 1)
+        
+        service = {
+            'service_id': item.service_id,
+            'service_desc': item.service_desc or '未命名服务',
+            'package': item.package or '',
+            'type': item.type or '',
+            'part': item.part or '',
+            'service_status': service_status,
+            'display_status': display_status,
+            'quantity': total_quantity,
+            'completed_quantity': completed_quantity,
+            'remaining_quantity': remaining,
+            'used_count': used_count,
+            'progress': progress
+        }
+        if service_items is not None:
+            service['item_records'] = map_rows(service_items(order_id, item.service_id), ITEM_RECORD_ROW)
+        orders[order_id]['services'].append(service)
+    
+    # 转换为列表
+    return list(orders.values())
+
+# to_use_services 可选字段（?fields=），services 之后为 summary=1 时的汇总字段
+TO_USE_FIELDS = (
+    'order_id', 'order_info', 'order_status', 'order_buytime', 'services',
+    'service_count', 'quantity', 'completed_quantity', 'remaining_quantity', 'used_count', 'progress',
+)
+
+# 多个订单的全部执行记录（后 5 列与 ItemRecord 相同）
+ORDERS_ITEMS_SQL = """
+    SELECT record_id, service_id, item_id, item_name, item_price, exetime, item_remark
+    FROM item
+    WHERE record_id = ANY(%s)
+    ORDER BY exetime DESC
+"""
+
+def summarize_to_use_services(orders):
+    """只保留每个订单的服务数量与使用次数汇总"""
+    result = []
+    for order in orders:
+        services = order['services']
+        quantity = sum(service['quantity'] for service in services)
+        completed = sum(service['completed_quantity'] for service in services)
+        result.append({
+            'order_id': order['order_id'],
+            'order_info': order['order_info'],
+            'order_status': order['order_status'],
+            'order_buytime': order['order_buytime'],
+            'service_count': len(services),
+            'quantity': quantity,
+            'completed_quantity': completed,
+            'remaining_quantity': sum(service['remaining_quantity'] for service in services),
+            'used_count': sum(service['used_count'] for service in services),
+            'progress': round(completed / quantity * 100, 1) if quantity > 0 else 0,
+        })
+    return result
+
+def items_by_service(cursor, order_ids):
+    """(订单ID, 服务ID) -> 执行记录行，一次查询取完"""
+    grouped = {}
+    if order_ids:
+        cursor.execute(ORDERS_ITEMS_SQL, (list(order_ids),))
+        for row in cursor.fetchall():
+            grouped.setdefault((row[0], row[1]), []).append(row[2:])
+    return grouped
+
+@exeitem_bp.route('/api/to_use_services')
+@admit(PRIORITY_POLL)
+def get_to_use_services():
+    """获取所有待使用服务（pending和started订单）
+
+    默认不附带执行记录，展开时调用 /api/service_items 分页加载；
+    history=1 时附带全部执行记录（item_records），summary=1 时每个订单只返回汇总，
+    fields=a,b 只返回指定字段
+    """
+    try:
+        fields = parse_fields(request.args, TO_USE_FIELDS)
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            
+            cursor.execute(TO_USE_SERVICES_SQL)
+            results = fetch_records(cursor, ToUseServiceRecord)
+            
+            service_items = None
+            if wants_flag(request.args, 'history'):
+                grouped = items_by_service(cursor, {item.order_id for item in results})
+                service_items = lambda order_id, service_id: grouped.get((order_id, service_id), [])
+            orders_list = build_to_use_services(results, service_items)
+            
+            cursor.close()
+        finally:
+            close_db_connection(conn)
+        
+        if wants_flag(request.args, 'summary'):
+            orders_list = summarize_to_use_services(orders_list)
+        
+        return jsonify({
+            'code': 0,
+            'data': select_fields(orders_list, fields)
+        })
+        
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        current_app.logger.error(f"获取待使用服务失败: {str(e)}")
+        return jsonify({
+            'code': 1,
+            'msg': f'获取待使用服务失败: {str(e)}'
+        })
+
+# 执行记录分页
+SERVICE_ITEMS_PAGE_SQL = """
+    SELECT item_id, item_name, item_price, exetime, item_remark
+    FROM item 
+    WHERE record_id = %s AND service_id = %s
+    ORDER BY exetime DESC, item_id DESC
+    LIMIT %s OFFSET %s
+"""
+
+SERVICE_ITEMS_COUNT_SQL = "SELECT COUNT(*) FROM item WHERE record_id = %s AND service_id = %s"
+
+# 每页最多的执行记录数
+MAX_HISTORY_PAGE_SIZE = 100
+
+@exeitem_bp.route('/api/service_items/<int:order_id>/<int:service_id>')
+@admit(PRIORITY_READ)
+def get_service_items(order_id, service_id):
+    """分页获取订单某个服务的执行记录（按执行时间倒序），count 为总数"""
+    try:
+        page = max(request.args.get('page', 1, type=int), 1)
+        limit = min(max(request.args.get('limit', 20, type=int), 1), MAX_HISTORY_PAGE_SIZE)
+        
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(SERVICE_ITEMS_COUNT_SQL, (order_id, service_id))
+            total = cursor.fetchone()[0]
+            items = []
+            if total > (page - 1) * limit:
+                cursor.execute(SERVICE_ITEMS_PAGE_SQL, (order_id, service_id, limit, (page - 1) * limit))
+                items = map_rows(cursor.fetchall(), ITEM_RECORD_ROW)
+            cursor.close()
+        finally:
+            close_db_connection(conn)
+        
+        return jsonify({
+            'code': 0,
+            'count': total,
+            'data': items
+        })
+        
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        current_app.logger.error(f"获取服务执行记录失败: {str(e)}")
+        return jsonify({
+            'code': 1,
+            'msg': f'获取服务执行记录失败: {str(e)}'
+        })
+
+# ==================== 增量同步 ====================
+# 一次最多返回的变更记录数，超过时客户端整体重新加载
+MAX_DELTA_CHANGES = 2000
+
+# 增量同步的视图：与 /api/started_items、/api/to_use_services 的数据格式相同
+DELTA_VIEWS = ('started_items', 'to_use_services')
+
+# 变化的订单
+CHANGED_ORDER_ROW = row_mapper(
+    ('order_id', 'order_id', None),
+    ('order_info', 'order_info', None),
+    ('order_price', 'order_price', as_float()),
+    ('order_disprice', 'order_disprice', as_float()),
+    ('order_buytime', 'order_buytime', as_time(default=None)),
+    ('order_status', 'order_status', None),
+    ('order_remark', 'order_remark', None),
+)
+
+# 变化订单的服务（完成数量与状态）
+CHANGED_SERVICE_ROW = row_mapper(
+    ('order_id', 'order_id', None),
+    ('service_id', 'service_id', None),
+    ('quantity', 'quantity', None),
+    ('completed_quantity', 'completed_quantity', None),
+    ('service_status', 'service_status', None),
+)
+
+# 新增的执行记录
+CHANGED_ITEM_ROW = row_mapper(
+    ('item_id', 'item_id', None),
+    ('record_id', 'record_id', None),
+    ('service_id', 'service_id', None),
+    ('item_name', 'item_name', as_text('未命名')),
+    ('item_price', 'item_price', as_float()),
+    ('item_remark', 'item_remark', as_text('')),
+    ('exetime', 'exetime', as_time(MINUTE_FMT)),
+)
+
+CHANGED_ORDERS_SQL = """
+    SELECT order_id, order_info, order_price, order_disprice,
+           order_buytime, order_status, order_remark
+    FROM order_list
+    WHERE order_id = ANY(%s)
+    ORDER BY order_id
+"""
+
+CHANGED_SERVICES_SQL = """
+    SELECT order_id, service_id, quantity, completed_quantity, service_status
+    FROM order_service
+    WHERE order_id = ANY(%s)
+    ORDER BY order_id, service_id
+"""
+
+CHANGED_ITEMS_SQL = """
+    SELECT item_id, record_id, service_id, item_name, item_price, item_remark, exetime
+    FROM item
+    WHERE item_id = ANY(%s)
+    ORDER BY item_id
+"""
+
+TO_USE_SERVICES_BY_ORDER_SQL = TO_USE_SERVICES_QUERY.format(order_filter=' AND ol.order_id = ANY(%s)')
+
+def load_changed_view(cursor, view, orders):
+    """重算变化订单在视图中的数据，返回 (视图数据, 已不属于该视图的订单ID)"""
+    order_ids = [order['order_id'] for order in orders]
+    if view == 'started_items':
+        started = [order for order in orders if order['order_status'] == 'started']
+        items_by_order = {}
+        if started:
+            cursor.execute(ORDERS_ITEMS_SQL, ([order['order_id'] for order in started],))
+            for row in cursor.fetchall():
+                items_by_order.setdefault(row['record_id'], []).append(row)
+        data = [
+            build_started_order(order, items_by_order.get(order['order_id'], []))
+            for order in started
+        ]
+    else:
+        # 与 /api/to_use_services 默认格式相同，不附带执行记录
+        cursor.execute(TO_USE_SERVICES_BY_ORDER_SQL, (order_ids,))
+        data = build_to_use_services(fetch_records(cursor, ToUseServiceRecord))
+    kept = {order['order_id'] for order in data}
+    return data, [order_id for order_id in order_ids if order_id not in kept]
+
+@exeitem_bp.route('/api/changes')
+@admit(PRIORITY_POLL)
+def get_changes():
+    """增量同步：返回 since 版本之后变化的订单、服务与执行记录
+
+    - 不带 since 时只返回当前版本，客户端先取版本再整体加载
+    - deleted 为已删除（或已归档）的订单ID
+    - reset 为 true 时客户端需要整体重新加载
+    - view=started_items / to_use_services 时另外返回变化订单在该视图中的数据，
+      removed 为应从视图中移除的订单ID
+    """
+    conn = None
+    try:
+        since = request.args.get('since', '').strip()
+        view = request.args.get('view', '')
+        if since and not since.isdigit():
+            return jsonify({'code': 1, 'msg': 'since 必须是变更版本号'})
+        if view and view not in DELTA_VIEWS:
+            return jsonify({'code': 1, 'msg': f'view 必须是 {", ".join(DELTA_VIEWS)} 之一'})
+        
+        conn = get_db_connection()
+        cursor = conn.cursor(cursor_factory=DictCursor)
+        # 变更与数据在同一个快照中读取
+        cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+        
+        changes = change_log.since(cursor, int(since) if since else None, MAX_DELTA_CHANGES)
+        data = {'version': changes.version, 'reset': changes.reset}
+        if since and not changes.reset:
+            orders = []
+            if changes.order_ids:
+                cursor.execute(CHANGED_ORDERS_SQL, (changes.order_ids,))
+                orders = cursor.fetchall()
+            # 变更之后又被删除的订单查不到，同样按删除处理
+            found = {order['order_id'] for order in orders}
+            deleted = sorted(set(changes.deleted_ids) | (set(changes.order_ids) - found))
+            
+            services, items = [], []
+            if orders:
+                cursor.execute(CHANGED_SERVICES_SQL, (list(found),))
+                services = map_rows(cursor.fetchall(), CHANGED_SERVICE_ROW)
+            if changes.item_ids:
+                cursor.execute(CHANGED_ITEMS_SQL, (changes.item_ids,))
+                items = map_rows(cursor.fetchall(), CHANGED_ITEM_ROW)
+            
+            data.update({
+                'orders': map_rows(orders, CHANGED_ORDER_ROW),
+                'services': services,
+                'items': items,
+                'deleted': deleted,
+            })
+            if view:
+                view_data, removed = load_changed_view(cursor, view, orders) if orders else ([], [])
+                data[view] = view_data
+                data['removed'] = sorted(set(removed) | set(deleted))
+        
+        cursor.close()
+        conn.rollback()
+        
+        return jsonify({
+            'code': 0,
+            'data': data
+        })
+        
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        current_app.logger.error(f"获取增量变更失败: {str(e)}")
+        return jsonify({
+            'code': 1,
+            'msg': f'获取增量变更失败: {str(e)}'
+        })
+    finally:
+        if conn:
+            close_db_connection(conn)
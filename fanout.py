@@ -0,0 +1,124 @@
+"""并行执行相互独立的只读查询
+
+仪表盘的几项统计彼此独立，在一个连接上串行执行时总耗时是各查询之和。这里把它们
+分别放到连接池的不同连接上同时执行，总耗时接近最慢的一条：
+
+- 每个进程一个有界线程池（QUERY_FANOUT_WORKERS），同时占用的连接数不超过线程数，
+  不会因为仪表盘请求耗尽连接池；线程数为 1 时退回单连接串行执行
+- 查询在同一请求内不共享事务快照，只用于允许各项之间有微小时间差的统计
+
+用法：
+
+    results = fanout.run({
+        'total_orders': ("SELECT COUNT(*) FROM order_list", (), 'value'),
+        'recent': (RECENT_SQL, (), 'all'),
+    }, readonly=True)
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from psycopg2.extras import DictCursor
+
+from metrics import metrics
+
+DEFAULT_WORKERS = 4
+
+# 单个请求等待全部结果的最长秒数
+DEFAULT_TIMEOUT = 30
+
+
+def _fetch(cursor, sql, params, mode):
+    cursor.execute(sql, params)
+    if mode == 'value':
+        row = cursor.fetchone()
+        return row[0] if row else None
+    if mode == 'one':
+        return cursor.fetchone()
+    return cursor.fetchall()
+
+
+class QueryFanout:
+
+    def __init__(self, workers=DEFAULT_WORKERS, timeout=DEFAULT_TIMEOUT):
+        self.workers = workers
+        self.timeout = timeout
+        self._get_connection = None
+        self._release = None
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def configure(self, get_connection, release, workers, timeout):
+        self._get_connection = get_connection
+        self._release = release
+        self.workers = workers
+        self.timeout = timeout
+
+    def _ensure_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='fanout')
+            return self._executor
+
+    def _run_one(self, sql, params, mode, readonly):
+        conn = self._get_connection(readonly=readonly)
+        try:
+            cursor = conn.cursor(cursor_factory=DictCursor)
+            result = _fetch(cursor, sql, params, mode)
+            cursor.close()
+            conn.rollback()
+            return result
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self._release(conn)
+
+    def _run_serial(self, queries, readonly):
+        conn = self._get_connection(readonly=readonly)
+        try:
+            cursor = conn.cursor(cursor_factory=DictCursor)
+            results = {key: _fetch(cursor, sql, params, mode) for key, (sql, params, mode) in queries.items()}
+            cursor.close()
+            conn.rollback()
+            return results
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self._release(conn)
+
+    def run(self, queries, readonly=True):
+        """执行 {键: (sql, 参数, 'value' | 'one' | 'all')}，返回 {键: 结果}
+
+        默认走只读副本；请求内调用时传 readonly=use_read_replica()，刚写入过的会话仍读主库。
+        任一查询失败时抛出该异常（其余查询仍会执行完并归还连接）
+        """
+        started = time.perf_counter()
+        try:
+            if self.workers <= 1 or len(queries) <= 1:
+                return self._run_serial(queries, readonly)
+            executor = self._ensure_executor()
+            futures = {
+                key: executor.submit(self._run_one, sql, params, mode, readonly)
+                for key, (sql, params, mode) in queries.items()
+            }
+            deadline = time.monotonic() + self.timeout
+            return {
+                key: future.result(timeout=max(deadline - time.monotonic(), 0))
+                for key, future in futures.items()
+            }
+        finally:
+            metrics.observe('fanout.run', time.perf_counter() - started)
+
+
+fanout = QueryFanout()
+
+
+def init_fanout(app, get_connection, release):
+    """从配置读取并行查询线程数与超时"""
+    fanout.configure(
+        get_connection, release,
+        app.config.setdefault('QUERY_FANOUT_WORKERS', DEFAULT_WORKERS),
+        app.config.setdefault('QUERY_FANOUT_TIMEOUT', DEFAULT_TIMEOUT),
+    )
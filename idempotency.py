@@ -0,0 +1,155 @@
+"""写接口的幂等键（Idempotency-Key 请求头）
+
+网络不稳定时前端会重试新增订单 / 新增执行记录，没有幂等保护就会产生重复订单或
+重复累加 completed_quantity。客户端为每次提交生成一个键，重试时带同一个键：
+
+- 键（接口 + 用户 + Idempotency-Key 的 SHA-1）与响应一起保存在 idempotency_key 表
+  （db/idempotency.sql），主键是 20 字节的 bytea
+- 写入之前先在同一个事务中用 INSERT ... ON CONFLICT 占用这个键，正常写入只多这一次
+  主键插入和写入完成后对同一行的更新
+- 占用失败说明同一个键已经成功写入过：不再执行任何写入，直接返回保存的响应；
+  并发的重复请求会在主键上等待先到的事务提交，之后同样走回放
+- 同一个键用于不同的请求体时返回 422；超过 IDEMPOTENCY_TTL 秒的键视为不存在
+
+用法：
+
+    key = idempotency.request_key('orders.add')
+    replay = idempotency.claim(cursor, key)
+    if replay is not None:
+        conn.rollback()
+        return replay
+    ...  # 执行写入
+    idempotency.save(cursor, key, payload)
+    conn.commit()
+"""
+import hashlib
+import threading
+import time
+
+from flask import jsonify, request
+from flask_login import current_user
+from psycopg2.extras import Json
+
+from metrics import metrics
+
+HEADER = 'Idempotency-Key'
+
+# 键的最大长度（客户端一般使用 UUID）
+MAX_KEY_LENGTH = 255
+
+# 键的有效期（秒）与过期键清理间隔
+DEFAULT_TTL = 24 * 3600
+PURGE_INTERVAL = 3600
+
+# 先以空响应占用键，写入完成后再保存响应（同一个事务提交，其他请求看不到空响应）；
+# 过期的键允许被新请求覆盖
+CLAIM_SQL = """
+    INSERT INTO idempotency_key (key_hash, request_hash, response)
+    VALUES (%s, %s, 'null')
+    ON CONFLICT (key_hash) DO UPDATE
+        SET request_hash = EXCLUDED.request_hash,
+            response = EXCLUDED.response,
+            created_at = now()
+        WHERE idempotency_key.created_at < now() - %s * interval '1 second'
+    RETURNING 1
+"""
+
+SAVE_SQL = "UPDATE idempotency_key SET response = %s WHERE key_hash = %s"
+
+STORED_SQL = "SELECT request_hash, response FROM idempotency_key WHERE key_hash = %s"
+
+PURGE_SQL = "DELETE FROM idempotency_key WHERE created_at < now() - %s * interval '1 second'"
+
+
+class IdempotencyError(Exception):
+    """键格式不正确，或同一个键用于不同的请求"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+class RequestKey:
+    __slots__ = ('key_hash', 'request_hash')
+
+    def __init__(self, key_hash, request_hash):
+        self.key_hash = key_hash
+        self.request_hash = request_hash
+
+
+class Idempotency:
+
+    def __init__(self, ttl=DEFAULT_TTL):
+        self.ttl = ttl
+        self._last_purge = time.monotonic()
+        self._lock = threading.Lock()
+
+    def configure(self, ttl):
+        self.ttl = ttl
+
+    def request_key(self, scope):
+        """当前请求的幂等键；没有 Idempotency-Key 请求头时返回 None"""
+        key = request.headers.get(HEADER, '').strip()
+        if not key:
+            return None
+        if len(key) > MAX_KEY_LENGTH:
+            raise IdempotencyError(f'{HEADER} 过长')
+        user = current_user.get_id() if current_user and current_user.is_authenticated else ''
+        key_hash = hashlib.sha1(f"{scope}\0{user}\0{key}".encode('utf-8')).digest()
+        request_hash = hashlib.sha1(request.get_data()).digest()
+        return RequestKey(key_hash, request_hash)
+
+    def claim(self, cursor, key):
+        """在写入事务开始时占用幂等键
+
+        返回 None 表示这是第一次请求，调用方继续写入并在提交前调用 save；否则返回
+        应回放的响应，调用方回滚事务后直接返回。
+        """
+        if key is None:
+            return None
+        cursor.execute(CLAIM_SQL, (key.key_hash, key.request_hash, self.ttl))
+        if cursor.fetchone() is not None:
+            self._maybe_purge(cursor)
+            return None
+
+        cursor.execute(STORED_SQL, (key.key_hash,))
+        request_hash, stored = cursor.fetchone()
+        if bytes(request_hash) != key.request_hash:
+            metrics.incr('idempotency.mismatch')
+            raise IdempotencyError(f'{HEADER} 已用于其他请求', status=422)
+
+        metrics.incr('idempotency.replayed')
+        response = jsonify(stored)
+        response.headers['Idempotent-Replayed'] = 'true'
+        return response
+
+    def save(self, cursor, key, payload):
+        """保存第一次请求的响应，与写入一起提交"""
+        if key is not None:
+            cursor.execute(SAVE_SQL, (Json(payload), key.key_hash))
+
+    def _maybe_purge(self, cursor):
+        """每个进程每隔 PURGE_INTERVAL 秒顺带删除一次过期的键"""
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_purge < PURGE_INTERVAL:
+                return
+            self._last_purge = now
+        cursor.execute(PURGE_SQL, (self.ttl,))
+        metrics.incr('idempotency.purged', cursor.rowcount)
+
+
+idempotency = Idempotency()
+
+
+def error_response(error):
+    """IdempotencyError 对应的 JSON 响应"""
+    response = jsonify({'code': 1, 'msg': error.message})
+    response.status_code = error.status
+    return response
+
+
+def init_idempotency(app):
+    """从配置读取幂等键有效期"""
+    idempotency.configure(app.config.setdefault('IDEMPOTENCY_TTL', DEFAULT_TTL))
@@ -0,0 +1,162 @@
+from flask import Blueprint, request, jsonify, current_app, send_file, url_for
+import json
+from row_format import json_default
+from copy_export import copy_to_file
+from archive import wants_archived
+from breaker import CircuitOpenError
+from admission import admit, PRIORITY_READ, PRIORITY_POLL
+from jobs import runner, job_kind, JobQueueFull, KINDS
+from order_bp import orders_export_query
+from catalog import catalog
+from exeitem_bp import items_export_query
+import reports
+
+# 创建后台任务蓝图
+job_bp = Blueprint('jobs', __name__, url_prefix='/jobs')
+
+# 任务排队已满时建议客户端等待的秒数
+RETRY_AFTER = 5
+
+# ==================== 任务类型 ====================
+def write_json(out, data):
+    """结果文件即接口响应，下载时原样返回"""
+    out.write(json.dumps({'code': 0, 'data': data}, default=json_default, ensure_ascii=False).encode('utf-8'))
+
+@job_kind('orders_export', '.csv', 'text/csv',
+          params=('search', 'status', 'start', 'end', 'include_archived', 'format'))
+def orders_export_job(conn, params, out):
+    """订单导出（参数同 /orders/api/export）"""
+    query, query_params = orders_export_query(params)
+    copy_to_file(conn, query, query_params, out, excel=params.get('format') == 'excel')
+
+@job_kind('items_export', '.csv', 'text/csv', params=('start', 'end', 'include_archived', 'format'))
+def items_export_job(conn, params, out):
+    """执行记录导出（参数同 /item/api/export）"""
+    query, query_params = items_export_query(params)
+    copy_to_file(conn, query, query_params, out, excel=params.get('format') == 'excel')
+
+@job_kind('revenue_report', '.json', 'application/json', params=('start', 'end', 'include_archived'))
+def revenue_report_job(conn, params, out):
+    first_month, last_month = reports.parse_month_range(params)
+    cursor = conn.cursor()
+    data = reports.revenue_report(cursor, first_month, last_month, wants_archived(params))
+    cursor.close()
+    write_json(out, data)
+
+@job_kind('utilization_report', '.json', 'application/json', params=('include_archived',))
+def utilization_report_job(conn, params, out):
+    cursor = conn.cursor()
+    data = reports.utilization_report(cursor, catalog.current().services, wants_archived(params))
+    cursor.close()
+    write_json(out, data)
+
+@job_kind('liability_report', '.json', 'application/json')
+def liability_report_job(conn, params, out):
+    cursor = conn.cursor()
+    data = reports.liability_report(cursor)
+    cursor.close()
+    write_json(out, data)
+
+# ==================== 接口 ====================
+def job_payload(job):
+    """任务信息，完成时附带结果下载地址"""
+    job = dict(job)
+    if job['status'] == 'done':
+        job['result_url'] = url_for('jobs.job_result', job_id=job['job_id'])
+    return job
+
+def queue_full_response():
+    response = jsonify({'code': 1, 'msg': '后台任务繁忙，请稍后重试'})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(RETRY_AFTER)
+    return response
+
+@job_bp.route('/api/submit', methods=['POST'])
+@admit(PRIORITY_READ)
+def submit_job():
+    """提交后台任务：{"kind": "revenue_report", "params": {...}}"""
+    try:
+        data = request.get_json(silent=True) or {}
+        kind = data.get('kind', '')
+        params = data.get('params') or {}
+        if kind not in KINDS:
+            return jsonify({
+                'code': 1,
+                'msg': f'未知的任务类型: {kind}',
+                'data': {'kinds': sorted(KINDS)}
+            })
+        if not isinstance(params, dict):
+            return jsonify({'code': 1, 'msg': 'params 必须是对象'})
+
+        # 刚写入过数据的会话读主库，避免结果里缺少自己刚提交的数据
+        from main import recently_wrote
+        job = runner.submit(kind, params, readonly=not recently_wrote())
+        return jsonify({
+            'code': 0,
+            'msg': '任务已提交',
+            'data': job_payload(job)
+        })
+
+    except JobQueueFull:
+        return queue_full_response()
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        current_app.logger.error(f"提交后台任务失败: {str(e)}")
+        return jsonify({
+            'code': 1,
+            'msg': f'提交后台任务失败: {str(e)}'
+        })
+
+@job_bp.route('/api/<int:job_id>')
+@admit(PRIORITY_POLL)
+def job_status(job_id):
+    """查询任务状态（queued / running / done / failed）"""
+    try:
+        job = runner.get(job_id)
+        if job is None:
+            return jsonify({'code': 1, 'msg': '任务不存在'})
+        return jsonify({
+            'code': 0,
+            'data': job_payload(job)
+        })
+
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        current_app.logger.error(f"查询后台任务失败: {str(e)}")
+        return jsonify({
+            'code': 1,
+            'msg': f'查询后台任务失败: {str(e)}'
+        })
+
+@job_bp.route('/api/<int:job_id>/result')
+@admit(PRIORITY_READ)
+def job_result(job_id):
+    """下载任务结果（结果文件过期后需重新提交）"""
+    try:
+        job = runner.get(job_id)
+        if job is None:
+            return jsonify({'code': 1, 'msg': '任务不存在'}), 404
+        if job['status'] != 'done':
+            return jsonify({'code': 1, 'msg': f"任务尚未完成: {job['status']}", 'data': job_payload(job)}), 409
+        if not runner.has_result(job):
+            return jsonify({'code': 1, 'msg': '结果已过期，请重新提交任务'}), 410
+
+        kind = KINDS[job['kind']]
+        return send_file(
+            runner.result_path(job),
+            mimetype=kind.mimetype,
+            as_attachment=kind.suffix == '.csv',
+            download_name=f"{kind.name}_{job_id}{kind.suffix}",
+            max_age=runner.result_ttl,
+        )
+
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        current_app.logger.error(f"下载任务结果失败: {str(e)}")
+        return jsonify({
+            'code': 1,
+            'msg': f'下载任务结果失败: {str(e)}'
+        })
@@ -0,0 +1,371 @@
+"""后台任务（报表、大批量导出）
+
+多年数据的报表、大批量导出放在请求里执行会占用 worker 与连接池连接直到完成，
+还可能超过 gunicorn 的 --timeout。这里改为提交任务、轮询状态、完成后下载结果：
+
+- 任务状态记录在 background_job 表（db/jobs.sql），多个 worker 都能查询
+- 每个进程一个有界线程池执行任务（JOB_WORKERS），排队数超过 JOB_QUEUE_SIZE 时拒绝
+- 结果写入 JOB_RESULT_DIR 下的文件，文件名为 cache_key（任务类型 + 参数 + 数据版本
+  的摘要）。订单数据写入后数据版本递增，旧结果自然不再命中；JOB_RESULT_TTL 秒后过期删除
+- 相同 cache_key 的任务正在排队或执行时直接返回该任务，不重复计算
+- 每个进程每 HEARTBEAT_INTERVAL 秒刷新本进程任务的 heartbeat_at；心跳超过
+  HEARTBEAT_TIMEOUT 秒未更新的排队 / 执行中任务（进程退出、重启）标记为失败，
+  不再被复用。启动时立即检查一次
+
+任务类型用 job_kind 注册：
+
+    @job_kind('revenue_report', '.json', 'application/json', params=('start', 'end'))
+    def revenue_job(conn, params, out): ...  # 把结果写入二进制文件对象 out
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from psycopg2.extras import DictCursor, Json
+
+from cache import cache
+from metrics import metrics
+
+# 任务结果依赖的缓存命名空间（写接口调用 cache.invalidate('orders')）
+DATA_NAMESPACE = 'orders'
+
+# 刷新心跳、检查中断任务的间隔（秒）
+HEARTBEAT_INTERVAL = 15
+
+# 心跳超过该秒数未更新的排队 / 执行中任务视为已中断，不再复用
+HEARTBEAT_TIMEOUT = 60
+
+# 任务记录保留天数
+KEEP_DAYS = 7
+
+JOB_COLUMNS = "job_id, kind, params, cache_key, status, error, created_at, started_at, finished_at"
+
+FIND_REUSABLE_SQL = f"""
+    SELECT {JOB_COLUMNS}
+    FROM background_job
+    WHERE cache_key = %s
+      AND (status = 'done' OR (status IN ('queued', 'running') AND heartbeat_at > now() - %s * interval '1 second'))
+    ORDER BY job_id DESC
+    LIMIT 1
+"""
+
+HEARTBEAT_SQL = """
+    UPDATE background_job SET heartbeat_at = now()
+    WHERE job_id = ANY(%s) AND status IN ('queued', 'running')
+"""
+
+FAIL_ORPHANED_SQL = """
+    UPDATE background_job
+    SET status = 'failed', error = '任务已中断（执行进程已退出）', finished_at = now()
+    WHERE status IN ('queued', 'running') AND heartbeat_at < now() - %s * interval '1 second'
+"""
+
+INSERT_SQL = f"""
+    INSERT INTO background_job (kind, params, cache_key)
+    VALUES (%s, %s, %s)
+    RETURNING {JOB_COLUMNS}
+"""
+
+
+class JobKind:
+    __slots__ = ('name', 'handler', 'suffix', 'mimetype', 'params')
+
+    def __init__(self, name, handler, suffix, mimetype, params):
+        self.name = name
+        self.handler = handler
+        self.suffix = suffix
+        self.mimetype = mimetype
+        self.params = params
+
+
+class JobQueueFull(Exception):
+    """排队的任务过多"""
+
+
+KINDS = {}
+
+
+def job_kind(name, suffix, mimetype, params=()):
+    """注册任务类型；params 为允许的参数名，其余参数忽略（不影响 cache_key）"""
+    def decorator(handler):
+        KINDS[name] = JobKind(name, handler, suffix, mimetype, tuple(params))
+        return handler
+    return decorator
+
+
+def _format_job(row):
+    job = dict(row)
+    for key in ('created_at', 'started_at', 'finished_at'):
+        if job[key] is not None:
+            job[key] = job[key].strftime('%Y-%m-%d %H:%M:%S')
+    return job
+
+
+class JobRunner:
+
+    def __init__(self, workers=2, queue_size=16, result_dir=None, result_ttl=600):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.result_dir = result_dir or os.path.join(tempfile.gettempdir(), 'myorder-jobs')
+        self.result_ttl = result_ttl
+        self._get_connection = None
+        self._release = None
+        self._executor = None
+        self._pending = 0
+        # 本进程排队或执行中的任务，由心跳线程刷新 heartbeat_at
+        self._active = set()
+        self._heartbeat = None
+        self._lock = threading.Lock()
+
+    def configure(self, get_connection, release, workers, queue_size, result_dir, result_ttl):
+        self._get_connection = get_connection
+        self._release = release
+        self.workers = workers
+        self.queue_size = queue_size
+        self.result_dir = result_dir
+        self.result_ttl = result_ttl
+        os.makedirs(self.result_dir, exist_ok=True)
+
+    # ---------- 结果文件 ----------
+    def result_path(self, job):
+        return os.path.join(self.result_dir, job['cache_key'].strip() + KINDS[job['kind']].suffix)
+
+    def has_result(self, job):
+        """结果文件存在且未过期"""
+        try:
+            age = time.time() - os.path.getmtime(self.result_path(job))
+        except OSError:
+            return False
+        return age < self.result_ttl
+
+    def _cleanup_files(self):
+        now = time.time()
+        for name in os.listdir(self.result_dir):
+            path = os.path.join(self.result_dir, name)
+            try:
+                if now - os.path.getmtime(path) > self.result_ttl:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    # ---------- 提交与查询 ----------
+    def cache_key(self, kind, params):
+        try:
+            version = cache.version(DATA_NAMESPACE)
+        except Exception:
+            version = 0
+        payload = json.dumps([kind, params, version], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    def submit(self, kind_name, params, readonly=True):
+        """提交任务，返回任务信息；可复用的任务（已完成或进行中）直接返回
+
+        readonly 为 True 时任务的查询走只读副本（提交者刚写入过数据时应传 False）
+        """
+        kind = KINDS.get(kind_name)
+        if kind is None:
+            raise ValueError(f'未知的任务类型: {kind_name}')
+        params = {key: str(params[key]) for key in kind.params if params.get(key) not in (None, '')}
+        cache_key = self.cache_key(kind.name, params)
+
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor(cursor_factory=DictCursor)
+            # 同一 cache_key 的提交串行执行，避免并发请求各建一个任务
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (cache_key,))
+            cursor.execute(FIND_REUSABLE_SQL, (cache_key, HEARTBEAT_TIMEOUT))
+            row = cursor.fetchone()
+            if row is not None and (row['status'] != 'done' or self.has_result(row)):
+                conn.commit()
+                metrics.incr('jobs.reused')
+                return _format_job(row)
+
+            with self._lock:
+                if self._pending >= self.queue_size:
+                    metrics.incr('jobs.rejected')
+                    raise JobQueueFull()
+                self._pending += 1
+            try:
+                cursor.execute(INSERT_SQL, (kind.name, Json(params), cache_key))
+                job = _format_job(cursor.fetchone())
+                conn.commit()
+            except Exception:
+                with self._lock:
+                    self._pending -= 1
+                raise
+            cursor.close()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self._release(conn)
+
+        with self._lock:
+            self._active.add(job['job_id'])
+        self._ensure_executor().submit(self._run, job, readonly)
+        metrics.incr('jobs.submitted')
+        return job
+
+    def get(self, job_id):
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor(cursor_factory=DictCursor)
+            cursor.execute(f"SELECT {JOB_COLUMNS} FROM background_job WHERE job_id = %s", (job_id,))
+            row = cursor.fetchone()
+            cursor.close()
+            conn.rollback()
+        finally:
+            self._release(conn)
+        return _format_job(row) if row else None
+
+    # ---------- 执行 ----------
+    def _ensure_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='job')
+            return self._executor
+
+    def _set_status(self, job_id, status, error=None):
+        """在主库上更新任务状态（短暂占用一个连接）"""
+        conn = self._get_connection()
+        close = False
+        try:
+            cursor = conn.cursor()
+            if status == 'running':
+                cursor.execute(
+                    "UPDATE background_job SET status = 'running', started_at = now(), heartbeat_at = now() "
+                    "WHERE job_id = %s",
+                    (job_id,)
+                )
+            else:
+                cursor.execute(
+                    "UPDATE background_job SET status = %s, error = %s, finished_at = now() WHERE job_id = %s",
+                    (status, error, job_id)
+                )
+            conn.commit()
+            cursor.close()
+        except Exception:
+            close = True
+            raise
+        finally:
+            self._release(conn, close)
+
+    def _run(self, job, readonly=True):
+        kind = KINDS[job['kind']]
+        started = time.perf_counter()
+        try:
+            self._set_status(job['job_id'], 'running')
+            path = self.result_path(job)
+            tmp_path = f"{path}.{job['job_id']}.tmp"
+            # 任务的查询可能很慢，走只读副本；状态更新另用主库连接
+            conn = self._get_connection(readonly=readonly)
+            try:
+                with open(tmp_path, 'wb') as out:
+                    kind.handler(conn, job['params'], out)
+                # 写完再改名，读取方不会看到写了一半的文件
+                os.replace(tmp_path, path)
+            finally:
+                # 连接池归还时回滚未结束的事务
+                self._release(conn)
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            self._set_status(job['job_id'], 'done')
+            metrics.incr('jobs.done')
+            print(f"✅ Job {job['job_id']} ({kind.name}) done in {time.perf_counter() - started:.1f}s")
+        except Exception as e:
+            metrics.incr('jobs.failed')
+            print(f"❌ Job {job['job_id']} ({kind.name}) failed: {e}")
+            # 拿不到连接时任务保持 queued，心跳停止后由 heartbeat 标记为失败
+            try:
+                self._set_status(job['job_id'], 'failed', str(e))
+            except Exception:
+                pass
+        finally:
+            metrics.observe(f'jobs.{kind.name}', time.perf_counter() - started)
+            with self._lock:
+                self._pending -= 1
+                self._active.discard(job['job_id'])
+            self._cleanup()
+
+    def _cleanup(self):
+        """删除过期结果文件与旧任务记录"""
+        try:
+            self._cleanup_files()
+            conn = self._get_connection()
+            try:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "DELETE FROM background_job WHERE created_at < now() - %s * interval '1 day'",
+                    (KEEP_DAYS,)
+                )
+                conn.commit()
+                cursor.close()
+            finally:
+                self._release(conn)
+        except Exception as e:
+            print(f"⚠️ Job cleanup failed: {e}")
+
+    # ---------- 心跳 ----------
+    def heartbeat(self):
+        """刷新本进程任务的心跳，并把心跳超时的任务标记为失败，返回标记的任务数"""
+        with self._lock:
+            job_ids = list(self._active)
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor()
+            if job_ids:
+                cursor.execute(HEARTBEAT_SQL, (job_ids,))
+            cursor.execute(FAIL_ORPHANED_SQL, (HEARTBEAT_TIMEOUT,))
+            failed = cursor.rowcount
+            conn.commit()
+            cursor.close()
+        finally:
+            self._release(conn)
+        if failed:
+            metrics.incr('jobs.orphaned', failed)
+            print(f"⚠️ Marked {failed} interrupted jobs as failed")
+        return failed
+
+    def start_heartbeat(self, interval=HEARTBEAT_INTERVAL):
+        """后台线程：启动时立即、之后每 interval 秒执行 heartbeat"""
+        def loop():
+            failing = False
+            while True:
+                try:
+                    self.heartbeat()
+                    failing = False
+                except Exception as e:
+                    metrics.incr('jobs.heartbeat_failed')
+                    # 数据库不可用或未执行 db/jobs.sql 时只提示一次
+                    if not failing:
+                        print(f"⚠️ Job heartbeat failed: {e}")
+                    failing = True
+                time.sleep(interval)
+
+        with self._lock:
+            if self._heartbeat is None:
+                self._heartbeat = threading.Thread(target=loop, name='job-heartbeat', daemon=True)
+                self._heartbeat.start()
+
+    def stats(self):
+        with self._lock:
+            return {'workers': self.workers, 'pending': self._pending, 'queue_size': self.queue_size}
+
+
+runner = JobRunner()
+
+
+def init_jobs(app, get_connection, release):
+    """从配置读取任务线程数、排队上限与结果目录，启动心跳线程"""
+    runner.configure(
+        get_connection, release,
+        app.config.setdefault('JOB_WORKERS', 2),
+        app.config.setdefault('JOB_QUEUE_SIZE', 16),
+        app.config.setdefault('JOB_RESULT_DIR', os.path.join(tempfile.gettempdir(), 'myorder-jobs')),
+        app.config.setdefault('JOB_RESULT_TTL', 600),
+    )
+    runner.start_heartbeat()
@@ -0,0 +1,53 @@
+"""快速 JSON 序列化
+
+安装了 orjson 时使用 orjson 编码（C 实现，原生支持 date/datetime，
+Decimal 通过 default 回调转换），否则退回 Flask 自带的标准库编码器。
+"""
+from flask.json.provider import DefaultJSONProvider
+
+from row_format import json_default
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - 未安装时使用标准库
+    orjson = None
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """orjson 编码的 JSON 提供者"""
+
+    # 响应体保持 UTF-8 原文，中文不再转义成 \\uXXXX
+    ensure_ascii = False
+    sort_keys = False
+
+    def _orjson_option(self, indent=False):
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None:
+            return super().dumps(obj, **kwargs)
+        option = self._orjson_option(indent=bool(kwargs.get('indent')))
+        return orjson.dumps(obj, default=json_default, option=option).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        body = orjson.dumps(obj, default=json_default, option=self._orjson_option(indent))
+        return self._app.response_class(body + b'\n', mimetype=self.mimetype)
+
+
+def init_json(app):
+    """为应用启用快速 JSON 提供者"""
+    app.json = FastJSONProvider(app)
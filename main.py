@@ -1,333 +1,722 @@
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for, flash
-from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
-import psycopg2
-from psycopg2 import pool
-from psycopg2.extras import DictCursor
-import os
-import sys
-from datetime import datetime
-from order_bp import order_bp
-from exeitem_bp import exeitem_bp
-import urllib.parse
-
-app = Flask(__name__)
-app.secret_key = os.environ.get('SECRET_KEY') or 'dev-secret-key-123'
-app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-123')
-
-# 注册蓝图
-app.register_blueprint(order_bp)
-app.register_blueprint(exeitem_bp)
-
-# Flask-Login 配置
-login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = 'login'
-login_manager.login_message = '请先登录'
-login_manager.login_message_category = 'warning'
-
-# ==================== 数据库连接池管理 ====================
-class DatabasePool:
-    """简化的数据库连接池管理器"""
-    _pool = None
-    
-    @classmethod
-    def init_pool(cls):
-        """初始化连接池"""
-        try:
-            database_url = os.environ.get('DATABASE_URL')
-            
-            if not database_url:
-                print("⚠️ DATABASE_URL not found, using local config")
-                # 本地开发配置
-                connection_string = "host=localhost dbname=plorder user=postgres password='' port=5432"
-            else:
-                # 修复URL格式
-                if database_url.startswith('postgres://'):
-                    database_url = database_url.replace('postgres://', 'postgresql://')
-                
-                # 确保有SSL参数
-                if 'sslmode=' not in database_url:
-                    if '?' in database_url:
-                        database_url += '&sslmode=require'
-                    else:
-                        database_url += '?sslmode=require'
-                
-                connection_string = database_url
-            
-            print(f"🔄 Creating connection pool...")
-            
-            # 创建连接池 - 关键修复：使用dsn参数
-            cls._pool = psycopg2.pool.SimpleConnectionPool(
-                minconn=1,
-                maxconn=10,
-                dsn=connection_string  # 使用dsn参数传递连接字符串
-            )
-            
-            # 测试连接
-            conn = cls._pool.getconn()
-            cursor = conn.cursor()
-            cursor.execute('SELECT 1')
-            cursor.fetchone()
-            cursor.close()
-            cls._pool.putconn(conn)
-            
-            print("✅ Database connection pool initialized successfully")
-            
-        except Exception as e:
-            print(f"❌ Failed to initialize connection pool: {e}")
-            cls._pool = None
-    
-    @classmethod
-    def get_connection(cls):
-        """获取数据库连接"""
-        if cls._pool is None:
-            cls.init_pool()
-        
-        if cls._pool is None:
-            # 连接池初始化失败，尝试直接连接
-            return cls._get_direct_connection()
-        
-        try:
-            return cls._pool.getconn()
-        except Exception as e:
-            print(f"⚠️ Failed to get connection from pool: {e}")
-            # 回退到直接连接
-            return cls._get_direct_connection()
-    
-    @classmethod
-    def return_connection(cls, conn):
-        """归还连接"""
-        if cls._pool and conn:
-            try:
-                cls._pool.putconn(conn)
-            except Exception as e:
-                print(f"⚠️ Failed to return connection to pool: {e}")
-                try:
-                    conn.close()
-                except:
-                    pass
-        elif conn:
-            try:
-                conn.close()
-            except:
-                pass
-    
-    @classmethod
-    def _get_direct_connection(cls):
-        """直接连接数据库（备用方案）"""
-        try:
-            database_url = os.environ.get('DATABASE_URL')
-            
-            if database_url:
-                # 修复URL格式
-                if database_url.startswith('postgres://'):
-                    database_url = database_url.replace('postgres://', 'postgresql://')
-                
-                if 'sslmode=' not in database_url:
-                    if '?' in database_url:
-                        database_url += '&sslmode=require'
-                    else:
-                        database_url += '?sslmode=require'
-                
-                conn = psycopg2.connect(database_url)
-            else:
-                # 本地开发
-                conn = psycopg2.connect(
-                    host='localhost',
-                    database='plorder',
-                    user='postgres',
-                    password='',
-                    port=5432
-                )
-            
-            print("📡 Using direct database connection (fallback)")
-            return conn
-        except Exception as e:
-            print(f"❌ Direct connection also failed: {e}")
-            raise
-    
-    @classmethod
-    def close_all(cls):
-        """关闭所有连接"""
-        if cls._pool:
-            try:
-                cls._pool.closeall()
-                print("🔒 Connection pool closed")
-            except Exception as e:
-                print(f"⚠️ Error closing pool: {e}")
-
-# 应用启动时初始化连接池
-DatabasePool.init_pool()
-
-# 简化连接获取函数
-def get_db_connection():
-    """获取数据库连接"""
-    return DatabasePool.get_connection()
-
-def close_db_connection(conn):
-    """释放数据库连接"""
-    DatabasePool.return_connection(conn)
-
-# ==================== 用户模型 ====================
-class User(UserMixin):
-    def __init__(self, id, username, role):
-        self.id = id
-        self.username = username
-        self.role = role
-
-@login_manager.user_loader
-def load_user(user_id):
-    """加载用户"""
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=DictCursor)
-        cursor.execute("SELECT * FROM users WHERE id = %s", (user_id,))
-        user_data = cursor.fetchone()
-        cursor.close()
-        close_db_connection(conn)
-
-        if user_data:
-            return User(user_data['id'], user_data['username'], user_data['role'])
-        return None
-    except Exception as e:
-        print(f"加载用户失败: {e}")
-        return None
-
-# ==================== 辅助函数 ====================
-def is_mobile_request():
-    """检测是否为移动设备"""
-    user_agent = request.headers.get('User-Agent', '').lower()
-    mobile_keywords = ['mobile', 'android', 'iphone', 'ipad']
-    return any(keyword in user_agent for keyword in mobile_keywords)
-
-# ==================== 路由定义 ====================
-@app.route('/')
-def index():
-    """首页"""
-    if current_user.is_authenticated:
-        return redirect(url_for('dashboard'))
-    return render_template('login.html', is_mobile=is_mobile_request())
-
-@app.route('/login', methods=['GET', 'POST'])
-def login():
-    """登录页面"""
-    if current_user.is_authenticated:
-        flash('您已经登录了', 'info')
-        return redirect(url_for('dashboard'))
-    
-    if request.method == 'POST':
-        username = request.form.get('username', '').strip()
-        password = request.form.get('password', '').strip()
-
-        if not username or not password:
-            flash('请输入用户名和密码', 'error')
-            return render_template('login.html', is_mobile=is_mobile_request())
-        
-        try:
-            conn = get_db_connection()
-            cursor = conn.cursor(cursor_factory=DictCursor)
-            cursor.execute("SELECT * FROM users WHERE username = %s AND password = %s", 
-                         (username, password))
-            user = cursor.fetchone()
-            cursor.close()
-            close_db_connection(conn)
-            
-            if user:
-                user_obj = User(user['id'], user['username'], user['role'])
-                login_user(user_obj)
-                flash(f'欢迎回来，{username}！', 'success')
-                return redirect(request.args.get('next') or url_for('dashboard'))
-            else:
-                flash('用户名或密码错误', 'error')
-                
-        except Exception as e:
-            print(f"登录出错: {e}")
-            flash('系统错误，请稍后重试', 'error')
-    
-    return render_template('login.html', is_mobile=is_mobile_request())
-
-@app.route('/logout')
-@login_required
-def logout():
-    """退出登录"""
-    logout_user()
-    flash('您已成功退出登录', 'info')
-    return redirect(url_for('login'))
-
-@app.route('/dashboard')
-@login_required
-def dashboard():
-    """控制台页面"""
-    return render_template('dashboard.html', now=datetime.now(), is_mobile=is_mobile_request())
-
-@app.route('/about')
-@login_required
-def about():
-    """关于系统页面"""
-    return render_template('about.html', is_mobile=is_mobile_request())
-
-@app.route('/health')
-def health():
-    """健康检查端点"""
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT 1')
-        result = cursor.fetchone()
-        cursor.close()
-        close_db_connection(conn)
-        
-        return jsonify({
-            'status': 'healthy',
-            'database': 'connected',
-            'timestamp': datetime.now().isoformat()
-        }), 200
-    except Exception as e:
-        return jsonify({
-            'status': 'unhealthy',
-            'database': 'disconnected',
-            'error': str(e),
-            'timestamp': datetime.now().isoformat()
-        }), 500
-
-# ==================== 错误处理 ====================
-@app.errorhandler(404)
-def not_found(error):
-    return render_template('404.html', is_mobile=is_mobile_request()), 404
-
-@app.errorhandler(500)
-def internal_error(error):
-    return render_template('500.html', is_mobile=is_mobile_request()), 500
-
-@app.errorhandler(403)
-def forbidden(error):
-    return render_template('403.html', is_mobile=is_mobile_request()), 403
-
-# ==================== 上下文处理器 ====================
-@app.context_processor
-def inject_variables():
-    """向所有模板注入常用变量"""
-    return {
-        'now': datetime.now(),
-        'is_mobile': is_mobile_request(),
-        'current_user': current_user
-    }
-
-# ==================== 应用关闭处理 ====================
-import atexit
-
-@atexit.register
-def cleanup():
-    """应用退出时清理连接池"""
-    DatabasePool.close_all()
-
-# Flask teardown 处理
-@app.teardown_appcontext
-def teardown_db(exception):
-    """请求结束时自动关闭数据库连接"""
-    # Flask 会自动处理请求上下文，这里主要做清理
-    pass
-
-if __name__ == '__main__':
-    port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port, debug=False)
+from flask import Flask, render_template, request, jsonify, session, redirect, url_for, flash, has_request_context, send_file
+from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
+import psycopg2
+from psycopg2 import pool
+from psycopg2.extras import DictCursor
+import os
+import sys
+import time
+import itertools
+from datetime import datetime
+from order_bp import order_bp, dashboard_bootstrap
+from exeitem_bp import exeitem_bp
+from report_bp import report_bp
+from job_bp import job_bp
+from json_provider import init_json
+from compression import init_compression
+from assets import init_assets
+from admission import init_admission, admission, admit, PRIORITY_READ
+from throttle import init_throttle, login_throttle
+from werkzeug.middleware.proxy_fix import ProxyFix
+from cache import init_cache, cache
+from jobs import init_jobs, runner as job_runner
+from catalog import init_catalog
+from fanout import init_fanout
+from idempotency import init_idempotency
+from changes import init_changes
+from archive import init_archive
+from metrics import metrics
+from profiling import init_profiling, profiler
+from breaker import CircuitBreaker, CircuitOpenError, CLOSED
+import prepared
+import urllib.parse
+
+app = Flask(__name__)
+app.secret_key = os.environ.get('SECRET_KEY') or 'dev-secret-key-123'
+app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-123')
+
+# 使用快速 JSON 编码器（orjson）
+init_json(app)
+
+# 响应压缩（gzip / brotli）
+app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+app.config['COMPRESS_GZIP_LEVEL'] = int(os.environ.get('COMPRESS_GZIP_LEVEL', 6))
+app.config['COMPRESS_BR_LEVEL'] = int(os.environ.get('COMPRESS_BR_LEVEL', 4))
+init_compression(app)
+
+# 静态资源指纹与长缓存
+init_assets(app)
+
+# 按需请求剖析：令牌与抽样比例都未配置时不启用（需在创建连接池之前初始化）
+app.config['PROFILE_TOKEN'] = os.environ.get('PROFILE_TOKEN')
+app.config['PROFILE_SAMPLE_RATE'] = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+app.config['PROFILE_MEMORY'] = os.environ.get('PROFILE_MEMORY', '').lower() in ('1', 'true', 'yes')
+app.config['PROFILE_KEEP'] = int(os.environ.get('PROFILE_KEEP', 200))
+app.config['PROFILE_ADMIN_ROLE'] = os.environ.get('PROFILE_ADMIN_ROLE', 'admin')
+if os.environ.get('PROFILE_DIR'):
+    app.config['PROFILE_DIR'] = os.environ['PROFILE_DIR']
+init_profiling(app)
+
+# 数据库路由准入控制：并发上限需小于连接池大小（maxconn=10）
+app.config['ADMISSION_CAPACITY'] = int(os.environ.get('ADMISSION_CAPACITY', 8))
+app.config['ADMISSION_QUEUE_SIZE'] = int(os.environ.get('ADMISSION_QUEUE_SIZE', 32))
+app.config['ADMISSION_TIMEOUT'] = float(os.environ.get('ADMISSION_TIMEOUT', 3))
+init_admission(app)
+
+# 部署在反向代理（nginx）之后时，PROXY_FIX_HOPS 为可信代理层数：
+# 从 X-Forwarded-For / X-Forwarded-Proto 取客户端 IP 与协议，登录限流按真实 IP 计数。
+# 未经代理直接对外时保持 0，否则客户端可以伪造 X-Forwarded-For 绕过限流
+PROXY_FIX_HOPS = int(os.environ.get('PROXY_FIX_HOPS', 0))
+if PROXY_FIX_HOPS > 0:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=PROXY_FIX_HOPS, x_proto=PROXY_FIX_HOPS)
+
+# 登录限流（令牌桶）；配置 REDIS_URL 时多个 worker 共享额度
+app.config['REDIS_URL'] = os.environ.get('REDIS_URL')
+app.config['LOGIN_IP_BURST'] = int(os.environ.get('LOGIN_IP_BURST', 10))
+app.config['LOGIN_IP_PER_MINUTE'] = float(os.environ.get('LOGIN_IP_PER_MINUTE', 10))
+app.config['LOGIN_USER_BURST'] = int(os.environ.get('LOGIN_USER_BURST', 5))
+app.config['LOGIN_USER_PER_MINUTE'] = float(os.environ.get('LOGIN_USER_PER_MINUTE', 1))
+init_throttle(app)
+
+# 查询结果缓存：配置 REDIS_URL 时多个 worker 共享
+app.config['CACHE_DEFAULT_TTL'] = int(os.environ.get('CACHE_DEFAULT_TTL', 30))
+# 配置了只读副本时，写入后 READ_YOUR_WRITES_WINDOW 秒内不回填缓存，避免把副本上的旧数据缓存下来
+app.config['CACHE_FILL_DELAY'] = (float(os.environ.get('READ_YOUR_WRITES_WINDOW', 5))
+                                  if os.environ.get('READ_DATABASE_URLS') else 0)
+init_cache(app)
+
+# 写接口幂等键有效期（秒）
+app.config['IDEMPOTENCY_TTL'] = int(os.environ.get('IDEMPOTENCY_TTL', 24 * 3600))
+init_idempotency(app)
+
+# 增量同步变更流水保留天数
+app.config['CHANGE_RETENTION_DAYS'] = int(os.environ.get('CHANGE_RETENTION_DAYS', 7))
+init_changes(app)
+
+# 注册蓝图
+app.register_blueprint(order_bp)
+app.register_blueprint(exeitem_bp)
+app.register_blueprint(report_bp)
+app.register_blueprint(job_bp)
+
+# Flask-Login 配置
+login_manager = LoginManager()
+login_manager.init_app(app)
+login_manager.login_view = 'login'
+login_manager.login_message = '请先登录'
+login_manager.login_message_category = 'warning'
+
+# ==================== 数据库连接池管理 ====================
+# 写入后在该时间窗口内，同一会话的读请求仍走主库（读己之写）
+READ_YOUR_WRITES_WINDOW = float(os.environ.get('READ_YOUR_WRITES_WINDOW', 5))
+
+def normalize_database_url(database_url):
+    """修复 postgres:// 前缀并补充 SSL 参数"""
+    # 修复URL格式
+    if database_url.startswith('postgres://'):
+        database_url = database_url.replace('postgres://', 'postgresql://')
+    
+    # 确保有SSL参数
+    if 'sslmode=' not in database_url:
+        if '?' in database_url:
+            database_url += '&sslmode=require'
+        else:
+            database_url += '?sslmode=require'
+    
+    return database_url
+
+class DatabasePool:
+    """简化的数据库连接池管理器
+
+    DATABASE_URL 为主库（读写）；READ_DATABASE_URLS 可配置一个或多个
+    只读副本（逗号分隔），只读请求轮流使用，副本不可用时回退主库。
+
+    每个库各有一个熔断器：数据库不可用时快速失败（CircuitOpenError），
+    按指数退避间隔放行单个探测请求重建连接池，而不是每个请求都去重连。
+    """
+    _pool = None
+    _read_pools = []
+    _read_breakers = []
+    _read_cursor = itertools.count()
+    _breaker = CircuitBreaker(
+        'primary',
+        failure_threshold=int(os.environ.get('DB_BREAKER_THRESHOLD', 3)),
+        base_delay=float(os.environ.get('DB_BREAKER_BASE_DELAY', 1)),
+        max_delay=float(os.environ.get('DB_BREAKER_MAX_DELAY', 60)),
+    )
+    # 连接 -> (所属连接池, 熔断器)，归还时放回原池
+    _owners = {}
+    
+    @staticmethod
+    def _connection_string():
+        """主库连接字符串"""
+        database_url = os.environ.get('DATABASE_URL')
+        if not database_url:
+            print("⚠️ DATABASE_URL not found, using local config")
+            # 本地开发配置
+            return "host=localhost dbname=plorder user=postgres password='' port=5432"
+        return normalize_database_url(database_url)
+    
+    @classmethod
+    def init_pool(cls):
+        """初始化连接池"""
+        try:
+            print(f"🔄 Creating connection pool...")
+            cls._pool = cls._breaker.call(cls._create_pool, cls._connection_string())
+            print("✅ Database connection pool initialized successfully")
+            
+        except Exception as e:
+            print(f"❌ Failed to initialize connection pool: {e}")
+            cls._pool = None
+        
+        cls.init_read_pools()
+    
+    @classmethod
+    def init_read_pools(cls):
+        """初始化只读副本连接池"""
+        read_urls = [url.strip() for url in os.environ.get('READ_DATABASE_URLS', '').split(',') if url.strip()]
+        pools = []
+        breakers = []
+        for index, read_url in enumerate(read_urls):
+            try:
+                pools.append(cls._create_pool(normalize_database_url(read_url)))
+                breakers.append(CircuitBreaker(
+                    f'replica{index + 1}',
+                    failure_threshold=cls._breaker.failure_threshold,
+                    base_delay=cls._breaker.base_delay,
+                    max_delay=cls._breaker.max_delay,
+                ))
+                print(f"✅ Read replica #{index + 1} pool initialized")
+            except Exception as e:
+                print(f"⚠️ Failed to initialize read replica #{index + 1}: {e}")
+        cls._read_pools = pools
+        cls._read_breakers = breakers
+    
+    @staticmethod
+    def _create_pool(connection_string):
+        """创建连接池并测试连接"""
+        # 关键修复：使用dsn参数
+        db_pool = psycopg2.pool.ThreadedConnectionPool(
+            minconn=1,
+            maxconn=10,
+            dsn=connection_string,  # 使用dsn参数传递连接字符串
+            **profiler.connect_kwargs()
+        )
+        
+        # 测试连接
+        conn = db_pool.getconn()
+        cursor = conn.cursor()
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+        cursor.close()
+        db_pool.putconn(conn)
+        return db_pool
+    
+    @classmethod
+    def get_connection(cls, readonly=False):
+        """获取数据库连接，readonly 为 True 时优先使用只读副本
+
+        主库熔断中抛出 CircuitOpenError，不再尝试连接
+        """
+        if readonly and cls._read_pools:
+            conn = cls._get_read_connection()
+            if conn is not None:
+                return conn
+        
+        cls._breaker.before_call()
+        try:
+            if cls._pool is None:
+                # 只有熔断器放行的探测请求才会重建连接池
+                cls._pool = cls._create_pool(cls._connection_string())
+                print("✅ Database connection pool re-initialized")
+            conn = cls._pool.getconn()
+        except pool.PoolError as e:
+            # 连接池耗尽，数据库本身正常：回退到直接连接
+            cls._breaker.record_success()
+            print(f"⚠️ Failed to get connection from pool: {e}")
+            return cls._get_direct_connection()
+        except Exception as e:
+            cls._breaker.record_failure(e)
+            raise
+        
+        cls._breaker.record_success()
+        cls._owners[id(conn)] = (cls._pool, cls._breaker)
+        metrics.incr('db.primary')
+        return conn
+    
+    @classmethod
+    def _get_read_connection(cls):
+        """轮流从只读副本获取连接，全部失败或熔断返回 None"""
+        pools = cls._read_pools
+        start = next(cls._read_cursor)
+        for offset in range(len(pools)):
+            index = (start + offset) % len(pools)
+            read_pool, breaker = pools[index], cls._read_breakers[index]
+            try:
+                breaker.before_call()
+            except CircuitOpenError:
+                continue
+            try:
+                conn = read_pool.getconn()
+            except Exception as e:
+                breaker.record_failure(e)
+                print(f"⚠️ Failed to get connection from read replica: {e}")
+                continue
+            breaker.record_success()
+            cls._owners[id(conn)] = (read_pool, breaker)
+            metrics.incr('db.replica')
+            return conn
+        metrics.incr('db.replica_fallback')
+        return None
+    
+    @classmethod
+    def return_connection(cls, conn, close=False):
+        """归还连接，close 为 True 时直接关闭（连接状态不确定时使用）"""
+        owner = cls._owners.pop(id(conn), None) if conn else None
+        if owner and conn:
+            owner_pool, breaker = owner
+            if conn.closed:
+                # 使用过程中连接断开，计入熔断
+                breaker.record_failure('connection closed during request')
+                close = True
+            try:
+                owner_pool.putconn(conn, close=close)
+            except Exception as e:
+                print(f"⚠️ Failed to return connection to pool: {e}")
+                try:
+                    conn.close()
+                except:
+                    pass
+        elif conn:
+            try:
+                conn.close()
+            except:
+                pass
+    
+    @classmethod
+    def _get_direct_connection(cls):
+        """直接连接数据库（连接池耗尽时的备用方案）"""
+        try:
+            database_url = os.environ.get('DATABASE_URL')
+            
+            if database_url:
+                conn = psycopg2.connect(normalize_database_url(database_url), **profiler.connect_kwargs())
+            else:
+                # 本地开发
+                conn = psycopg2.connect(
+                    host='localhost',
+                    database='plorder',
+                    user='postgres',
+                    password='',
+                    port=5432,
+                    **profiler.connect_kwargs()
+                )
+            
+            print("📡 Using direct database connection (fallback)")
+            return conn
+        except Exception as e:
+            cls._breaker.record_failure(e)
+            print(f"❌ Direct connection also failed: {e}")
+            raise
+    
+    @staticmethod
+    def _pool_stats(db_pool):
+        """连接池使用情况（只读取内部状态，不占用连接）"""
+        if db_pool is None:
+            return None
+        return {
+            'min': db_pool.minconn,
+            'max': db_pool.maxconn,
+            'in_use': len(db_pool._used),
+            'idle': len(db_pool._pool),
+            'closed': db_pool.closed,
+        }
+    
+    @classmethod
+    def probe(cls):
+        """主库不可用时尝试恢复（退避期内直接跳过），正常时什么也不做
+
+        熔断后若没有请求进来就不会有探测，由就绪检查触发
+        """
+        if cls._pool is not None and cls._breaker.stats()['state'] == CLOSED:
+            return
+        try:
+            cls.return_connection(cls.get_connection())
+        except Exception:
+            pass
+    
+    @classmethod
+    def stats(cls):
+        """熔断器状态与连接池统计"""
+        return {
+            'primary': {
+                'breaker': cls._breaker.stats(),
+                'pool': cls._pool_stats(cls._pool),
+            },
+            'replicas': [
+                {'breaker': breaker.stats(), 'pool': cls._pool_stats(read_pool)}
+                for read_pool, breaker in zip(cls._read_pools, cls._read_breakers)
+            ],
+        }
+    
+    @classmethod
+    def close_all(cls):
+        """关闭所有连接"""
+        for db_pool in [cls._pool] + cls._read_pools:
+            if db_pool:
+                try:
+                    db_pool.closeall()
+                    print("🔒 Connection pool closed")
+                except Exception as e:
+                    print(f"⚠️ Error closing pool: {e}")
+
+def recently_wrote():
+    """当前会话是否在 READ_YOUR_WRITES_WINDOW 秒内写入过"""
+    if not has_request_context():
+        return False
+    written_at = session.get('_db_write_at')
+    return bool(written_at and time.time() - written_at < READ_YOUR_WRITES_WINDOW)
+
+def use_read_replica():
+    """当前请求是否可以走只读副本
+
+    只有 GET/HEAD 请求走副本；同一会话写入后的 READ_YOUR_WRITES_WINDOW 秒内
+    仍走主库，避免刚提交的数据在副本上还看不到。
+    """
+    if not has_request_context() or request.method not in ('GET', 'HEAD'):
+        return False
+    return not recently_wrote()
+
+# 应用启动时初始化连接池
+DatabasePool.init_pool()
+
+# 简化连接获取函数
+def get_db_connection():
+    """获取数据库连接（只读请求自动路由到副本）"""
+    return DatabasePool.get_connection(readonly=use_read_replica())
+
+def close_db_connection(conn):
+    """释放数据库连接"""
+    DatabasePool.return_connection(conn)
+
+# ==================== 订单归档 ====================
+# 已结束订单超过多少天归档；ARCHIVE_INTERVAL 为自动归档间隔（秒），0 表示只通过命令行执行
+ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 365))
+ARCHIVE_INTERVAL = int(os.environ.get('ARCHIVE_INTERVAL', 0))
+
+# item 月分区始终由后台线程提前创建（启动时一次，之后每 PARTITION_CHECK_INTERVAL 秒）
+app.config['PARTITION_CHECK_INTERVAL'] = int(os.environ.get('PARTITION_CHECK_INTERVAL', 6 * 3600))
+init_archive(app, DatabasePool.get_connection, DatabasePool.return_connection)
+
+if ARCHIVE_INTERVAL > 0:
+    from archive import start_scheduler
+    start_scheduler(get_db_connection, close_db_connection, ARCHIVE_INTERVAL, ARCHIVE_AFTER_DAYS)
+    print(f"🗄️ Order archive scheduled every {ARCHIVE_INTERVAL}s (after {ARCHIVE_AFTER_DAYS} days)")
+
+# ==================== 后台任务 ====================
+# 报表与大批量导出的后台线程数、排队上限、结果文件目录与有效期（秒）
+# 任务的查询走只读副本（提交前刚写入过的会话除外），任务状态读写走主库
+app.config['JOB_WORKERS'] = int(os.environ.get('JOB_WORKERS', 2))
+app.config['JOB_QUEUE_SIZE'] = int(os.environ.get('JOB_QUEUE_SIZE', 16))
+if os.environ.get('JOB_RESULT_DIR'):
+    app.config['JOB_RESULT_DIR'] = os.environ['JOB_RESULT_DIR']
+app.config['JOB_RESULT_TTL'] = int(os.environ.get('JOB_RESULT_TTL', 600))
+init_jobs(app, DatabasePool.get_connection, DatabasePool.return_connection)
+
+# 服务目录：每隔 CATALOG_CHECK_INTERVAL 秒检查一次版本号（读只读副本）
+app.config['CATALOG_CHECK_INTERVAL'] = int(os.environ.get('CATALOG_CHECK_INTERVAL', 30))
+init_catalog(app, DatabasePool.get_connection, DatabasePool.return_connection)
+
+# 仪表盘等相互独立的统计查询并行执行的线程数（每个线程占用一个连接，只读查询走副本）
+app.config['QUERY_FANOUT_WORKERS'] = int(os.environ.get('QUERY_FANOUT_WORKERS', 4))
+app.config['QUERY_FANOUT_TIMEOUT'] = float(os.environ.get('QUERY_FANOUT_TIMEOUT', 30))
+init_fanout(app, DatabasePool.get_connection, DatabasePool.return_connection)
+
+# ==================== 用户模型 ====================
+class User(UserMixin):
+    def __init__(self, id, username, role):
+        self.id = id
+        self.username = username
+        self.role = role
+
+# 每个请求都会加载当前用户
+prepared.register('load_user', "SELECT * FROM users WHERE id = %s")
+
+@login_manager.user_loader
+def load_user(user_id):
+    """加载用户"""
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor(cursor_factory=DictCursor)
+        prepared.execute(cursor, 'load_user', (int(user_id),))
+        user_data = cursor.fetchone()
+        cursor.close()
+        close_db_connection(conn)
+
+        if user_data:
+            return User(user_data['id'], user_data['username'], user_data['role'])
+        return None
+    except Exception as e:
+        print(f"加载用户失败: {e}")
+        return None
+
+# ==================== 辅助函数 ====================
+def is_mobile_request():
+    """检测是否为移动设备"""
+    user_agent = request.headers.get('User-Agent', '').lower()
+    mobile_keywords = ['mobile', 'android', 'iphone', 'ipad']
+    return any(keyword in user_agent for keyword in mobile_keywords)
+
+# ==================== 路由定义 ====================
+@app.route('/')
+def index():
+    """首页"""
+    if current_user.is_authenticated:
+        return redirect(url_for('dashboard'))
+    return render_template('login.html', is_mobile=is_mobile_request())
+
+@app.route('/login', methods=['GET', 'POST'])
+@admit(PRIORITY_READ)
+def login():
+    """登录页面"""
+    if current_user.is_authenticated:
+        flash('您已经登录了', 'info')
+        return redirect(url_for('dashboard'))
+    
+    if request.method == 'POST':
+        username = request.form.get('username', '').strip()
+        password = request.form.get('password', '').strip()
+
+        if not username or not password:
+            flash('请输入用户名和密码', 'error')
+            return render_template('login.html', is_mobile=is_mobile_request())
+        
+        # 先限流再查库，撞库请求不占用数据库连接
+        wait = login_throttle.check(request.remote_addr or '-', username)
+        if wait is not None:
+            retry_after = max(int(wait + 0.999), 1)
+            flash(f'登录尝试过于频繁，请 {retry_after} 秒后再试', 'error')
+            return render_template('login.html', is_mobile=is_mobile_request()), 429, {'Retry-After': str(retry_after)}
+        
+        try:
+            conn = get_db_connection()
+            cursor = conn.cursor(cursor_factory=DictCursor)
+            cursor.execute("SELECT * FROM users WHERE username = %s AND password = %s", 
+                         (username, password))
+            user = cursor.fetchone()
+            cursor.close()
+            close_db_connection(conn)
+            
+            if user:
+                user_obj = User(user['id'], user['username'], user['role'])
+                login_user(user_obj)
+                flash(f'欢迎回来，{username}！', 'success')
+                return redirect(request.args.get('next') or url_for('dashboard'))
+            else:
+                flash('用户名或密码错误', 'error')
+                
+        except Exception as e:
+            print(f"登录出错: {e}")
+            flash('系统错误，请稍后重试', 'error')
+    
+    return render_template('login.html', is_mobile=is_mobile_request())
+
+@app.route('/logout')
+@login_required
+def logout():
+    """退出登录"""
+    logout_user()
+    flash('您已成功退出登录', 'info')
+    return redirect(url_for('login'))
+
+@app.route('/dashboard')
+@login_required
+def dashboard():
+    """控制台页面（首屏数据直接嵌入页面，失败时由页面脚本再请求接口）"""
+    try:
+        bootstrap = dashboard_bootstrap()
+    except Exception as e:
+        print(f"⚠️ Dashboard bootstrap failed: {e}")
+        bootstrap = None
+    return render_template('dashboard.html', now=datetime.now(), is_mobile=is_mobile_request(),
+                           bootstrap=bootstrap)
+
+@app.route('/about')
+@login_required
+def about():
+    """关于系统页面"""
+    return render_template('about.html', is_mobile=is_mobile_request())
+
+@app.route('/health')
+@app.route('/health/ready')
+def health():
+    """就绪检查：报告熔断器状态与连接池统计，数据库正常时不占用连接"""
+    DatabasePool.probe()
+    db_stats = DatabasePool.stats()
+    ready = db_stats['primary']['pool'] is not None and db_stats['primary']['breaker']['state'] == CLOSED
+    return jsonify({
+        'status': 'healthy' if ready else 'unhealthy',
+        'database': db_stats,
+        'timestamp': datetime.now().isoformat()
+    }), 200 if ready else 503
+
+@app.route('/health/live')
+def liveness():
+    """存活检查：进程能处理请求即可"""
+    return jsonify({
+        'status': 'alive',
+        'timestamp': datetime.now().isoformat()
+    }), 200
+
+@app.route('/metrics')
+def metrics_view():
+    """运行指标"""
+    return jsonify({
+        'code': 0,
+        'data': metrics.snapshot(),
+        'admission': admission.stats(),
+        'jobs': job_runner.stats()
+    })
+
+def can_view_profiles():
+    """剖析结果仅管理员可见：登录用户角色为 PROFILE_ADMIN_ROLE，或请求头 X-Profile 带剖析令牌"""
+    if profiler.check_token(request.headers.get('X-Profile')):
+        return True
+    return current_user.is_authenticated and current_user.role == app.config['PROFILE_ADMIN_ROLE']
+
+@app.route('/admin/profiles')
+def list_profiles():
+    """最近的请求剖析结果"""
+    if not can_view_profiles():
+        return jsonify({'code': 1, 'msg': '无权查看剖析结果'}), 403
+    limit = min(max(request.args.get('limit', 100, type=int), 1), 500)
+    return jsonify({
+        'code': 0,
+        'enabled': profiler.enabled,
+        'data': profiler.list(limit)
+    })
+
+@app.route('/admin/profiles/<name>')
+def download_profile(name):
+    """下载剖析结果：.prof 为 pstats 文件，.json 含热点函数与 SQL 明细"""
+    if not can_view_profiles():
+        return jsonify({'code': 1, 'msg': '无权查看剖析结果'}), 403
+    path = profiler.path(name)
+    if path is None:
+        return jsonify({'code': 1, 'msg': '剖析结果不存在'}), 404
+    if name.endswith('.json'):
+        return send_file(path, mimetype='application/json')
+    return send_file(path, mimetype='application/octet-stream', as_attachment=True, download_name=name)
+
+# ==================== 错误处理 ====================
+@app.errorhandler(CircuitOpenError)
+def database_unavailable(error):
+    """数据库熔断中：快速返回 503（蓝图接口在 except Exception 之前放行 CircuitOpenError）"""
+    response = jsonify({'code': 1, 'msg': '数据库暂时不可用，请稍后重试'})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(max(int(error.retry_after), 1))
+    return response
+
+@app.errorhandler(404)
+def not_found(error):
+    return render_template('404.html', is_mobile=is_mobile_request()), 404
+
+@app.errorhandler(500)
+def internal_error(error):
+    return render_template('500.html', is_mobile=is_mobile_request()), 500
+
+@app.errorhandler(403)
+def forbidden(error):
+    return render_template('403.html', is_mobile=is_mobile_request()), 403
+
+# ==================== 上下文处理器 ====================
+@app.context_processor
+def inject_variables():
+    """向所有模板注入常用变量"""
+    return {
+        'now': datetime.now(),
+        'is_mobile': is_mobile_request(),
+        'current_user': current_user
+    }
+
+# ==================== 命令行 ====================
+import click
+
+@app.cli.command('import-history')
+@click.argument('paths', nargs=-1, required=True)
+@click.option('--skip-invalid', is_flag=True, help='丢弃引用不合法的行（默认整体回滚）')
+def import_history(paths, skip_invalid):
+    """批量导入历史订单：MySQL 转储(.sql) 或 order_list/order_service/item.csv"""
+    from bulk_import import load_paths, run_import
+
+    sources, null_marker = load_paths(paths)
+    conn = get_db_connection()
+    try:
+        report = run_import(conn, sources, skip_invalid=skip_invalid, null_marker=null_marker)
+        cache.invalidate('orders')
+    finally:
+        close_db_connection(conn)
+        for source in sources.values():
+            source.close()
+
+    for table, stats in report['tables'].items():
+        click.echo(f"{table}: 暂存 {stats['staged']} 行，新增 {stats.get('inserted', 0)} 行")
+    for description, count in report['invalid'].items():
+        click.echo(f"⚠️ 已丢弃 {description}: {count} 行")
+    if report['existing_orders']:
+        click.echo(f"⏭️ 跳过之前导入过的订单 {report['existing_orders']} 个")
+    if report['remapped_orders'] or report['remapped_items']:
+        click.echo(f"🔀 编号已被占用、重新分配：订单 {report['remapped_orders']} 个，"
+                   f"执行记录 {report['remapped_items']} 条")
+    click.echo(f"✅ 共 {report['rows']} 行，用时 {report['seconds']}s，{report['rows_per_second']} 行/秒，"
+               f"状态变更订单 {report['status_changed']} 个")
+
+@app.cli.command('archive-orders')
+@click.option('--days', type=int, default=None, help='归档多少天前结束的订单（默认 ARCHIVE_AFTER_DAYS）')
+@click.option('--batch-size', type=int, default=500, help='每批归档的订单数')
+@click.option('--dry-run', is_flag=True, help='只统计可归档的订单数')
+def archive_orders(days, batch_size, dry_run):
+    """归档已结束的订单（连同服务与执行记录），并提前创建 item 分区"""
+    from archive import count_archivable, run_archive_job
+
+    days = ARCHIVE_AFTER_DAYS if days is None else days
+    conn = get_db_connection()
+    try:
+        if dry_run:
+            click.echo(f"可归档订单 {count_archivable(conn, days)} 个（{days} 天前结束）")
+            return
+        report = run_archive_job(conn, days, batch_size)
+    finally:
+        close_db_connection(conn)
+
+    if report is None:
+        click.echo("⚠️ 其他进程正在执行归档，已跳过")
+        return
+    click.echo(f"✅ 新建分区 {report['partitions_created']} 个，归档订单 {report['order_list']} 个、"
+               f"服务 {report['order_service']} 条、执行记录 {report['item']} 条，用时 {report['seconds']}s")
+
+# ==================== 应用关闭处理 ====================
+import atexit
+
+@atexit.register
+def cleanup():
+    """应用退出时清理连接池"""
+    DatabasePool.close_all()
+
+@app.after_request
+def pin_primary_after_write(response):
+    """写请求后记录时间，短时间内的读请求固定走主库"""
+    if request.method in ('POST', 'PUT', 'PATCH', 'DELETE') and DatabasePool._read_pools:
+        session['_db_write_at'] = time.time()
+    return response
+
+# Flask teardown 处理
+@app.teardown_appcontext
+def teardown_db(exception):
+    """请求结束时自动关闭数据库连接"""
+    # Flask 会自动处理请求上下文，这里主要做清理
+    pass
+
+if __name__ == '__main__':
+    port = int(os.environ.get('PORT', 5000))
+    app.run(host='0.0.0.0', port=port, debug=False)
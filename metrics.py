@@ -0,0 +1,65 @@
+"""进程内运行指标
+
+简单的线程安全计数器与耗时统计，通过 /metrics 查看。
+多 worker 部署时每个进程各自计数。
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Metrics:
+    """计数器 + 耗时统计"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._timers = {}
+        self._started_at = time.time()
+
+    def incr(self, name, value=1):
+        """计数器累加"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name, seconds):
+        """记录一次耗时（秒）"""
+        with self._lock:
+            stat = self._timers.get(name)
+            if stat is None:
+                stat = self._timers[name] = {'count': 0, 'total': 0.0, 'max': 0.0}
+            stat['count'] += 1
+            stat['total'] += seconds
+            if seconds > stat['max']:
+                stat['max'] = seconds
+
+    @contextmanager
+    def timer(self, name):
+        """统计代码块耗时"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def snapshot(self):
+        """导出当前指标"""
+        with self._lock:
+            timers = {
+                name: {
+                    'count': stat['count'],
+                    'total_ms': round(stat['total'] * 1000, 3),
+                    'avg_ms': round(stat['total'] * 1000 / stat['count'], 3) if stat['count'] else 0,
+                    'max_ms': round(stat['max'] * 1000, 3),
+                }
+                for name, stat in self._timers.items()
+            }
+            return {
+                'uptime_seconds': round(time.time() - self._started_at, 1),
+                'counters': dict(self._counters),
+                'timers': timers,
+            }
+
+
+# 全局指标实例
+metrics = Metrics()
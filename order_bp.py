@@ -1,593 +1,1273 @@
-from flask import Blueprint, render_template, request, jsonify, current_app
-from datetime import datetime
-from flask_login import current_user
-import psycopg2
-from psycopg2.extras import DictCursor
-import os
-import urllib.parse
-
-# 创建订单管理蓝图
-order_bp = Blueprint('orders', __name__, url_prefix='/orders')
-
-def get_db_connection():
-    """获取数据库连接 - 使用主应用的连接池"""
-    from main import DatabasePool
-    return DatabasePool.get_connection()
-
-def close_db_connection(conn):
-    """关闭数据库连接"""
-    from main import DatabasePool
-    DatabasePool.return_connection(conn)
-
-@order_bp.route('/all')
-def list_all():
-    """显示全部订单页面"""
-    return render_template('orders/all_orders.html')
-
-@order_bp.route('/pending')
-def list_pending():
-    """显示待使用订单页面"""
-    return render_template('orders/pending_orders.html')
-
-@order_bp.route('/started')
-def list_started():
-    """显示已开始订单页面"""
-    return render_template('orders/started_orders.html')
-
-@order_bp.route('/used')
-def list_used():
-    """显示已完结订单页面"""
-    return render_template('orders/used_orders.html')
-
-@order_bp.route('/cancel')
-def list_cancel():
-    """显示已取消订单页面"""
-    return render_template('orders/cancel_orders.html')
-
-@order_bp.route('/api/orders')
-def get_orders_data():
-    """获取订单数据的API接口 - 直接在SQL中处理"""
-    try:
-        # 获取查询参数
-        page = request.args.get('page', 1, type=int)
-        limit = request.args.get('limit', 15, type=int)
-        search = request.args.get('search', '')
-        status_filter = request.args.get('status', '')
-        
-        # 计算分页
-        offset = (page - 1) * limit
-        
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=DictCursor)
-        
-        # 构建查询条件
-        where_conditions = []
-        params = []
-        
-        # 搜索条件
-        if search:
-            where_conditions.append("""
-                (order_id::text LIKE %s OR 
-                 order_info LIKE %s OR 
-                 order_remark LIKE %s)
-            """)
-            search_term = f"%{search}%"
-            params.extend([search_term, search_term, search_term])
-        
-        # 状态过滤条件
-        if status_filter:
-            where_conditions.append("order_status = %s")
-            params.append(status_filter)
-        
-        # 构建安全的 WHERE 子句
-        if where_conditions:
-            where_clause = "WHERE " + " AND ".join(where_conditions)
-        else:
-            where_clause = ""
-        
-        # 查询总数
-        count_query = f"SELECT COUNT(*) as total FROM order_list {where_clause}"
-        cursor.execute(count_query, params)
-        total_result = cursor.fetchone()
-        total = total_result['total'] if total_result else 0
-        
-        # 查询订单数据 - 直接在SQL中处理状态显示
-        query = f"""
-            SELECT 
-                order_id,
-                order_info,
-                order_price,
-                order_disprice,
-                order_buytime,
-                order_status,
-                order_remark,
-                -- 在SQL中直接计算状态显示文本和颜色
-                CASE order_status
-                    WHEN 'pending' THEN '待使用'
-                    WHEN 'started' THEN '已开始'
-                    WHEN 'used' THEN '已完成'
-                    WHEN 'cancel' THEN '已取消'
-                    WHEN 'cancelled' THEN '已取消'
-                    ELSE COALESCE(order_status::text, '未知')
-                END as status_text,
-                CASE order_status
-                    WHEN 'pending' THEN 'orange'
-                    WHEN 'started' THEN 'blue'
-                    WHEN 'used' THEN 'green'
-                    WHEN 'cancel' THEN 'red'
-                    WHEN 'cancelled' THEN 'red'
-                    ELSE 'gray'
-                END as status_color
-            FROM order_list 
-            {where_clause}
-            ORDER BY order_id DESC 
-            LIMIT %s OFFSET %s
-        """
-        
-        # 添加分页参数
-        query_params = params + [limit, offset]
-        
-        print(f"执行查询: {query}")
-        
-        cursor.execute(query, query_params)
-        orders = cursor.fetchall()
-        
-        print(f"查询到 {len(orders)} 条记录")
-        
-        # 只需处理日期和格式，状态已经在SQL中处理了
-        for order in orders:
-            if order['order_buytime']:
-                order['order_buytime'] = order['order_buytime'].strftime('%Y-%m-%d %H:%M:%S')
-            else:
-                order['order_buytime'] = '-'
-            
-            # 确保字段存在
-            order['order_id'] = order['order_id'] or '-'
-            order['order_info'] = order['order_info'] or '-'
-            order['order_remark'] = order['order_remark'] or '-'
-            
-            # 处理价格字段
-            if order['order_price'] is not None:
-                try:
-                    order['order_price'] = str(float(order['order_price']))
-                except:
-                    order['order_price'] = '-'
-            else:
-                order['order_price'] = '-'
-                
-            if order['order_disprice'] is not None:
-                try:
-                    order['order_disprice'] = str(float(order['order_disprice']))
-                except:
-                    order['order_disprice'] = '-'
-            else:
-                order['order_disprice'] = '-'
-        
-        cursor.close()
-        close_db_connection(conn)
-        
-        return jsonify({
-            'code': 0,
-            'msg': '成功',
-            'count': total,
-            'data': orders
-        })
-        
-    except Exception as e:
-        print(f"API错误: {str(e)}")
-        import traceback
-        error_trace = traceback.format_exc()
-        print(f"详细错误: {error_trace}")
-        
-        return jsonify({
-            'code': 1,
-            'msg': f'获取数据失败: {str(e)}',
-            'count': 0,
-            'data': []
-        })
-
-def get_status_text(status):
-    """获取状态显示文本 -"""
-    if status is None:
-        return '未知'
-    
-    status_str = str(status).strip().lower()
-    
-    status_map = {
-        'pending': '待使用',
-        'started': '已开始', 
-        'used': '已完成',
-        'cancel': '已取消',
-        'cancelled': '已取消',  # 兼容两种拼写
-    }
-    
-    return status_map.get(status_str, status_str)
-
-def get_status_color(status):
-    """获取状态颜色 """
-    if status is None:
-        return 'gray'
-    
-    status_str = str(status).strip().lower()
-    
-    color_map = {
-        'pending': 'orange',
-        'started': 'blue',
-        'used': 'green',
-        'cancel': 'red',
-        'cancelled': 'red',  # 兼容两种拼写
-    }
-    
-    return color_map.get(status_str, 'gray')
-
-@order_bp.route('/api/order/<order_id>')
-def get_order_detail(order_id):
-    """获取单个订单详情"""
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=DictCursor)
-
-        query = """
-            SELECT 
-                order_id,
-                order_info,
-                order_price,
-                order_disprice,
-                order_buytime,
-                order_status,
-                order_remark
-            FROM order_list 
-            WHERE order_id = %s
-        """
-        cursor.execute(query, (order_id,))
-        order = cursor.fetchone()
-        
-        if order and order['order_buytime']:
-            order['order_buytime'] = order['order_buytime'].strftime('%Y-%m-%d %H:%M:%S')
-        
-        cursor.close()
-        close_db_connection(conn)
-        
-        if order:
-            return jsonify({
-                'code': 0,
-                'msg': '成功',
-                'data': order
-            })
-        else:
-            return jsonify({
-                'code': 1,
-                'msg': '订单不存在'
-            })
-            
-    except Exception as e:
-        return jsonify({
-            'code': 1,
-            'msg': f'获取订单详情失败: {str(e)}'
-        })
-
-@order_bp.route('/api/dashboard-stats')
-def dashboard_stats():
-    """获取仪表盘统计数据"""
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=DictCursor)
-        
-        # 1. 总订单数
-        cursor.execute("SELECT COUNT(*) as total FROM order_list")
-        total_orders = cursor.fetchone()['total']
-        
-        # 2. 总金额（所有订单的折扣金额）
-        cursor.execute("SELECT COALESCE(SUM(order_disprice), 0) as total FROM order_list")
-        total_amount = float(cursor.fetchone()['total'])
-        
-        # 3. 待使用订单数量
-        cursor.execute("SELECT COUNT(*) as total FROM order_list WHERE order_status = 'pending'")
-        pending_orders = cursor.fetchone()['total']
-        
-        # 4. 已消费金额 = used订单总金额 + started订单中已使用的项目金额
-        # used订单总金额
-        cursor.execute("SELECT COALESCE(SUM(order_disprice), 0) as total FROM order_list WHERE order_status = 'used'")
-        used_amount = float(cursor.fetchone()['total'])
-        
-        # started订单中已使用的项目金额
-        cursor.execute("""
-            SELECT COALESCE(SUM(i.item_price), 0) as total 
-            FROM order_list ol 
-            JOIN item i ON ol.order_id = i.record_id 
-            WHERE ol.order_status = 'started'
-        """)
-        started_consumed_result = cursor.fetchone()
-        started_consumed = float(started_consumed_result['total']) if started_consumed_result['total'] else 0.0
-        
-        consumed_amount = used_amount + started_consumed
-        
-        # 5. 最近订单
-        cursor.execute("""
-            SELECT order_id, order_info, order_price, order_disprice, order_status, order_buytime
-            FROM order_list 
-            ORDER BY order_buytime DESC 
-            LIMIT 5
-        """)
-        recent_orders = cursor.fetchall()
-        
-        # 处理最近订单数据
-        processed_orders = []
-        for order in recent_orders:
-            status_color = {
-                'pending': 'orange',
-                'started': 'blue', 
-                'used': 'green',
-                'cancelled': 'gray'
-            }.get(order['order_status'], 'gray')
-            
-            status_text = {
-                'pending': '待使用',
-                'started': '进行中',
-                'used': '已完成', 
-                'cancelled': '已取消'
-            }.get(order['order_status'], '未知')
-            
-            processed_orders.append({
-                'order_id': order['order_id'],
-                'order_info': order['order_info'],
-                'order_price': float(order['order_price']) if order['order_price'] else 0,
-                'order_disprice': float(order['order_disprice']) if order['order_disprice'] else 0,
-                'order_buytime': order['order_buytime'].strftime('%Y-%m-%d') if order['order_buytime'] else '-',
-                'status_color': status_color,
-                'status_text': status_text
-            })
-        
-        cursor.close()
-        close_db_connection(conn)
-        
-        return jsonify({
-            'code': 0,
-            'data': {
-                'total_orders': total_orders,
-                'total_amount': total_amount,
-                'pending_orders': pending_orders,
-                'consumed_amount': consumed_amount,
-                'recent_orders': processed_orders
-            }
-        })
-        
-    except Exception as e:
-        current_app.logger.error(f"获取仪表盘数据失败: {str(e)}")
-        return jsonify({
-            'code': 1,
-            'msg': f'获取数据失败: {str(e)}'
-        })
-
-@order_bp.route('/api/service-trend')
-def service_trend():
-    """获取服务趋势数据（一年12个月的服务数量）"""
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=DictCursor)
-        
-        # 获取当前年份
-        current_year = datetime.now().year
-        
-        # 查询每个月服务数量 - PostgreSQL 语法
-        query = """
-            SELECT 
-                EXTRACT(MONTH FROM exetime) as month,
-                COUNT(*) as count
-            FROM item 
-            WHERE EXTRACT(YEAR FROM exetime) = %s
-            GROUP BY EXTRACT(MONTH FROM exetime)
-            ORDER BY month
-        """
-        cursor.execute(query, (current_year,))
-        monthly_data = cursor.fetchall()
-        
-        # 创建12个月的数据，没有数据的月份为0
-        months = ['1月', '2月', '3月', '4月', '5月', '6月', 
-                 '7月', '8月', '9月', '10月', '11月', '12月']
-        counts = [0] * 12
-        
-        for data in monthly_data:
-            month_index = int(data['month']) - 1  # 月份从1开始，数组从0开始
-            if 0 <= month_index < 12:
-                counts[month_index] = data['count']
-        
-        cursor.close()
-        close_db_connection(conn)
-        
-        return jsonify({
-            'code': 0,
-            'data': {
-                'months': months,
-                'counts': counts
-            }
-        })
-        
-    except Exception as e:
-        current_app.logger.error(f"获取服务趋势失败: {str(e)}")
-        return jsonify({
-            'code': 1,
-            'msg': f'获取服务趋势失败: {str(e)}'
-        })
-
-@order_bp.route('/api/services')
-def get_services():
-    """获取所有服务项目"""
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=DictCursor)
-        
-        # PostgreSQL 中 desc 是关键字，需要引号
-        cursor.execute('SELECT service_id, "desc", package, type, part FROM service ORDER BY "desc"')
-        services = cursor.fetchall()
-        
-        cursor.close()
-        close_db_connection(conn)
-        
-        return jsonify({
-            'code': 0,
-            'data': services
-        })
-        
-    except Exception as e:
-        current_app.logger.error(f"获取服务列表失败: {str(e)}")
-        return jsonify({
-            'code': 1,
-            'msg': f'获取服务列表失败: {str(e)}'
-        })
-
-@order_bp.route('/api/add', methods=['POST'])
-def add_order():
-    """添加新订单"""
-    conn = None
-    try:
-        data = request.get_json()
-        
-        # 验证必要字段
-        required_fields = ['order_info', 'order_price', 'order_disprice', 'order_status']
-        for field in required_fields:
-            if not data.get(field):
-                return jsonify({'code': 1, 'msg': f'缺少必要字段: {field}'})
-        
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # 插入订单基本信息 - PostgreSQL 语法
-        order_query = """
-            INSERT INTO order_list (order_info, order_price, order_disprice, order_status, order_remark, order_buytime)
-            VALUES (%s, %s, %s, %s, %s, NOW())
-            RETURNING order_id
-        """
-        cursor.execute(order_query, (
-            data['order_info'],
-            float(data['order_price']),
-            float(data['order_disprice']),
-            data['order_status'],
-            data.get('order_remark', '')
-        ))
-        
-        order_id = cursor.fetchone()[0]
-        
-        # 插入关联的服务项目
-        if data.get('services'):
-            service_query = """
-                INSERT INTO order_service (order_id, service_id, quantity, service_status)
-                VALUES (%s, %s, %s, 'pending')
-            """
-            for service in data['services']:
-                cursor.execute(service_query, (
-                    order_id,
-                    service['service_id'],
-                    service.get('quantity', 1)
-                ))
-        
-        conn.commit()
-        cursor.close()
-        
-        return jsonify({
-            'code': 0,
-            'msg': '订单添加成功',
-            'data': {'order_id': order_id}
-        })
-        
-    except Exception as e:
-        if conn:
-            conn.rollback()
-        current_app.logger.error(f"添加订单失败: {str(e)}")
-        return jsonify({
-            'code': 1,
-            'msg': f'添加订单失败: {str(e)}'
-        })
-    finally:
-        if conn:
-            close_db_connection(conn)
-
-@order_bp.route('/add')
-def add_order_page():
-    """添加订单页面"""
-    return render_template('orders/add_order.html')
-
-# 新增订单操作API
-@order_bp.route('/api/update-status', methods=['POST'])
-def update_order_status():
-    """更新订单状态"""
-    conn = None
-    try:
-        data = request.get_json()
-        order_id = data.get('order_id')
-        new_status = data.get('status')
-        
-        if not order_id or not new_status:
-            return jsonify({'code': 1, 'msg': '缺少必要参数'})
-        
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # 更新订单状态
-        cursor.execute("""
-            UPDATE order_list 
-            SET order_status = %s 
-            WHERE order_id = %s
-        """, (new_status, order_id))
-        
-        conn.commit()
-        cursor.close()
-        
-        return jsonify({
-            'code': 0,
-            'msg': '状态更新成功'
-        })
-        
-    except Exception as e:
-        if conn:
-            conn.rollback()
-        current_app.logger.error(f"更新订单状态失败: {str(e)}")
-        return jsonify({
-            'code': 1,
-            'msg': f'更新失败: {str(e)}'
-        })
-    finally:
-        if conn:
-            close_db_connection(conn)
-
-@order_bp.route('/api/delete', methods=['POST'])
-def delete_order():
-    """删除订单"""
-    conn = None
-    try:
-        data = request.get_json()
-        order_id = data.get('order_id')
-        
-        if not order_id:
-            return jsonify({'code': 1, 'msg': '缺少订单ID'})
-        
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # 先删除关联的项目
-        cursor.execute("DELETE FROM item WHERE record_id = %s", (order_id,))
-        
-        # 删除订单
-        cursor.execute("DELETE FROM order_list WHERE order_id = %s", (order_id,))
-        
-        conn.commit()
-        cursor.close()
-        
-        return jsonify({
-            'code': 0,
-            'msg': '订单删除成功'
-        })
-        
-    except Exception as e:
-        if conn:
-            conn.rollback()
-        current_app.logger.error(f"删除订单失败: {str(e)}")
-        return jsonify({
-            'code': 1,
-            'msg': f'删除失败: {str(e)}'
-        })
-    finally:
-        if conn:
-            close_db_connection(conn)
-
-
+from flask import Blueprint, render_template, request, jsonify, current_app
+from datetime import datetime
+from flask_login import current_user, login_required
+import psycopg2
+from psycopg2.extras import DictCursor
+import os
+import urllib.parse
+from row_format import (
+    row_mapper, map_rows, fmt_time, to_float,
+    as_text, as_float, as_price_text, as_time, DATE_FMT,
+    parse_fields, select_fields, wants_flag,
+)
+from copy_export import stream_copy, export_filename
+from archive import wants_archived, table_source, archive_available
+from cache import cache
+from breaker import CircuitOpenError
+from admission import admit, PRIORITY_WRITE, PRIORITY_READ, PRIORITY_POLL
+from idempotency import idempotency, IdempotencyError, error_response
+from changes import change_log
+from catalog import catalog, SEARCH_MAX_LIMIT
+from fanout import fanout
+import prepared
+
+# 创建订单管理蓝图
+order_bp = Blueprint('orders', __name__, url_prefix='/orders')
+
+# ==================== 行格式 ====================
+# 订单列表行
+ORDER_LIST_ROW = row_mapper(
+    ('order_id', 'order_id', as_text('-')),
+    ('order_info', 'order_info', as_text('-')),
+    ('order_price', 'order_price', as_price_text()),
+    ('order_disprice', 'order_disprice', as_price_text()),
+    ('order_buytime', 'order_buytime', as_time()),
+    ('order_status', 'order_status', None),
+    ('order_remark', 'order_remark', as_text('-')),
+    ('status_text', 'status_text', None),
+    ('status_color', 'status_color', None),
+)
+
+# 订单详情行
+ORDER_DETAIL_ROW = row_mapper(
+    ('order_id', 'order_id', None),
+    ('order_info', 'order_info', None),
+    ('order_price', 'order_price', None),
+    ('order_disprice', 'order_disprice', None),
+    ('order_buytime', 'order_buytime', as_time(default=None)),
+    ('order_status', 'order_status', None),
+    ('order_remark', 'order_remark', None),
+)
+
+# 完整详情中的服务行（含进度）
+FULL_SERVICE_ROW = row_mapper(
+    ('service_id', 'service_id', None),
+    ('desc', 'desc', None),
+    ('package', 'package', None),
+    ('type', 'type', None),
+    ('part', 'part', None),
+    ('quantity', 'quantity', None),
+    ('completed_quantity', 'completed_quantity', None),
+    ('service_status', 'service_status', None),
+)
+
+# 完整详情中的执行记录行
+FULL_ITEM_ROW = row_mapper(
+    ('item_id', 'item_id', None),
+    ('service_id', 'service_id', None),
+    ('item_name', 'item_name', as_text('未命名')),
+    ('item_price', 'item_price', as_float()),
+    ('item_remark', 'item_remark', as_text('')),
+    ('exetime', 'exetime', as_time(DATE_FMT)),
+)
+
+# 批量查询一次最多的订单数
+MAX_BATCH_ORDERS = 200
+
+# 可选字段（?fields=）
+ORDER_LIST_FIELDS = (
+    'order_id', 'order_info', 'order_price', 'order_disprice', 'order_buytime',
+    'order_status', 'order_remark', 'status_text', 'status_color',
+)
+ORDER_FULL_FIELDS = (
+    'order_id', 'order_info', 'order_price', 'order_disprice', 'order_buytime',
+    'order_status', 'order_remark', 'services', 'items', 'summary',
+)
+
+# ==================== 预编译语句 ====================
+ORDER_DETAIL_SQL = """
+    SELECT order_id, order_info, order_price, order_disprice,
+           order_buytime, order_status, order_remark
+    FROM order_list
+    WHERE order_id = %s
+"""
+prepared.register('order_detail', ORDER_DETAIL_SQL)
+
+def get_db_connection():
+    """获取数据库连接 - 使用主应用的连接池（GET 请求走只读副本）"""
+    from main import DatabasePool, use_read_replica
+    return DatabasePool.get_connection(readonly=use_read_replica())
+
+def close_db_connection(conn, close=False):
+    """关闭数据库连接"""
+    from main import DatabasePool
+    DatabasePool.return_connection(conn, close)
+
+def build_order_filters(args):
+    """根据查询参数构建订单 WHERE 子句
+
+    支持 search（订单ID/信息/备注模糊搜索）、status、
+    start / end（购买日期范围，格式 YYYY-MM-DD，包含两端）
+    """
+    where_conditions = []
+    params = []
+    
+    # 搜索条件
+    search = args.get('search', '')
+    if search:
+        where_conditions.append("""
+            (order_id::text LIKE %s OR 
+             order_info LIKE %s OR 
+             order_remark LIKE %s)
+        """)
+        search_term = f"%{search}%"
+        params.extend([search_term, search_term, search_term])
+    
+    # 状态过滤条件
+    status_filter = args.get('status', '')
+    if status_filter:
+        where_conditions.append("order_status = %s")
+        params.append(status_filter)
+    
+    # 日期范围
+    start = args.get('start', '')
+    if start:
+        where_conditions.append("order_buytime >= %s::date")
+        params.append(start)
+    end = args.get('end', '')
+    if end:
+        where_conditions.append("order_buytime < %s::date + 1")
+        params.append(end)
+    
+    # 构建安全的 WHERE 子句
+    if where_conditions:
+        where_clause = "WHERE " + " AND ".join(where_conditions)
+    else:
+        where_clause = ""
+    
+    return where_clause, params
+
+@order_bp.route('/all')
+def list_all():
+    """显示全部订单页面"""
+    return render_template('orders/all_orders.html')
+
+@order_bp.route('/pending')
+def list_pending():
+    """显示待使用订单页面"""
+    return render_template('orders/pending_orders.html')
+
+@order_bp.route('/started')
+def list_started():
+    """显示已开始订单页面"""
+    return render_template('orders/started_orders.html')
+
+@order_bp.route('/used')
+def list_used():
+    """显示已完结订单页面"""
+    return render_template('orders/used_orders.html')
+
+@order_bp.route('/cancel')
+def list_cancel():
+    """显示已取消订单页面"""
+    return render_template('orders/cancel_orders.html')
+
+# 订单列表：{source} 为订单表（可能包含归档），{where} 为 build_order_filters 生成的条件
+ORDER_COUNT_SQL = "SELECT COUNT(*) as total FROM {source} {where}"
+
+ORDER_PAGE_SQL = """
+    SELECT 
+        order_id,
+        order_info,
+        order_price,
+        order_disprice,
+        order_buytime,
+        order_status,
+        order_remark,
+        -- 在SQL中直接计算状态显示文本和颜色
+        CASE order_status
+            WHEN 'pending' THEN '待使用'
+            WHEN 'started' THEN '已开始'
+            WHEN 'used' THEN '已完成'
+            WHEN 'cancel' THEN '已取消'
+            WHEN 'cancelled' THEN '已取消'
+            ELSE COALESCE(order_status::text, '未知')
+        END as status_text,
+        CASE order_status
+            WHEN 'pending' THEN 'orange'
+            WHEN 'started' THEN 'blue'
+            WHEN 'used' THEN 'green'
+            WHEN 'cancel' THEN 'red'
+            WHEN 'cancelled' THEN 'red'
+            ELSE 'gray'
+        END as status_color
+    FROM {source} 
+    {where}
+    ORDER BY order_id DESC 
+    LIMIT %s OFFSET %s
+"""
+
+@order_bp.route('/api/orders')
+@admit(PRIORITY_READ)
+def get_orders_data():
+    """获取订单数据的API接口 - 直接在SQL中处理（fields=a,b 只返回指定字段）"""
+    try:
+        # 获取查询参数
+        fields = parse_fields(request.args, ORDER_LIST_FIELDS)
+        page = request.args.get('page', 1, type=int)
+        limit = request.args.get('limit', 15, type=int)
+        
+        # 计算分页
+        offset = (page - 1) * limit
+        
+        conn = get_db_connection()
+        cursor = conn.cursor(cursor_factory=DictCursor)
+        
+        # 构建查询条件
+        where_clause, params = build_order_filters(request.args)
+        # include_archived=1 时合并归档订单
+        orders_table = table_source('order_list', wants_archived(request.args))
+        
+        # 查询总数
+        count_query = ORDER_COUNT_SQL.format(source=orders_table, where=where_clause)
+        cursor.execute(count_query, params)
+        total_result = cursor.fetchone()
+        total = total_result['total'] if total_result else 0
+        
+        # 查询订单数据 - 直接在SQL中处理状态显示
+        query = ORDER_PAGE_SQL.format(source=orders_table, where=where_clause)
+        
+        # 添加分页参数
+        query_params = params + [limit, offset]
+        
+        print(f"执行查询: {query}")
+        
+        cursor.execute(query, query_params)
+        orders = cursor.fetchall()
+        
+        print(f"查询到 {len(orders)} 条记录")
+        
+        # 只需处理日期和格式，状态已经在SQL中处理了
+        orders = select_fields(map_rows(orders, ORDER_LIST_ROW), fields)
+        
+        cursor.close()
+        close_db_connection(conn)
+        
+        return jsonify({
+            'code': 0,
+            'msg': '成功',
+            'count': total,
+            'data': orders
+        })
+        
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        print(f"API错误: {str(e)}")
+        import traceback
+        error_trace = traceback.format_exc()
+        print(f"详细错误: {error_trace}")
+        
+        return jsonify({
+            'code': 1,
+            'msg': f'获取数据失败: {str(e)}',
+            'count': 0,
+            'data': []
+        })
+
+def get_status_text(status):
+    """获取状态显示文本 -"""
+    if status is None:
+        return '未知'
+    
+    status_str = str(status).strip().lower()
+    
+    status_map = {
+        'pending': '待使用',
+        'started': '已开始', 
+        'used': '已完成',
+        'cancel': '已取消',
+        'cancelled': '已取消',  # 兼容两种拼写
+    }
+    
+    return status_map.get(status_str, status_str)
+
+def get_status_color(status):
+    """获取状态颜色 """
+    if status is None:
+        return 'gray'
+    
+    status_str = str(status).strip().lower()
+    
+    color_map = {
+        'pending': 'orange',
+        'started': 'blue',
+        'used': 'green',
+        'cancel': 'red',
+        'cancelled': 'red',  # 兼容两种拼写
+    }
+    
+    return color_map.get(status_str, 'gray')
+
+@order_bp.route('/api/order/<order_id>')
+@admit(PRIORITY_READ)
+def get_order_detail(order_id):
+    """获取单个订单详情"""
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor(cursor_factory=DictCursor)
+
+        prepared.execute(cursor, 'order_detail', (order_id,))
+        order = cursor.fetchone()
+        
+        if order:
+            order = ORDER_DETAIL_ROW(order)
+        
+        cursor.close()
+        close_db_connection(conn)
+        
+        if order:
+            return jsonify({
+                'code': 0,
+                'msg': '成功',
+                'data': order
+            })
+        else:
+            return jsonify({
+                'code': 1,
+                'msg': '订单不存在'
+            })
+            
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        return jsonify({
+            'code': 1,
+            'msg': f'获取订单详情失败: {str(e)}'
+        })
+
+def parse_order_ids(values):
+    """解析订单ID列表，支持逗号分隔；去重并保持顺序，非法ID抛出 ValueError"""
+    order_ids = []
+    seen = set()
+    for value in values:
+        for part in str(value).split(','):
+            part = part.strip()
+            if not part:
+                continue
+            order_id = int(part)
+            if order_id not in seen:
+                seen.add(order_id)
+                order_ids.append(order_id)
+    return order_ids
+
+def fetch_orders_full(cursor, order_ids, include_archived=False, summary=False):
+    """批量获取订单及其服务、执行记录
+
+    无论订单数多少都只执行 3 次查询，返回 {order_id: 订单}，
+    不存在的订单不出现在结果中。include_archived 时同时查找归档表。
+    summary 时服务与执行记录在数据库中聚合，只返回 summary
+    """
+    cursor.execute(f"""
+        SELECT order_id, order_info, order_price, order_disprice,
+               order_buytime, order_status, order_remark
+        FROM {table_source('order_list', include_archived)}
+        WHERE order_id = ANY(%s)
+    """, (order_ids,))
+    orders = {}
+    for row in cursor.fetchall():
+        order = ORDER_DETAIL_ROW(row)
+        if not summary:
+            order['services'] = []
+            order['items'] = []
+        orders[row['order_id']] = order
+
+    if not orders:
+        return orders
+    found_ids = list(orders)
+    if summary:
+        return summarize_orders(cursor, orders, include_archived)
+
+    cursor.execute(f"""
+        SELECT os.order_id, s.service_id, s."desc", s.package, s.type, s.part,
+               os.quantity, os.completed_quantity, os.service_status
+        FROM {table_source('order_service', include_archived, 'os')}
+        JOIN service s ON os.service_id = s.service_id
+        WHERE os.order_id = ANY(%s)
+        ORDER BY os.order_id, os.id
+    """, (found_ids,))
+    for row in cursor.fetchall():
+        service = FULL_SERVICE_ROW(row)
+        quantity = row['quantity'] or 0
+        completed = row['completed_quantity'] or 0
+        service['remaining_quantity'] = max(quantity - completed, 0)
+        service['progress_percentage'] = round(completed / quantity * 100, 1) if quantity > 0 else 0
+        orders[row['order_id']]['services'].append(service)
+
+    cursor.execute(f"""
+        SELECT record_id, item_id, service_id, item_name, item_price, item_remark, exetime
+        FROM {table_source('item', include_archived)}
+        WHERE record_id = ANY(%s)
+        ORDER BY record_id, exetime DESC, item_id DESC
+    """, (found_ids,))
+    for row in cursor.fetchall():
+        orders[row['record_id']]['items'].append(FULL_ITEM_ROW(row))
+
+    # 订单整体进度
+    for order in orders.values():
+        total_quantity = sum(service['quantity'] or 0 for service in order['services'])
+        completed_quantity = sum(service['completed_quantity'] or 0 for service in order['services'])
+        used_amount = sum(item['item_price'] for item in order['items'])
+        order['summary'] = {
+            'total_quantity': total_quantity,
+            'completed_quantity': completed_quantity,
+            'progress_percentage': round(completed_quantity / total_quantity * 100, 1) if total_quantity > 0 else 0,
+            'used_count': len(order['items']),
+            'used_amount': round(used_amount, 2),
+            'remaining_amount': round(max(to_float(order['order_disprice']) - used_amount, 0), 2),
+        }
+
+    return orders
+
+def summarize_orders(cursor, orders, include_archived=False):
+    """订单整体进度（服务数量与执行记录在数据库中聚合，不返回明细）"""
+    found_ids = list(orders)
+    services = {}
+    cursor.execute(f"""
+        SELECT order_id, COUNT(*) AS service_count,
+               COALESCE(SUM(quantity), 0) AS total_quantity,
+               COALESCE(SUM(completed_quantity), 0) AS completed_quantity
+        FROM {table_source('order_service', include_archived)}
+        WHERE order_id = ANY(%s)
+        GROUP BY order_id
+    """, (found_ids,))
+    for row in cursor.fetchall():
+        services[row['order_id']] = row
+
+    items = {}
+    cursor.execute(f"""
+        SELECT record_id, COUNT(*) AS used_count, COALESCE(SUM(item_price), 0) AS used_amount
+        FROM {table_source('item', include_archived)}
+        WHERE record_id = ANY(%s)
+        GROUP BY record_id
+    """, (found_ids,))
+    for row in cursor.fetchall():
+        items[row['record_id']] = row
+
+    for order_id, order in orders.items():
+        service = services.get(order_id)
+        item = items.get(order_id)
+        total_quantity = int(service['total_quantity']) if service else 0
+        completed_quantity = int(service['completed_quantity']) if service else 0
+        used_amount = to_float(item['used_amount']) if item else 0
+        order['summary'] = {
+            'service_count': service['service_count'] if service else 0,
+            'total_quantity': total_quantity,
+            'completed_quantity': completed_quantity,
+            'progress_percentage': round(completed_quantity / total_quantity * 100, 1) if total_quantity > 0 else 0,
+            'used_count': item['used_count'] if item else 0,
+            'used_amount': round(used_amount, 2),
+            'remaining_amount': round(max(to_float(order['order_disprice']) - used_amount, 0), 2),
+        }
+    return orders
+
+@order_bp.route('/api/order/<int:order_id>/full')
+@admit(PRIORITY_READ)
+def get_order_full(order_id):
+    """获取订单完整详情：订单、服务进度与执行记录"""
+    conn = None
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor(cursor_factory=DictCursor)
+        orders = fetch_orders_full(cursor, [order_id], wants_archived(request.args))
+        cursor.close()
+
+        if order_id not in orders:
+            return jsonify({
+                'code': 1,
+                'msg': '订单不存在'
+            })
+
+        return jsonify({
+            'code': 0,
+            'msg': '成功',
+            'data': orders[order_id]
+        })
+
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        current_app.logger.error(f"获取订单完整详情失败: {str(e)}")
+        return jsonify({
+            'code': 1,
+            'msg': f'获取订单完整详情失败: {str(e)}'
+        })
+    finally:
+        if conn:
+            close_db_connection(conn)
+
+@order_bp.route('/api/orders/full', methods=['GET', 'POST'])
+@admit(PRIORITY_READ)
+def get_orders_full():
+    """批量获取订单完整详情
+
+    GET  /orders/api/orders/full?ids=1,2,3
+    POST /orders/api/orders/full  {"ids": [1, 2, 3]}（订单较多时使用）
+
+    summary=1 时不返回服务与执行记录明细，只返回 summary；fields=a,b 只返回指定字段
+    """
+    conn = None
+    try:
+        fields = parse_fields(request.args, ORDER_FULL_FIELDS)
+        if request.method == 'POST':
+            data = request.get_json(silent=True) or {}
+            values = data.get('ids') or []
+            if not isinstance(values, list):
+                values = [values]
+        else:
+            values = request.args.getlist('ids')
+
+        try:
+            order_ids = parse_order_ids(values)
+        except ValueError:
+            return jsonify({'code': 1, 'msg': '订单ID格式不正确'})
+
+        if not order_ids:
+            return jsonify({'code': 1, 'msg': '请提供订单ID'})
+        if len(order_ids) > MAX_BATCH_ORDERS:
+            return jsonify({'code': 1, 'msg': f'一次最多查询 {MAX_BATCH_ORDERS} 个订单'})
+
+        conn = get_db_connection()
+        cursor = conn.cursor(cursor_factory=DictCursor)
+        orders = fetch_orders_full(
+            cursor, order_ids, wants_archived(request.args), summary=wants_flag(request.args, 'summary')
+        )
+        cursor.close()
+
+        return jsonify({
+            'code': 0,
+            'msg': '成功',
+            'data': select_fields([orders[order_id] for order_id in order_ids if order_id in orders], fields),
+            'missing': [order_id for order_id in order_ids if order_id not in orders]
+        })
+
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        current_app.logger.error(f"批量获取订单详情失败: {str(e)}")
+        return jsonify({
+            'code': 1,
+            'msg': f'批量获取订单详情失败: {str(e)}'
+        })
+    finally:
+        if conn:
+            close_db_connection(conn)
+
+def orders_export_query(args):
+    """订单导出查询：与订单列表相同的 search / status / start / end 过滤条件"""
+    where_clause, params = build_order_filters(args)
+    query = f"""
+        SELECT 
+            order_id AS "订单ID",
+            order_info AS "订单信息",
+            order_price AS "原价",
+            order_disprice AS "折扣价",
+            to_char(order_buytime, 'YYYY-MM-DD HH24:MI:SS') AS "购买时间",
+            order_status AS "状态",
+            order_remark AS "备注"
+        FROM {table_source('order_list', wants_archived(args))} 
+        {where_clause}
+        ORDER BY order_id
+    """
+    return query, params
+
+@order_bp.route('/api/export')
+@admit(PRIORITY_READ, limit=2)
+def export_orders():
+    """导出订单（CSV，format=excel 时带 BOM 便于 Excel 打开）
+
+    由 PostgreSQL COPY 直接流式输出；数据量很大时可改用后台任务（/jobs）。
+    """
+    conn = None
+    try:
+        query, params = orders_export_query(request.args)
+        conn = get_db_connection()
+        return stream_copy(
+            conn, close_db_connection, query, params,
+            export_filename('orders'),
+            excel=request.args.get('format') == 'excel'
+        )
+        
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        if conn:
+            close_db_connection(conn)
+        current_app.logger.error(f"导出订单失败: {str(e)}")
+        return jsonify({
+            'code': 1,
+            'msg': f'导出失败: {str(e)}'
+        })
+
+# 仪表盘统计：(键, SQL)，每条 SQL 只返回一个值
+# {orders} 为订单表：累计统计包含已归档的订单（只有 used / cancel 订单会被归档，
+# 待使用数量与进行中订单的消费金额只查正式表）
+DASHBOARD_TOTALS_SQL = [
+    # 1. 总订单数
+    ('total_orders', "SELECT COUNT(*) FROM {orders}"),
+    # 2. 总金额（所有订单的折扣金额）
+    ('total_amount', "SELECT COALESCE(SUM(order_disprice), 0) FROM {orders}"),
+    # 3. 待使用订单数量
+    ('pending_orders', "SELECT COUNT(*) FROM order_list WHERE order_status = 'pending'"),
+    # 4. 已消费金额 = used订单总金额 + started订单中已使用的项目金额
+    ('used_amount', "SELECT COALESCE(SUM(order_disprice), 0) FROM {orders} WHERE order_status = 'used'"),
+    ('started_consumed', """
+        SELECT COALESCE(SUM(i.item_price), 0)
+        FROM order_list ol 
+        JOIN item i ON ol.order_id = i.record_id 
+        WHERE ol.order_status = 'started'
+    """),
+]
+
+# 5. 最近订单
+DASHBOARD_RECENT_SQL = """
+    SELECT order_id, order_info, order_price, order_disprice, order_status, order_buytime
+    FROM order_list 
+    ORDER BY order_buytime DESC 
+    LIMIT 5
+"""
+
+def build_dashboard_stats(totals, recent_orders):
+    """由各项统计值与最近订单组装仪表盘数据"""
+    consumed_amount = to_float(totals['used_amount']) + to_float(totals['started_consumed'])
+    
+    # 处理最近订单数据
+    processed_orders = []
+    for order in recent_orders:
+        status_color = {
+            'pending': 'orange',
+            'started': 'blue', 
+            'used': 'green',
+            'cancelled': 'gray'
+        }.get(order['order_status'], 'gray')
+        
+        status_text = {
+            'pending': '待使用',
+            'started': '进行中',
+            'used': '已完成', 
+            'cancelled': '已取消'
+        }.get(order['order_status'], '未知')
+        
+        processed_orders.append({
+            'order_id': order['order_id'],
+            'order_info': order['order_info'],
+            'order_price': to_float(order['order_price']),
+            'order_disprice': to_float(order['order_disprice']),
+            'order_buytime': fmt_time(order['order_buytime'], DATE_FMT),
+            'status_color': status_color,
+            'status_text': status_text
+        })
+    
+    return {
+        'total_orders': totals['total_orders'],
+        'total_amount': to_float(totals['total_amount']),
+        'pending_orders': totals['pending_orders'],
+        'consumed_amount': consumed_amount,
+        'recent_orders': processed_orders
+    }
+
+def dashboard_queries():
+    """仪表盘统计的各项查询（相互独立，可并行执行）"""
+    orders = table_source('order_list', archive_available())
+    queries = {key: (sql.format(orders=orders), (), 'value') for key, sql in DASHBOARD_TOTALS_SQL}
+    queries['recent_orders'] = (DASHBOARD_RECENT_SQL, (), 'all')
+    return queries
+
+def load_dashboard_stats():
+    """查询仪表盘统计数据（各项统计在不同连接上并行执行）"""
+    from main import use_read_replica
+    results = fanout.run(dashboard_queries(), readonly=use_read_replica())
+    return build_dashboard_stats(results, results['recent_orders'])
+
+@order_bp.route('/api/dashboard-stats')
+@admit(PRIORITY_POLL)
+def dashboard_stats():
+    """获取仪表盘统计数据（缓存，订单写入后失效）"""
+    try:
+        return jsonify({
+            'code': 0,
+            'data': cache.get_or_load('orders', 'dashboard_stats', load_dashboard_stats)
+        })
+        
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        current_app.logger.error(f"获取仪表盘数据失败: {str(e)}")
+        return jsonify({
+            'code': 1,
+            'msg': f'获取数据失败: {str(e)}'
+        })
+
+# 每个月服务数量 - PostgreSQL 语法（按日期范围过滤，可用上 exetime 分区裁剪）
+SERVICE_TREND_SQL = """
+    SELECT 
+        EXTRACT(MONTH FROM exetime) as month,
+        COUNT(*) as count
+    FROM item 
+    WHERE exetime >= make_date(%s, 1, 1) AND exetime < make_date(%s + 1, 1, 1)
+    GROUP BY EXTRACT(MONTH FROM exetime)
+    ORDER BY month
+"""
+
+def build_service_trend(monthly_data):
+    """12个月的服务数量，没有数据的月份为0"""
+    months = ['1月', '2月', '3月', '4月', '5月', '6月', 
+             '7月', '8月', '9月', '10月', '11月', '12月']
+    counts = [0] * 12
+    
+    for data in monthly_data:
+        month_index = int(data['month']) - 1  # 月份从1开始，数组从0开始
+        if 0 <= month_index < 12:
+            counts[month_index] = data['count']
+    
+    return {
+        'months': months,
+        'counts': counts
+    }
+
+def load_service_trend(current_year):
+    """查询某一年12个月的服务数量"""
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor(cursor_factory=DictCursor)
+        cursor.execute(SERVICE_TREND_SQL, (current_year, current_year))
+        monthly_data = cursor.fetchall()
+        cursor.close()
+    finally:
+        close_db_connection(conn)
+    
+    return build_service_trend(monthly_data)
+
+def load_dashboard_bootstrap(current_year):
+    """仪表盘首屏数据：统计与服务趋势的全部查询一次并行执行"""
+    from main import use_read_replica
+    queries = dashboard_queries()
+    queries['service_trend'] = (SERVICE_TREND_SQL, (current_year, current_year), 'all')
+    results = fanout.run(queries, readonly=use_read_replica())
+    return {
+        'stats': build_dashboard_stats(results, results['recent_orders']),
+        'service_trend': build_service_trend(results['service_trend']),
+    }
+
+def dashboard_bootstrap():
+    """仪表盘首屏数据（缓存，订单写入后失效）"""
+    current_year = datetime.now().year
+    return cache.get_or_load(
+        'orders', f'dashboard_bootstrap:{current_year}',
+        lambda: load_dashboard_bootstrap(current_year)
+    )
+
+@order_bp.route('/api/dashboard-bootstrap')
+@admit(PRIORITY_POLL)
+def get_dashboard_bootstrap():
+    """获取仪表盘首屏数据：dashboard-stats 与 service-trend 合并为一次请求"""
+    try:
+        return jsonify({
+            'code': 0,
+            'data': dashboard_bootstrap()
+        })
+        
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        current_app.logger.error(f"获取仪表盘数据失败: {str(e)}")
+        return jsonify({
+            'code': 1,
+            'msg': f'获取数据失败: {str(e)}'
+        })
+
+@order_bp.route('/api/service-trend')
+@admit(PRIORITY_POLL)
+def service_trend():
+    """获取服务趋势数据（一年12个月的服务数量）"""
+    try:
+        # 获取当前年份
+        current_year = datetime.now().year
+        
+        return jsonify({
+            'code': 0,
+            'data': cache.get_or_load(
+                'orders', f'service_trend:{current_year}',
+                lambda: load_service_trend(current_year)
+            )
+        })
+        
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        current_app.logger.error(f"获取服务趋势失败: {str(e)}")
+        return jsonify({
+            'code': 1,
+            'msg': f'获取服务趋势失败: {str(e)}'
+        })
+
+# ==================== 服务目录 ====================
+# 浏览器缓存目录的秒数，之后用 If-None-Match 重新验证
+CATALOG_MAX_AGE = 300
+
+def catalog_response(body, etag):
+    """预先序列化的目录响应，If-None-Match 命中时返回 304"""
+    response = current_app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.max_age = CATALOG_MAX_AGE
+    return response.make_conditional(request)
+
+@order_bp.route('/api/services')
+@admit(PRIORITY_READ)
+def get_services():
+    """获取所有服务项目（按描述排序的扁平列表）"""
+    try:
+        snapshot = catalog.current()
+        return catalog_response(snapshot.services_body, snapshot.services_etag)
+        
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        current_app.logger.error(f"获取服务列表失败: {str(e)}")
+        return jsonify({
+            'code': 1,
+            'msg': f'获取服务列表失败: {str(e)}'
+        })
+
+@order_bp.route('/api/catalog')
+@admit(PRIORITY_READ)
+def get_catalog():
+    """获取服务目录树：套餐 → 类型 → 部位 → 服务"""
+    try:
+        snapshot = catalog.current()
+        return catalog_response(snapshot.tree_body, snapshot.tree_etag)
+        
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        current_app.logger.error(f"获取服务目录失败: {str(e)}")
+        return jsonify({
+            'code': 1,
+            'msg': f'获取服务目录失败: {str(e)}'
+        })
+
+@order_bp.route('/api/services/search')
+@admit(PRIORITY_READ)
+def search_services():
+    """按描述前缀搜索服务项目（不区分大小写）"""
+    try:
+        q = request.args.get('q', '').strip()
+        limit = min(max(request.args.get('limit', 20, type=int), 1), SEARCH_MAX_LIMIT)
+        
+        return jsonify({
+            'code': 0,
+            'data': catalog.current().search(q, limit)
+        })
+        
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        current_app.logger.error(f"搜索服务项目失败: {str(e)}")
+        return jsonify({
+            'code': 1,
+            'msg': f'搜索服务项目失败: {str(e)}'
+        })
+
+@order_bp.route('/api/add', methods=['POST'])
+@admit(PRIORITY_WRITE)
+def add_order():
+    """添加新订单（支持 Idempotency-Key，重试不会重复创建）"""
+    conn = None
+    try:
+        data = request.get_json()
+        idempotency_key = idempotency.request_key('orders.add')
+        
+        # 验证必要字段
+        required_fields = ['order_info', 'order_price', 'order_disprice', 'order_status']
+        for field in required_fields:
+            if not data.get(field):
+                return jsonify({'code': 1, 'msg': f'缺少必要字段: {field}'})
+        
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        # 同一个幂等键已经添加过：不再写入，直接返回第一次的结果
+        replay = idempotency.claim(cursor, idempotency_key)
+        if replay is not None:
+            conn.rollback()
+            return replay
+        
+        # 插入订单基本信息 - PostgreSQL 语法
+        order_query = """
+            INSERT INTO order_list (order_info, order_price, order_disprice, order_status, order_remark, order_buytime)
+            VALUES (%s, %s, %s, %s, %s, NOW())
+            RETURNING order_id
+        """
+        cursor.execute(order_query, (
+            data['order_info'],
+            float(data['order_price']),
+            float(data['order_disprice']),
+            data['order_status'],
+            data.get('order_remark', '')
+        ))
+        
+        order_id = cursor.fetchone()[0]
+        
+        # 插入关联的服务项目
+        if data.get('services'):
+            service_query = """
+                INSERT INTO order_service (order_id, service_id, quantity, service_status)
+                VALUES (%s, %s, %s, 'pending')
+            """
+            for service in data['services']:
+                cursor.execute(service_query, (
+                    order_id,
+                    service['service_id'],
+                    service.get('quantity', 1)
+                ))
+        
+        result = {
+            'code': 0,
+            'msg': '订单添加成功',
+            'data': {'order_id': order_id}
+        }
+        idempotency.save(cursor, idempotency_key, result)
+        change_log.record_orders(cursor, [order_id])
+        
+        conn.commit()
+        cursor.close()
+        cache.invalidate('orders')
+        
+        return jsonify(result)
+        
+    except IdempotencyError as e:
+        if conn:
+            conn.rollback()
+        return error_response(e)
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        current_app.logger.error(f"添加订单失败: {str(e)}")
+        return jsonify({
+            'code': 1,
+            'msg': f'添加订单失败: {str(e)}'
+        })
+    finally:
+        if conn:
+            close_db_connection(conn)
+
+@order_bp.route('/api/import', methods=['POST'])
+@admit(PRIORITY_WRITE, limit=1)
+@login_required
+def import_orders():
+    """批量导入历史订单
+
+    上传 order_list / order_service / item 三个 CSV 文件（字段名同表），
+    或 dump（旧系统 MySQL 转储）；skip_invalid=1 时丢弃引用不合法的行。
+    """
+    from bulk_import import BulkImportError, parse_mysql_dump, run_import, DUMP_NULL
+
+    conn = None
+    try:
+        null_marker = None
+        if 'dump' in request.files:
+            sources = parse_mysql_dump(request.files['dump'].read().decode('utf-8'))
+            null_marker = DUMP_NULL
+        else:
+            sources = {
+                table: request.files[table].stream
+                for table in ('order_list', 'order_service', 'item')
+                if table in request.files
+            }
+        if not sources:
+            return jsonify({'code': 1, 'msg': '请上传导入文件'})
+        
+        conn = get_db_connection()
+        report = run_import(
+            conn, sources,
+            skip_invalid=request.form.get('skip_invalid') == '1',
+            null_marker=null_marker
+        )
+        cache.invalidate('orders')
+        
+        return jsonify({
+            'code': 0,
+            'msg': f"导入完成：{report['rows']} 行，{report['rows_per_second']} 行/秒",
+            'data': report
+        })
+        
+    except BulkImportError as e:
+        return jsonify({
+            'code': 1,
+            'msg': f'导入数据校验失败: {str(e)}'
+        })
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        current_app.logger.error(f"导入订单失败: {str(e)}")
+        return jsonify({
+            'code': 1,
+            'msg': f'导入失败: {str(e)}'
+        })
+    finally:
+        if conn:
+            close_db_connection(conn)
+
+@order_bp.route('/add')
+def add_order_page():
+    """添加订单页面"""
+    return render_template('orders/add_order.html')
+
+# 新增订单操作API
+@order_bp.route('/api/update-status', methods=['POST'])
+@admit(PRIORITY_WRITE)
+def update_order_status():
+    """更新订单状态"""
+    conn = None
+    try:
+        data = request.get_json()
+        order_id = data.get('order_id')
+        new_status = data.get('status')
+        
+        if not order_id or not new_status:
+            return jsonify({'code': 1, 'msg': '缺少必要参数'})
+        
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        # 更新订单状态
+        cursor.execute("""
+            UPDATE order_list 
+            SET order_status = %s 
+            WHERE order_id = %s
+        """, (new_status, order_id))
+        change_log.record_orders(cursor, [int(order_id)])
+        
+        conn.commit()
+        cursor.close()
+        cache.invalidate('orders')
+        
+        return jsonify({
+            'code': 0,
+            'msg': '状态更新成功'
+        })
+        
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        current_app.logger.error(f"更新订单状态失败: {str(e)}")
+        return jsonify({
+            'code': 1,
+            'msg': f'更新失败: {str(e)}'
+        })
+    finally:
+        if conn:
+            close_db_connection(conn)
+
+@order_bp.route('/api/delete', methods=['POST'])
+@admit(PRIORITY_WRITE)
+def delete_order():
+    """删除订单"""
+    conn = None
+    try:
+        data = request.get_json()
+        order_id = data.get('order_id')
+        
+        if not order_id:
+            return jsonify({'code': 1, 'msg': '缺少订单ID'})
+        
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        # 依次删除执行记录、订单服务、订单
+        delete_orders(cursor, [int(order_id)])
+        change_log.record_orders(cursor, [int(order_id)], deleted=True)
+        
+        conn.commit()
+        cursor.close()
+        cache.invalidate('orders')
+        
+        return jsonify({
+            'code': 0,
+            'msg': '订单删除成功'
+        })
+        
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        current_app.logger.error(f"删除订单失败: {str(e)}")
+        return jsonify({
+            'code': 1,
+            'msg': f'删除失败: {str(e)}'
+        })
+    finally:
+        if conn:
+            close_db_connection(conn)
+
+# ==================== 批量操作 ====================
+# 可设置的订单状态
+ORDER_STATUSES = ('pending', 'started', 'used', 'cancel')
+
+# 一次批量操作最多涉及的订单数
+MAX_BULK_ORDERS = 5000
+
+def bulk_target_ids(cursor, data):
+    """锁定批量操作的订单，返回订单ID列表
+
+    data 中 ids 为订单ID列表；或 filter 为条件（status 必填，start / end 为购买日期范围）
+    """
+    if data.get('ids'):
+        values = data['ids'] if isinstance(data['ids'], list) else [data['ids']]
+        try:
+            order_ids = parse_order_ids(values)
+        except ValueError:
+            raise ValueError('订单ID格式不正确')
+        if len(order_ids) > MAX_BULK_ORDERS:
+            raise ValueError(f'一次最多操作 {MAX_BULK_ORDERS} 个订单')
+        where_clause, params = "WHERE order_id = ANY(%s)", [order_ids]
+    else:
+        filters = data.get('filter') or {}
+        if not isinstance(filters, dict) or not filters.get('status'):
+            raise ValueError('请提供订单ID列表，或包含订单状态的筛选条件')
+        where_clause, params = build_order_filters(
+            {key: filters.get(key, '') for key in ('status', 'start', 'end')}
+        )
+    
+    # 按订单ID顺序加锁，并发的批量操作不会互相死锁
+    cursor.execute(f"""
+        SELECT order_id FROM order_list {where_clause}
+        ORDER BY order_id
+        LIMIT %s
+        FOR UPDATE
+    """, params + [MAX_BULK_ORDERS + 1])
+    order_ids = [row[0] for row in cursor.fetchall()]
+    if len(order_ids) > MAX_BULK_ORDERS:
+        raise ValueError(f'匹配的订单超过 {MAX_BULK_ORDERS} 个，请缩小筛选范围')
+    return order_ids
+
+def delete_orders(cursor, order_ids):
+    """删除订单及其执行记录、订单服务（order_service 引用 order_list，须先删除），返回各表删除行数"""
+    cursor.execute("DELETE FROM item WHERE record_id = ANY(%s)", (order_ids,))
+    items = cursor.rowcount
+    cursor.execute("DELETE FROM order_service WHERE order_id = ANY(%s)", (order_ids,))
+    services = cursor.rowcount
+    cursor.execute("DELETE FROM order_list WHERE order_id = ANY(%s)", (order_ids,))
+    return {'orders': cursor.rowcount, 'services': services, 'items': items}
+
+@order_bp.route('/api/bulk-status', methods=['POST'])
+@admit(PRIORITY_WRITE, limit=1)
+def bulk_update_status():
+    """批量修改订单状态
+
+    {"ids": [1, 2, 3], "status": "cancel"}
+    {"filter": {"status": "pending", "start": "2024-01-01", "end": "2024-03-31"}, "status": "cancel"}
+    """
+    conn = None
+    try:
+        data = request.get_json(silent=True) or {}
+        new_status = data.get('status')
+        if new_status not in ORDER_STATUSES:
+            return jsonify({'code': 1, 'msg': f'订单状态必须是 {", ".join(ORDER_STATUSES)} 之一'})
+        
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        order_ids = bulk_target_ids(cursor, data)
+        cursor.execute("""
+            UPDATE order_list 
+            SET order_status = %s 
+            WHERE order_id = ANY(%s) AND order_status IS DISTINCT FROM %s
+            RETURNING order_id
+        """, (new_status, order_ids, new_status))
+        updated = [row[0] for row in cursor.fetchall()]
+        change_log.record_orders(cursor, updated)
+        
+        conn.commit()
+        cursor.close()
+        if updated:
+            cache.invalidate('orders')
+        
+        return jsonify({
+            'code': 0,
+            'msg': '状态更新成功',
+            'data': {'matched': len(order_ids), 'updated': len(updated)}
+        })
+        
+    except ValueError as e:
+        if conn:
+            conn.rollback()
+        return jsonify({'code': 1, 'msg': str(e)})
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        current_app.logger.error(f"批量更新订单状态失败: {str(e)}")
+        return jsonify({
+            'code': 1,
+            'msg': f'批量更新失败: {str(e)}'
+        })
+    finally:
+        if conn:
+            close_db_connection(conn)
+
+@order_bp.route('/api/bulk-delete', methods=['POST'])
+@admit(PRIORITY_WRITE, limit=1)
+def bulk_delete_orders():
+    """批量删除订单（连同订单服务与执行记录，在一个事务中完成）
+
+    参数同 /api/bulk-status（不需要 status）
+    """
+    conn = None
+    try:
+        data = request.get_json(silent=True) or {}
+        
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        order_ids = bulk_target_ids(cursor, data)
+        deleted = delete_orders(cursor, order_ids) if order_ids else {'orders': 0, 'services': 0, 'items': 0}
+        change_log.record_orders(cursor, order_ids, deleted=True)
+        
+        conn.commit()
+        cursor.close()
+        if order_ids:
+            cache.invalidate('orders')
+        
+        return jsonify({
+            'code': 0,
+            'msg': '订单删除成功',
+            'data': deleted
+        })
+        
+    except ValueError as e:
+        if conn:
+            conn.rollback()
+        return jsonify({'code': 1, 'msg': str(e)})
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        current_app.logger.error(f"批量删除订单失败: {str(e)}")
+        return jsonify({
+            'code': 1,
+            'msg': f'批量删除失败: {str(e)}'
+        })
+    finally:
+        if conn:
+            close_db_connection(conn)
+
+
@@ -0,0 +1,92 @@
+"""热点 SQL 预编译
+
+高频查询在模块加载时注册为命名语句，每个连接第一次使用时 PREPARE，
+之后通过 EXECUTE 按名称执行，省去每次请求的解析与计划开销。
+
+预编译语句属于数据库会话：新建的连接、重连后的连接会自动重新 PREPARE；
+服务端丢失语句（如被 DISCARD ALL 重置）时清除记录并重试一次。
+"""
+import re
+import threading
+import weakref
+
+import psycopg2
+from psycopg2 import extensions
+
+from metrics import metrics
+
+# 名称 -> (PREPARE 用的 SQL, 参数个数)
+_statements = {}
+
+# 连接 -> (后端进程 ID, 已预编译的名称集合)
+_prepared = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+_NAME = re.compile(r'^[a-z_][a-z0-9_]*$')
+
+
+def numbered(sql):
+    """将 psycopg2 的 %s 占位符转换为 $1、$2 …，返回 (SQL, 参数个数)"""
+    parts = sql.split('%s')
+    return parts[0] + ''.join(f'${i}{part}' for i, part in enumerate(parts[1:], 1)), len(parts) - 1
+
+
+def register(name, sql):
+    """注册热点语句，sql 使用 psycopg2 的 %s 占位符"""
+    if not _NAME.match(name):
+        raise ValueError(f"invalid prepared statement name: {name}")
+    converted, count = numbered(sql)
+    existing = _statements.get(name)
+    if existing is not None and existing[0] != converted:
+        raise ValueError(f"prepared statement already registered: {name}")
+    _statements[name] = (converted, count)
+    return name
+
+
+def _prepared_names(conn):
+    """当前连接已预编译的语句名称；后端进程变化（重连）时清空"""
+    pid = conn.get_backend_pid()
+    with _lock:
+        entry = _prepared.get(conn)
+        if entry is None or entry[0] != pid:
+            entry = (pid, set())
+            _prepared[conn] = entry
+        return entry[1]
+
+
+def forget(conn):
+    """清除连接的预编译记录"""
+    with _lock:
+        _prepared.pop(conn, None)
+
+
+def execute(cursor, name, params=()):
+    """按名称执行热点语句，必要时先在该连接上 PREPARE"""
+    sql, count = _statements[name]
+    if len(params) != count:
+        raise ValueError(f"{name} expects {count} parameters, got {len(params)}")
+
+    conn = cursor.connection
+    names = _prepared_names(conn)
+    # 事务外执行失败时可以安全地回滚并重试
+    retryable = conn.info.transaction_status == extensions.TRANSACTION_STATUS_IDLE
+
+    if name not in names:
+        cursor.execute(f"PREPARE {name} AS {sql}")
+        names.add(name)
+        metrics.incr('prepared.prepare')
+
+    execute_sql = f"EXECUTE {name}" + (f" ({', '.join(['%s'] * count)})" if count else "")
+    try:
+        cursor.execute(execute_sql, params)
+    except psycopg2.errors.InvalidSqlStatementName:
+        # 服务端已没有该语句（会话被重置），重新预编译
+        forget(conn)
+        if not retryable:
+            raise
+        conn.rollback()
+        metrics.incr('prepared.reprepare')
+        cursor.execute(f"PREPARE {name} AS {sql}")
+        _prepared_names(conn).add(name)
+        cursor.execute(execute_sql, params)
+    metrics.incr('prepared.execute')
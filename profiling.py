@@ -0,0 +1,358 @@
+"""按需请求剖析（cProfile + SQL 记录，可选 tracemalloc）
+
+线上某个接口变慢时没法挂调试器。配置 PROFILE_TOKEN 或 PROFILE_SAMPLE_RATE 后，
+单个请求可以在 cProfile 下执行，结果写入 PROFILE_DIR：
+
+- 请求头 X-Profile 或查询参数 _profile 等于 PROFILE_TOKEN 时剖析该请求；
+  再带 X-Profile-Memory: 1（或 _profile_memory=1）时同时用 tracemalloc 统计内存分配
+- PROFILE_SAMPLE_RATE（0~1）按比例随机剖析请求，PROFILE_MEMORY 控制抽样请求是否统计内存
+- 每个请求生成 <名称>.prof（pstats 格式，可用 snakeviz 等工具打开）和 <名称>.json
+  （耗时、热点函数、执行的 SQL 及各自耗时、内存分配），最多保留 PROFILE_KEEP 组
+- cProfile 与 tracemalloc 都是进程级的，同一时间只剖析一个请求，其余请求照常执行
+- SQL 只记录语句模板，不记录参数（登录等请求的参数含密码）；只记录处理请求的线程
+  执行的语句，fanout 线程池中的查询不在其中
+
+两项都不配置时不包装 WSGI 应用、不替换连接类型，没有任何额外开销。
+
+ASGI 模式（asgi.py）下异步实现的接口不在 cProfile 下执行：被选中剖析的请求
+转交 Flask 应用处理，抽样选中的请求带上 environ[SAMPLED_KEY]，不再重复抽样。
+"""
+import cProfile
+import hmac
+import io
+import json
+import os
+import pstats
+import random
+import re
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from datetime import datetime
+from urllib.parse import parse_qsl, urlencode
+
+from psycopg2 import extensions
+from werkzeug.wsgi import ClosingIterator
+
+from metrics import metrics
+
+HEADER = 'HTTP_X_PROFILE'
+MEMORY_HEADER = 'HTTP_X_PROFILE_MEMORY'
+QUERY_FLAG = '_profile'
+MEMORY_QUERY_FLAG = '_profile_memory'
+# 已在 ASGI 层抽样选中的请求（environ 键，客户端无法通过请求头设置）
+SAMPLED_KEY = 'myorder.profile_sampled'
+
+DEFAULT_KEEP = 200
+
+# 结果中保留的热点函数数、内存分配位置数与 SQL 条数
+TOP_FUNCTIONS = 40
+TOP_ALLOCATIONS = 20
+MAX_STATEMENTS = 500
+
+# 结果文件名（列表与下载接口只接受这种格式，避免路径穿越）
+_NAME = re.compile(r'^[0-9]{8}-[0-9]{6}-[A-Za-z0-9_]+-[0-9a-f]{8}\.(prof|json)$')
+_SLUG = re.compile(r'[^A-Za-z0-9]+')
+
+# 当前线程正在记录的 SQL 列表（只在剖析中的请求内设置）
+_local = threading.local()
+
+
+# ==================== SQL 记录 ====================
+def _statement_text(cursor, query):
+    if isinstance(query, bytes):
+        return query.decode('utf-8', 'replace')
+    if isinstance(query, str):
+        return query
+    # psycopg2.sql.Composed 等
+    return query.as_string(cursor)
+
+
+_recording_classes = {}
+_recording_lock = threading.Lock()
+
+
+def _recording_class(cursor_class):
+    """cursor_class 的子类：execute 等方法把语句与耗时追加到当前线程的记录中"""
+    recording = _recording_classes.get(cursor_class)
+    if recording is not None:
+        return recording
+
+    def timed(method_name):
+        method = getattr(cursor_class, method_name)
+
+        def wrapper(self, query, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return method(self, query, *args, **kwargs)
+            finally:
+                statements = getattr(_local, 'statements', None)
+                if statements is not None and len(statements) < MAX_STATEMENTS:
+                    statements.append({
+                        'sql': _statement_text(self, query),
+                        'call': method_name,
+                        'ms': round((time.perf_counter() - started) * 1000, 3),
+                        'rows': self.rowcount,
+                    })
+        return wrapper
+
+    namespace = {name: timed(name) for name in ('execute', 'executemany', 'callproc', 'copy_expert')}
+    with _recording_lock:
+        recording = _recording_classes.setdefault(
+            cursor_class, type(f'Recording{cursor_class.__name__}', (cursor_class,), namespace)
+        )
+    return recording
+
+
+class ProfiledConnection(extensions.connection):
+    """剖析中的请求创建的游标换成记录 SQL 的子类，其余请求与普通连接相同"""
+
+    def cursor(self, *args, **kwargs):
+        if getattr(_local, 'statements', None) is not None:
+            cursor_class = kwargs.get('cursor_factory') or self.cursor_factory or extensions.cursor
+            kwargs['cursor_factory'] = _recording_class(cursor_class)
+        return super().cursor(*args, **kwargs)
+
+
+# ==================== 剖析 ====================
+class ProfileRun:
+    """一次请求的剖析"""
+
+    def __init__(self, environ, memory, reason):
+        self.method = environ.get('REQUEST_METHOD', '')
+        self.path = environ.get('PATH_INFO', '')
+        # 记录的查询字符串去掉剖析参数（含令牌）
+        self.query = urlencode([
+            (key, value) for key, value in parse_qsl(environ.get('QUERY_STRING', ''), keep_blank_values=True)
+            if key not in (QUERY_FLAG, MEMORY_QUERY_FLAG)
+        ])
+        self.memory = memory
+        self.reason = reason
+        self.status = None
+        self.statements = []
+        self._profile = cProfile.Profile()
+        self.started_at = datetime.now()
+        self._started = None
+
+    def start(self):
+        if self.memory:
+            tracemalloc.start()
+        _local.statements = self.statements
+        self._started = time.perf_counter()
+        self._profile.enable()
+
+    def abort(self):
+        """start 失败（如另有剖析工具在运行）时撤销已开启的记录"""
+        _local.statements = None
+        if self.memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def stop(self):
+        self._profile.disable()
+        elapsed = time.perf_counter() - self._started
+        _local.statements = None
+        memory = None
+        if self.memory:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            memory = {
+                'current_kb': round(current / 1024, 1),
+                'peak_kb': round(peak / 1024, 1),
+                'top': [
+                    {
+                        'location': f'{stat.traceback[0].filename}:{stat.traceback[0].lineno}',
+                        'size_kb': round(stat.size / 1024, 1),
+                        'count': stat.count,
+                    }
+                    for stat in snapshot.statistics('lineno')[:TOP_ALLOCATIONS]
+                ],
+            }
+        return elapsed, memory
+
+    def summary(self, elapsed, memory):
+        output = io.StringIO()
+        stats = pstats.Stats(self._profile, stream=output)
+        stats.sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+        return {
+            'started_at': self.started_at.strftime('%Y-%m-%d %H:%M:%S'),
+            'method': self.method,
+            'path': self.path,
+            'query': self.query,
+            'status': self.status,
+            'reason': self.reason,
+            'duration_ms': round(elapsed * 1000, 3),
+            'sql_count': len(self.statements),
+            'sql_ms': round(sum(statement['ms'] for statement in self.statements), 3),
+            'sql': self.statements,
+            'functions': output.getvalue(),
+            'memory': memory,
+        }
+
+    def dump(self, path):
+        self._profile.dump_stats(path)
+
+
+class Profiler:
+
+    def __init__(self):
+        self.token = None
+        self.sample_rate = 0.0
+        self.memory = False
+        self.result_dir = os.path.join(tempfile.gettempdir(), 'myorder-profiles')
+        self.keep = DEFAULT_KEEP
+        # 同一时间只剖析一个请求
+        self._busy = threading.Lock()
+
+    def configure(self, token, sample_rate, memory, result_dir, keep):
+        self.token = token or None
+        self.sample_rate = sample_rate
+        self.memory = memory
+        self.result_dir = result_dir
+        self.keep = keep
+
+    @property
+    def enabled(self):
+        return bool(self.token) or self.sample_rate > 0
+
+    def connect_kwargs(self):
+        """psycopg2.connect / 连接池的额外参数：启用时使用能记录 SQL 的连接类型"""
+        return {'connection_factory': ProfiledConnection} if self.enabled else {}
+
+    def check_token(self, value):
+        return bool(self.token and value) and hmac.compare_digest(value.encode('utf-8'), self.token.encode('utf-8'))
+
+    # ---------- 请求选择 ----------
+    def wanted(self, environ):
+        """返回 (是否剖析, 是否统计内存, 原因)"""
+        if environ.get(SAMPLED_KEY):
+            return True, self.memory, 'sampled'
+        token = environ.get(HEADER)
+        query_string = environ.get('QUERY_STRING', '')
+        if token is None and self.token and QUERY_FLAG in query_string:
+            token = dict(parse_qsl(query_string)).get(QUERY_FLAG)
+        if token is not None:
+            if not self.check_token(token):
+                metrics.incr('profiling.denied')
+                return False, False, None
+            memory = environ.get(MEMORY_HEADER) == '1' or f'{MEMORY_QUERY_FLAG}=1' in query_string
+            return True, memory, 'requested'
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return True, self.memory, 'sampled'
+        return False, False, None
+
+    # ---------- WSGI 中间件 ----------
+    def wrap(self, wsgi_app):
+        def profiled_app(environ, start_response):
+            wanted, memory, reason = self.wanted(environ)
+            if not wanted:
+                return wsgi_app(environ, start_response)
+            if not self._busy.acquire(blocking=False):
+                metrics.incr('profiling.busy')
+                return wsgi_app(environ, start_response)
+
+            run = ProfileRun(environ, memory, reason)
+
+            def recording_start_response(status, headers, exc_info=None):
+                run.status = int(status.split(' ', 1)[0])
+                return start_response(status, headers, exc_info)
+
+            # 响应体迭代完（流式导出）才结束剖析
+            def finish():
+                try:
+                    self._save(run, *run.stop())
+                finally:
+                    self._busy.release()
+
+            try:
+                run.start()
+            except Exception as e:
+                run.abort()
+                self._busy.release()
+                print(f"⚠️ Failed to start profiler: {e}")
+                return wsgi_app(environ, start_response)
+
+            try:
+                result = wsgi_app(environ, recording_start_response)
+            except Exception:
+                finish()
+                raise
+            return ClosingIterator(result, finish)
+
+        return profiled_app
+
+    # ---------- 结果文件 ----------
+    def _save(self, run, elapsed, memory):
+        try:
+            os.makedirs(self.result_dir, exist_ok=True)
+            slug = _SLUG.sub('_', run.path).strip('_')[:60] or 'root'
+            name = f"{run.started_at.strftime('%Y%m%d-%H%M%S')}-{run.method}_{slug}-{uuid.uuid4().hex[:8]}"
+            run.dump(os.path.join(self.result_dir, name + '.prof'))
+            summary = run.summary(elapsed, memory)
+            summary['name'] = name
+            with open(os.path.join(self.result_dir, name + '.json'), 'w', encoding='utf-8') as out:
+                json.dump(summary, out, ensure_ascii=False, indent=1)
+            metrics.incr('profiling.recorded')
+            print(f"🔬 Profiled {run.method} {run.path} in {elapsed * 1000:.1f}ms "
+                  f"({len(run.statements)} SQL) -> {name}")
+            self._cleanup()
+        except Exception as e:
+            metrics.incr('profiling.failed')
+            print(f"⚠️ Failed to save profile for {run.path}: {e}")
+
+    def _cleanup(self):
+        """只保留最近 keep 组结果"""
+        names = sorted(name for name in os.listdir(self.result_dir) if _NAME.match(name))
+        runs = sorted({name.rsplit('.', 1)[0] for name in names})
+        for stem in runs[:-self.keep] if self.keep > 0 else runs:
+            for suffix in ('.prof', '.json'):
+                try:
+                    os.remove(os.path.join(self.result_dir, stem + suffix))
+                except OSError:
+                    pass
+
+    def list(self, limit=100):
+        """最近的剖析结果（不含热点函数与 SQL 明细），按时间倒序"""
+        if not os.path.isdir(self.result_dir):
+            return []
+        names = sorted((name for name in os.listdir(self.result_dir)
+                        if _NAME.match(name) and name.endswith('.json')), reverse=True)
+        profiles = []
+        for name in names[:limit]:
+            try:
+                with open(os.path.join(self.result_dir, name), encoding='utf-8') as f:
+                    summary = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for key in ('sql', 'functions'):
+                summary.pop(key, None)
+            if summary.get('memory'):
+                summary['memory'] = {key: summary['memory'][key] for key in ('current_kb', 'peak_kb')}
+            profiles.append(summary)
+        return profiles
+
+    def path(self, name):
+        """结果文件路径；文件名不合法或不存在时返回 None"""
+        if not _NAME.match(name):
+            return None
+        path = os.path.join(self.result_dir, name)
+        return path if os.path.isfile(path) else None
+
+
+profiler = Profiler()
+
+
+def init_profiling(app):
+    """从配置读取剖析令牌与抽样比例；两者都未配置时不做任何事"""
+    profiler.configure(
+        app.config.setdefault('PROFILE_TOKEN', None),
+        app.config.setdefault('PROFILE_SAMPLE_RATE', 0.0),
+        app.config.setdefault('PROFILE_MEMORY', False),
+        app.config.setdefault('PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'myorder-profiles')),
+        app.config.setdefault('PROFILE_KEEP', DEFAULT_KEEP),
+    )
+    if profiler.enabled:
+        app.wsgi_app = profiler.wrap(app.wsgi_app)
+        print(f"🔬 Request profiling enabled (sample rate {profiler.sample_rate}, dir {profiler.result_dir})")
@@ -0,0 +1,49 @@
+"""可选的 Redis 连接
+
+多 worker / 多节点部署时，限流、缓存等共享状态放在 Redis（或兼容 RESP 协议的服务）中。
+未安装 redis 包或未配置 REDIS_URL 时 get_redis() 返回 None，调用方退回进程内实现。
+
+本地测试可使用 scripts/resp_standin.py 启动一个简易 RESP 服务：
+
+    python scripts/resp_standin.py --port 6390
+    export REDIS_URL=redis://localhost:6390/0
+"""
+import os
+import threading
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - 未安装时只使用进程内实现
+    redis = None
+
+# 共享状态操作必须很快，Redis 不可用时尽快失败并退回本地实现
+SOCKET_TIMEOUT = 0.5
+
+_clients = {}
+_lock = threading.Lock()
+
+
+def get_redis(url=None):
+    """返回 url（默认 REDIS_URL）对应的客户端，不可用时返回 None"""
+    url = url or os.environ.get('REDIS_URL')
+    if not url or redis is None:
+        return None
+    with _lock:
+        client = _clients.get(url)
+        if client is None:
+            # 固定 RESP2：兼容不支持 HELLO 的 RESP 服务（如 scripts/resp_standin.py）
+            client = redis.Redis.from_url(
+                url,
+                protocol=2,
+                socket_timeout=SOCKET_TIMEOUT,
+                socket_connect_timeout=SOCKET_TIMEOUT,
+            )
+            _clients[url] = client
+        return client
+
+
+def redis_errors():
+    """Redis 连接类异常，用于 except 子句"""
+    if redis is None:
+        return ()
+    return (redis.RedisError, OSError)
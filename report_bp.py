@@ -0,0 +1,110 @@
+from flask import Blueprint, request, jsonify, current_app
+from archive import wants_archived
+from cache import cache
+from breaker import CircuitOpenError
+from admission import admit, PRIORITY_READ
+from catalog import catalog
+import reports
+
+# 创建经营报表蓝图
+report_bp = Blueprint('reports', __name__, url_prefix='/reports')
+
+# 报表计算量大，结果缓存 5 分钟（订单或执行记录写入后立即失效）
+REPORT_CACHE_TTL = 300
+
+def get_db_connection():
+    """获取数据库连接 - 使用主应用的连接池（GET 请求走只读副本）"""
+    from main import DatabasePool, use_read_replica
+    return DatabasePool.get_connection(readonly=use_read_replica())
+
+def close_db_connection(conn, close=False):
+    """关闭数据库连接"""
+    from main import DatabasePool
+    DatabasePool.return_connection(conn, close)
+
+def run_report(report, *args):
+    """在一个连接上执行报表查询（报表 SQL 只读取数组，使用普通游标）"""
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        result = report(cursor, *args)
+        cursor.close()
+    finally:
+        close_db_connection(conn)
+    return result
+
+@report_bp.route('/api/revenue')
+@admit(PRIORITY_READ, limit=2)
+def revenue():
+    """按月收入与消耗（start / end 为 YYYY-MM-DD，默认最近12个月）"""
+    try:
+        first_month, last_month = reports.parse_month_range(request.args)
+        include_archived = wants_archived(request.args)
+        data = cache.get_or_load(
+            'orders', f'report:revenue:{first_month}:{last_month}:{int(include_archived)}',
+            lambda: run_report(reports.revenue_report, first_month, last_month, include_archived),
+            ttl=REPORT_CACHE_TTL
+        )
+        return jsonify({
+            'code': 0,
+            'data': data
+        })
+
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        current_app.logger.error(f"获取收入报表失败: {str(e)}")
+        return jsonify({
+            'code': 1,
+            'msg': f'获取收入报表失败: {str(e)}'
+        })
+
+@report_bp.route('/api/utilization')
+@admit(PRIORITY_READ, limit=2)
+def utilization():
+    """各服务、套餐的购买与完成次数"""
+    try:
+        include_archived = wants_archived(request.args)
+        services = catalog.current().services
+        data = cache.get_or_load(
+            'orders', f'report:utilization:{int(include_archived)}',
+            lambda: run_report(reports.utilization_report, services, include_archived),
+            ttl=REPORT_CACHE_TTL
+        )
+        return jsonify({
+            'code': 0,
+            'data': data
+        })
+
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        current_app.logger.error(f"获取使用率报表失败: {str(e)}")
+        return jsonify({
+            'code': 1,
+            'msg': f'获取使用率报表失败: {str(e)}'
+        })
+
+@report_bp.route('/api/liability')
+@admit(PRIORITY_READ, limit=2)
+def liability():
+    """未结束订单的预收款余额"""
+    try:
+        data = cache.get_or_load(
+            'orders', 'report:liability',
+            lambda: run_report(reports.liability_report),
+            ttl=REPORT_CACHE_TTL
+        )
+        return jsonify({
+            'code': 0,
+            'data': data
+        })
+
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        current_app.logger.error(f"获取预收款报表失败: {str(e)}")
+        return jsonify({
+            'code': 1,
+            'msg': f'获取预收款报表失败: {str(e)}'
+        })
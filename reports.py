@@ -0,0 +1,277 @@
+"""经营分析报表
+
+每个报表只发一条 SQL：数据库端用 array_agg 把需要的列聚合成数组，一次取回
+（列式），Python 端转成 NumPy 数组后用 bincount / unique / searchsorted 等向量化
+运算汇总，不再逐行循环。金额在 SQL 中转为 float8，数组里不含 NULL。
+
+    revenue_report      按月收入（订单折扣价）与消耗（执行记录金额）
+    utilization_report  各服务 / 套餐的购买次数与完成次数（order_service）
+    liability_report    未结束订单的预收款余额（折扣价 - 已消耗金额）
+"""
+from datetime import date
+
+import numpy as np
+
+from archive import table_source
+
+# 不计入收入的订单状态
+CANCELLED_STATUSES = ['cancel', 'cancelled']
+
+# 仍有预收款余额的订单状态
+OPEN_STATUSES = ['pending', 'started']
+
+# 余额明细中列出的订单数
+TOP_ORDERS = 20
+
+
+def month_index(column):
+    """日期列转为月序号（年 * 12 + 月 - 1），便于 bincount"""
+    return f"(EXTRACT(YEAR FROM {column})::int * 12 + EXTRACT(MONTH FROM {column})::int - 1)"
+
+
+def month_of(value):
+    return value.year * 12 + value.month - 1
+
+
+def month_text(index):
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def _column(values, dtype):
+    """array_agg 在没有行时返回 NULL"""
+    return np.asarray(values if values is not None else [], dtype=dtype)
+
+
+def _money(values):
+    return [round(float(value), 2) for value in values]
+
+
+def parse_month_range(args, default_months=12):
+    """start / end（YYYY-MM-DD）转为首尾月序号，默认最近 default_months 个月"""
+    end = date.fromisoformat(args['end']) if args.get('end') else date.today()
+    if args.get('start'):
+        start = date.fromisoformat(args['start'])
+    else:
+        start_index = month_of(end) - default_months + 1
+        start = date(start_index // 12, start_index % 12 + 1, 1)
+    if start > end:
+        raise ValueError('开始日期不能晚于结束日期')
+    return month_of(start), month_of(end)
+
+
+# ==================== 按月收入与消耗 ====================
+REVENUE_SQL = """
+    SELECT o.months, o.amounts, i.months, i.amounts
+    FROM (
+        SELECT array_agg({order_month}) AS months,
+               array_agg(COALESCE(order_disprice, 0)::float8) AS amounts
+        FROM {orders}
+        WHERE order_buytime >= %(start)s AND order_buytime < %(end)s
+          AND COALESCE(order_status, '') <> ALL(%(cancelled)s)
+    ) o, (
+        SELECT array_agg({item_month}) AS months,
+               array_agg(COALESCE(item_price, 0)::float8) AS amounts
+        FROM {items}
+        WHERE exetime >= %(start)s AND exetime < %(end)s
+    ) i
+"""
+
+
+def compute_revenue(first_month, last_month, order_months, order_amounts, item_months, item_amounts):
+    """按月汇总：bincount 以月序号为下标累加金额与笔数"""
+    size = last_month - first_month + 1
+    order_slots = order_months - first_month
+    item_slots = item_months - first_month
+
+    revenue = np.bincount(order_slots, weights=order_amounts, minlength=size)
+    orders = np.bincount(order_slots, minlength=size)
+    consumed = np.bincount(item_slots, weights=item_amounts, minlength=size)
+    items = np.bincount(item_slots, minlength=size)
+
+    months = [month_text(first_month + offset) for offset in range(size)]
+    return {
+        'months': months,
+        'revenue': _money(revenue),
+        'consumed': _money(consumed),
+        'orders': orders.tolist(),
+        'items': items.tolist(),
+        'total_revenue': round(float(order_amounts.sum()), 2),
+        'total_consumed': round(float(item_amounts.sum()), 2),
+    }
+
+
+def revenue_report(cursor, first_month, last_month, include_archived=False):
+    sql = REVENUE_SQL.format(
+        order_month=month_index('order_buytime'),
+        item_month=month_index('exetime'),
+        orders=table_source('order_list', include_archived),
+        items=table_source('item', include_archived),
+    )
+    cursor.execute(sql, {
+        'start': date(first_month // 12, first_month % 12 + 1, 1),
+        'end': date((last_month + 1) // 12, (last_month + 1) % 12 + 1, 1),
+        'cancelled': CANCELLED_STATUSES,
+    })
+    order_months, order_amounts, item_months, item_amounts = cursor.fetchone()
+    return compute_revenue(
+        first_month, last_month,
+        _column(order_months, np.int64), _column(order_amounts, np.float64),
+        _column(item_months, np.int64), _column(item_amounts, np.float64),
+    )
+
+
+# ==================== 服务 / 套餐使用率 ====================
+UTILIZATION_SQL = """
+    SELECT array_agg(os.service_id),
+           array_agg(os.quantity),
+           array_agg(LEAST(COALESCE(os.completed_quantity, 0), os.quantity))
+    FROM {order_services}
+    JOIN {orders} ON o.order_id = os.order_id
+    WHERE COALESCE(o.order_status, '') <> ALL(%s)
+"""
+
+
+def _utilization_rows(keys, purchases, quantity, completed):
+    rows = []
+    for key, bought, total, done in zip(keys, purchases.tolist(), quantity.tolist(), completed.tolist()):
+        rows.append({
+            'key': key,
+            'purchases': bought,
+            'quantity': total,
+            'completed': done,
+            'remaining': total - done,
+            'utilization': round(done / total * 100, 1) if total else 0,
+        })
+    return rows
+
+
+def compute_utilization(service_ids, quantity, completed, services):
+    """按服务、套餐汇总购买与完成次数；services 为服务表行（service_id / desc / package）
+
+    从未被购买过的服务也会列出（次数为 0）
+    """
+    known = np.asarray([service['service_id'] for service in services], dtype=np.int64)
+    ids = np.union1d(known, service_ids)
+    slots = np.searchsorted(ids, service_ids)
+    purchases = np.bincount(slots, minlength=len(ids))
+    total = np.bincount(slots, weights=quantity, minlength=len(ids)).astype(np.int64)
+    done = np.bincount(slots, weights=completed, minlength=len(ids)).astype(np.int64)
+
+    info = {service['service_id']: service for service in services}
+    by_service = _utilization_rows(ids.tolist(), purchases, total, done)
+    for row in by_service:
+        service = info.get(row.pop('key'), {})
+        row['service_id'] = service.get('service_id')
+        row['desc'] = service.get('desc') or '未命名服务'
+        row['package'] = service.get('package') or ''
+
+    # 服务汇总到套餐：再按套餐名 bincount 一次
+    packages, package_slots = np.unique(
+        np.asarray([row['package'] for row in by_service], dtype=object), return_inverse=True
+    )
+    by_package = _utilization_rows(
+        packages.tolist(),
+        np.bincount(package_slots, weights=purchases, minlength=len(packages)).astype(np.int64),
+        np.bincount(package_slots, weights=total, minlength=len(packages)).astype(np.int64),
+        np.bincount(package_slots, weights=done, minlength=len(packages)).astype(np.int64),
+    )
+    for row in by_package:
+        row['package'] = row.pop('key')
+
+    by_service.sort(key=lambda row: row['quantity'], reverse=True)
+    by_package.sort(key=lambda row: row['quantity'], reverse=True)
+    return {
+        'services': by_service,
+        'packages': by_package,
+        'total_quantity': int(total.sum()),
+        'total_completed': int(done.sum()),
+    }
+
+
+def utilization_report(cursor, services, include_archived=False):
+    cursor.execute(UTILIZATION_SQL.format(
+        order_services=table_source('order_service', include_archived, 'os'),
+        orders=table_source('order_list', include_archived, 'o'),
+    ), (CANCELLED_STATUSES,))
+    service_ids, quantity, completed = cursor.fetchone()
+    return compute_utilization(
+        _column(service_ids, np.int64), _column(quantity, np.int64), _column(completed, np.int64), services,
+    )
+
+
+# ==================== 预收款余额 ====================
+LIABILITY_SQL = """
+    WITH open_orders AS MATERIALIZED (
+        SELECT order_id, COALESCE(order_disprice, 0)::float8 AS prepaid, order_buytime
+        FROM order_list
+        WHERE order_status = ANY(%s)
+    )
+    SELECT o.ids, o.prepaid, o.months, i.record_ids, i.prices
+    FROM (
+        SELECT array_agg(order_id ORDER BY order_id) AS ids,
+               array_agg(prepaid ORDER BY order_id) AS prepaid,
+               array_agg({order_month} ORDER BY order_id) AS months
+        FROM open_orders
+    ) o, (
+        SELECT array_agg(i.record_id) AS record_ids,
+               array_agg(COALESCE(i.item_price, 0)::float8) AS prices
+        FROM item i
+        JOIN open_orders oo ON oo.order_id = i.record_id
+    ) i
+"""
+
+
+def compute_liability(order_ids, prepaid, order_months, item_order_ids, item_prices, top=TOP_ORDERS):
+    """order_ids 升序；每条执行记录用 searchsorted 定位所属订单后 bincount 累加"""
+    consumed = np.bincount(
+        np.searchsorted(order_ids, item_order_ids), weights=item_prices, minlength=len(order_ids)
+    )
+    balance = prepaid - consumed
+    outstanding = np.clip(balance, 0, None)
+
+    # 按购买月份的余额账龄
+    aging = []
+    if len(order_ids):
+        first_month = int(order_months.min())
+        slots = order_months - first_month
+        amounts = np.bincount(slots, weights=outstanding)
+        counts = np.bincount(slots)
+        aging = [
+            {'month': month_text(first_month + offset), 'orders': int(count), 'outstanding': round(float(amount), 2)}
+            for offset, (count, amount) in enumerate(zip(counts, amounts))
+            if count
+        ]
+
+    # 只对前 top 个做排序
+    largest = np.arange(len(order_ids))
+    if len(largest) > top:
+        largest = np.argpartition(-outstanding, top)[:top]
+    largest = largest[np.argsort(-outstanding[largest], kind='stable')]
+    return {
+        'open_orders': int(len(order_ids)),
+        'prepaid': round(float(prepaid.sum()), 2),
+        'consumed': round(float(consumed.sum()), 2),
+        'outstanding': round(float(outstanding.sum()), 2),
+        # 消耗已超过折扣价的订单
+        'overdrawn_orders': int((balance < 0).sum()),
+        'aging': aging,
+        'top_orders': [
+            {
+                'order_id': int(order_ids[index]),
+                'prepaid': round(float(prepaid[index]), 2),
+                'consumed': round(float(consumed[index]), 2),
+                'outstanding': round(float(outstanding[index]), 2),
+            }
+            for index in largest.tolist()
+        ],
+    }
+
+
+def liability_report(cursor):
+    """归档表中只有已结束订单，余额只查正式表"""
+    cursor.execute(LIABILITY_SQL.format(order_month=month_index('order_buytime')), (OPEN_STATUSES,))
+    order_ids, prepaid, order_months, item_order_ids, item_prices = cursor.fetchone()
+    return compute_liability(
+        _column(order_ids, np.int64), _column(prepaid, np.float64), _column(order_months, np.int64),
+        _column(item_order_ids, np.int64), _column(item_prices, np.float64),
+    )
@@ -0,0 +1,148 @@
+"""行数据格式化工具 - order_bp 与 exeitem_bp 共用
+
+数据库行在这里一次性转换为可直接序列化的 dict，
+之后交给 json_provider 中的快速编码器输出，不再逐行二次处理。
+"""
+from collections import namedtuple
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
+
+# 常用时间格式
+DATETIME_FMT = '%Y-%m-%d %H:%M:%S'
+MINUTE_FMT = '%Y-%m-%d %H:%M'
+DATE_FMT = '%Y-%m-%d'
+
+
+# ==================== 单值转换 ====================
+def fmt_time(value, fmt=DATETIME_FMT, default='-'):
+    """格式化日期时间，空值返回默认值"""
+    if not value:
+        return default
+    if isinstance(value, (datetime, date)):
+        return value.strftime(fmt)
+    # 字符串等其他类型按格式长度截取
+    return str(value)[:_fmt_length(fmt)]
+
+
+@lru_cache(maxsize=None)
+def _fmt_length(fmt):
+    return len(datetime(2000, 1, 1).strftime(fmt))
+
+
+def to_float(value, default=0):
+    """金额转 float，None 返回默认值"""
+    if value is None:
+        return default
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def price_text(value, default='-'):
+    """金额转文本（如 '199.0'），None 或非法值返回默认值"""
+    if value is None:
+        return default
+    try:
+        return str(float(value))
+    except (TypeError, ValueError):
+        return default
+
+
+# ==================== 转换器工厂（用于 row_mapper） ====================
+def as_text(default):
+    """空值替换为默认值，等价于 value or default"""
+    return lambda value: value or default
+
+
+def as_float(default=0):
+    return lambda value: to_float(value, default)
+
+
+def as_price_text(default='-'):
+    return lambda value: price_text(value, default)
+
+
+def as_time(fmt=DATETIME_FMT, default='-'):
+    return lambda value: fmt_time(value, fmt, default)
+
+
+def row_mapper(*fields):
+    """根据字段规格生成行转换函数
+
+    每个字段规格为 (输出键, 列名或列下标, 转换函数或 None)，
+    转换函数为 None 时原样输出。
+    """
+    fields = tuple(fields)
+
+    def convert(row):
+        return {
+            key: (conv(row[col]) if conv is not None else row[col])
+            for key, col, conv in fields
+        }
+
+    return convert
+
+
+def map_rows(rows, mapper):
+    """批量转换行数据"""
+    return [mapper(row) for row in rows]
+
+
+# ==================== 元组行记录 ====================
+# 热点列表接口使用普通游标（每行一个 tuple），不再经过 DictCursor
+# 为每行构造 DictRow；记录类型基于 namedtuple，没有实例字典。
+def record_type(name, columns):
+    """生成轻量行记录类型，columns 顺序须与 SELECT 列顺序一致"""
+    return namedtuple(name, columns)
+
+
+def fetch_records(cursor, record):
+    """将普通游标的结果映射为记录列表"""
+    return list(map(record._make, cursor.fetchall()))
+
+
+def record_mapper(record, *fields):
+    """同 row_mapper，列名按记录类型解析为下标，可直接处理普通元组行"""
+    index = {name: i for i, name in enumerate(record._fields)}
+    return row_mapper(*((key, index[col], conv) for key, col, conv in fields))
+
+
+# ==================== 字段选择 ====================
+def parse_fields(args, allowed):
+    """解析 ?fields=a,b,c，返回字段元组；未指定时返回 None（全部字段）
+
+    未知字段抛出 ValueError
+    """
+    value = args.get('fields', '')
+    if not value:
+        return None
+    fields = tuple(dict.fromkeys(field.strip() for field in value.split(',') if field.strip()))
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise ValueError(f"未知字段: {', '.join(unknown)}，可选: {', '.join(allowed)}")
+    return fields
+
+
+def select_fields(rows, fields):
+    """只保留 fields 中的键；fields 为 None 时原样返回"""
+    if fields is None:
+        return rows
+    return [{key: row[key] for key in fields if key in row} for row in rows]
+
+
+def wants_flag(args, name):
+    """查询参数开关：?name=1 / true"""
+    return str(args.get(name, '')).lower() in ('1', 'true', 'yes')
+
+
+def json_default(obj):
+    """快速编码器无法直接处理的类型在这里兜底"""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.strftime(DATETIME_FMT)
+    if hasattr(obj, '__html__'):
+        return str(obj.__html__())
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
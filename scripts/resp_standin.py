@@ -0,0 +1,287 @@
+"""简易 RESP 服务（本地测试用 Redis 替身）
+
+只实现本项目用到的命令，数据保存在内存中，不持久化：
+
+    PING  ECHO  SELECT  CLIENT  GET  SET [EX|PX] [NX|XX]  DEL  EXISTS  INCR
+    EXPIRE  PEXPIRE  PTTL  WATCH  UNWATCH  MULTI  EXEC  DISCARD  FLUSHDB
+
+用法：
+
+    python scripts/resp_standin.py --port 6390
+    export REDIS_URL=redis://localhost:6390/0
+"""
+import argparse
+import socketserver
+import threading
+import time
+
+
+class Store:
+    """键值存储：key -> (value, 过期时间戳或 None)，version 用于 WATCH"""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.data = {}
+        self.versions = {}
+
+    def _alive(self, key):
+        entry = self.data.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= time.monotonic():
+            del self.data[key]
+            self.touch(key)
+            return None
+        return entry
+
+    def touch(self, key):
+        self.versions[key] = self.versions.get(key, 0) + 1
+
+    def version(self, key):
+        self._alive(key)
+        return self.versions.get(key, 0)
+
+
+class Error(Exception):
+    pass
+
+
+def _int(value):
+    try:
+        return int(value)
+    except ValueError:
+        raise Error('ERR value is not an integer or out of range')
+
+
+class Session:
+    """单个客户端连接的状态（事务、WATCH）"""
+
+    def __init__(self, store):
+        self.store = store
+        self.watched = {}
+        self.queued = None
+
+    # ---------- 命令 ----------
+    def cmd_ping(self, *args):
+        return args[0] if args else 'PONG'
+
+    def cmd_echo(self, message):
+        return message
+
+    def cmd_select(self, index):
+        return 'OK'
+
+    def cmd_client(self, *args):
+        return 'OK'
+
+    def cmd_flushdb(self, *args):
+        for key in list(self.store.data):
+            self.store.touch(key)
+        self.store.data.clear()
+        return 'OK'
+
+    def cmd_get(self, key):
+        entry = self.store._alive(key)
+        return entry[0] if entry else None
+
+    def cmd_set(self, key, value, *options):
+        expires = None
+        condition = None
+        options = [option.upper() if isinstance(option, bytes) else option for option in options]
+        i = 0
+        while i < len(options):
+            option = options[i]
+            if option in (b'EX', b'PX'):
+                amount = _int(options[i + 1])
+                expires = time.monotonic() + (amount if option == b'EX' else amount / 1000)
+                i += 2
+            elif option in (b'NX', b'XX'):
+                condition = option
+                i += 1
+            else:
+                raise Error('ERR syntax error')
+        exists = self.store._alive(key) is not None
+        if (condition == b'NX' and exists) or (condition == b'XX' and not exists):
+            return None
+        self.store.data[key] = (value, expires)
+        self.store.touch(key)
+        return 'OK'
+
+    def cmd_del(self, *keys):
+        removed = 0
+        for key in keys:
+            if self.store._alive(key) is not None:
+                del self.store.data[key]
+                self.store.touch(key)
+                removed += 1
+        return removed
+
+    def cmd_exists(self, *keys):
+        return sum(1 for key in keys if self.store._alive(key) is not None)
+
+    def cmd_incr(self, key):
+        entry = self.store._alive(key)
+        value = _int(entry[0]) + 1 if entry else 1
+        self.store.data[key] = (str(value).encode(), entry[1] if entry else None)
+        self.store.touch(key)
+        return value
+
+    def _expire(self, key, seconds):
+        entry = self.store._alive(key)
+        if entry is None:
+            return 0
+        self.store.data[key] = (entry[0], time.monotonic() + seconds)
+        self.store.touch(key)
+        return 1
+
+    def cmd_expire(self, key, seconds):
+        return self._expire(key, _int(seconds))
+
+    def cmd_pexpire(self, key, milliseconds):
+        return self._expire(key, _int(milliseconds) / 1000)
+
+    def cmd_pttl(self, key):
+        entry = self.store._alive(key)
+        if entry is None:
+            return -2
+        if entry[1] is None:
+            return -1
+        return max(int((entry[1] - time.monotonic()) * 1000), 0)
+
+    def cmd_watch(self, *keys):
+        if self.queued is not None:
+            raise Error('ERR WATCH inside MULTI is not allowed')
+        for key in keys:
+            self.watched[key] = self.store.version(key)
+        return 'OK'
+
+    def cmd_unwatch(self):
+        self.watched = {}
+        return 'OK'
+
+    def cmd_multi(self):
+        if self.queued is not None:
+            raise Error('ERR MULTI calls can not be nested')
+        self.queued = []
+        return 'OK'
+
+    def cmd_discard(self):
+        if self.queued is None:
+            raise Error('ERR DISCARD without MULTI')
+        self.queued = None
+        self.watched = {}
+        return 'OK'
+
+    def cmd_exec(self):
+        if self.queued is None:
+            raise Error('ERR EXEC without MULTI')
+        queued, self.queued = self.queued, None
+        watched, self.watched = self.watched, {}
+        # WATCH 的键在此期间被修改：事务不执行，返回空数组
+        if any(self.store.version(key) != version for key, version in watched.items()):
+            return NULL_ARRAY
+        results = []
+        for name, args in queued:
+            try:
+                results.append(self.call(name, args))
+            except Error as e:
+                results.append(e)
+        return results
+
+    # ---------- 分发 ----------
+    def call(self, name, args):
+        handler = getattr(self, 'cmd_' + name, None)
+        if handler is None:
+            raise Error(f"ERR unknown command '{name}'")
+        try:
+            return handler(*args)
+        except TypeError:
+            raise Error(f"ERR wrong number of arguments for '{name}' command")
+
+    def execute(self, parts):
+        name = parts[0].decode().lower()
+        args = parts[1:]
+        with self.store.lock:
+            if self.queued is not None and name not in ('exec', 'discard', 'multi', 'watch'):
+                if not hasattr(self, 'cmd_' + name):
+                    raise Error(f"ERR unknown command '{name}'")
+                self.queued.append((name, args))
+                return 'QUEUED'
+            return self.call(name, args)
+
+
+NULL_ARRAY = object()
+
+
+def encode(value):
+    if value is None:
+        return b'$-1\r\n'
+    if value is NULL_ARRAY:
+        return b'*-1\r\n'
+    if isinstance(value, Error):
+        return f"-{value}\r\n".encode()
+    if isinstance(value, str):
+        return f"+{value}\r\n".encode()
+    if isinstance(value, bool):
+        value = int(value)
+    if isinstance(value, int):
+        return f":{value}\r\n".encode()
+    if isinstance(value, bytes):
+        return b'$%d\r\n%s\r\n' % (len(value), value)
+    if isinstance(value, list):
+        return b'*%d\r\n' % len(value) + b''.join(encode(item) for item in value)
+    raise TypeError(f"cannot encode {type(value)}")
+
+
+class Handler(socketserver.StreamRequestHandler):
+
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b'*'):
+            # inline 命令（如 telnet 中直接输入 PING）
+            return line.split()
+        parts = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            parts.append(self.rfile.read(length + 2)[:-2])
+        return parts
+
+    def handle(self):
+        session = Session(self.server.store)
+        while True:
+            parts = self.read_command()
+            if parts is None:
+                break
+            if not parts:
+                continue
+            try:
+                reply = session.execute(parts)
+            except Error as e:
+                reply = e
+            self.wfile.write(encode(reply))
+
+
+class Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address):
+        super().__init__(address, Handler)
+        self.store = Store()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local RESP stand-in for Redis')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6390)
+    args = parser.parse_args()
+
+    with Server((args.host, args.port)) as server:
+        print(f"RESP stand-in listening on {args.host}:{args.port}")
+        server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,7 @@
-import os
-from app import app
-
-if __name__ == '__main__':
-    port = int(os.environ.get('PORT', 5000))
-    # 使用内置服务器先测试
+import os
+from app import app
+
+if __name__ == '__main__':
+    port = int(os.environ.get('PORT', 5000))
+    # 使用内置服务器先测试
     app.run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
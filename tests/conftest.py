@@ -0,0 +1,22 @@
+"""测试从仓库根目录导入各模块（项目为平铺结构，没有安装包）"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def db_conn():
+    """需要数据库的测试：设置 TEST_DATABASE_URL（测试库）时运行，否则跳过"""
+    url = os.environ.get('TEST_DATABASE_URL')
+    if not url:
+        pytest.skip('未设置 TEST_DATABASE_URL')
+    import psycopg2
+    conn = psycopg2.connect(url)
+    try:
+        yield conn
+    finally:
+        conn.rollback()
+        conn.close()
@@ -0,0 +1,105 @@
+import threading
+import time
+
+import pytest
+
+from admission import (
+    AdmissionController, Overloaded, PRIORITY_WRITE, PRIORITY_READ, PRIORITY_POLL,
+)
+
+
+def _acquire_in_thread(controller, key, priority=PRIORITY_READ, limit=None):
+    """在后台线程中 acquire，返回 (线程, 结果列表)"""
+    result = []
+
+    def run():
+        try:
+            controller.acquire(key, priority, limit)
+            result.append('ok')
+        except Overloaded as e:
+            result.append(e.reason)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread, result
+
+
+def _wait_for_waiters(controller, count):
+    deadline = time.monotonic() + 2
+    while controller.stats()['waiting'] < count:
+        assert time.monotonic() < deadline, 'waiter did not enqueue'
+        time.sleep(0.005)
+
+
+def test_fast_path_and_release():
+    controller = AdmissionController(capacity=2, queue_size=4, timeout=1)
+    assert controller.acquire('a') == 0.0
+    assert controller.acquire('b') == 0.0
+    assert controller.stats()['active'] == 2
+    controller.release('a')
+    controller.release('b')
+    assert controller.stats()['active'] == 0
+
+
+def test_route_limit_does_not_block_other_routes():
+    controller = AdmissionController(capacity=4, queue_size=4, timeout=1)
+    controller.acquire('export', limit=1)
+    # 第二个 export 只因路由限流排队
+    thread, result = _acquire_in_thread(controller, 'export', limit=1)
+    _wait_for_waiters(controller, 1)
+    # 其他路由在全局有空位时直接放行
+    assert controller.acquire('orders') == 0.0
+    controller.release('orders')
+    controller.release('export')
+    thread.join(2)
+    assert result == ['ok']
+
+
+def test_waiters_granted_by_priority():
+    controller = AdmissionController(capacity=1, queue_size=4, timeout=2)
+    controller.acquire('busy')
+    order = []
+    threads = []
+    for key, priority in (('poll', PRIORITY_POLL), ('read', PRIORITY_READ), ('write', PRIORITY_WRITE)):
+        def run(key=key, priority=priority):
+            controller.acquire(key, priority)
+            order.append(key)
+            controller.release(key)
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        threads.append(thread)
+        _wait_for_waiters(controller, len(threads))
+    controller.release('busy')
+    for thread in threads:
+        thread.join(2)
+    assert order == ['write', 'read', 'poll']
+
+
+def test_timeout_removes_waiter():
+    controller = AdmissionController(capacity=1, queue_size=4, timeout=0.05)
+    controller.acquire('busy')
+    with pytest.raises(Overloaded) as e:
+        controller.acquire('read')
+    assert e.value.reason == 'timeout'
+    assert controller.stats()['waiting'] == 0
+    controller.release('busy')
+    assert controller.acquire('read') == 0.0
+
+
+def test_full_queue_evicts_lower_priority():
+    controller = AdmissionController(capacity=1, queue_size=1, timeout=2)
+    controller.acquire('busy')
+    poll_thread, poll_result = _acquire_in_thread(controller, 'poll', PRIORITY_POLL)
+    _wait_for_waiters(controller, 1)
+
+    # 同等优先级无法挤掉队尾，直接拒绝
+    with pytest.raises(Overloaded) as e:
+        controller.acquire('poll2', PRIORITY_POLL)
+    assert e.value.reason == 'queue_full'
+
+    write_thread, write_result = _acquire_in_thread(controller, 'write', PRIORITY_WRITE)
+    poll_thread.join(2)
+    assert poll_result == ['evicted']
+    controller.release('busy')
+    write_thread.join(2)
+    assert write_result == ['ok']
@@ -0,0 +1,71 @@
+import pytest
+
+import breaker
+from breaker import CircuitBreaker, CircuitOpenError, CLOSED, OPEN, HALF_OPEN
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(breaker.time, 'monotonic', fake)
+    # 去掉抖动：退避时间固定为上限
+    monkeypatch.setattr(breaker.random, 'random', lambda: 1.0)
+    return fake
+
+
+def _fail(circuit):
+    def boom():
+        raise RuntimeError('down')
+    with pytest.raises(RuntimeError):
+        circuit.call(boom)
+
+
+def test_opens_after_threshold(clock):
+    circuit = CircuitBreaker('db', failure_threshold=2, base_delay=1.0)
+    _fail(circuit)
+    assert circuit.stats()['state'] == CLOSED
+    _fail(circuit)
+    assert circuit.stats()['state'] == OPEN
+    with pytest.raises(CircuitOpenError) as e:
+        circuit.call(lambda: 'ok')
+    assert e.value.retry_after == pytest.approx(1.0)
+
+
+def test_success_resets_failures(clock):
+    circuit = CircuitBreaker('db', failure_threshold=2)
+    _fail(circuit)
+    assert circuit.call(lambda: 'ok') == 'ok'
+    _fail(circuit)
+    assert circuit.stats()['state'] == CLOSED
+
+
+def test_half_open_allows_single_probe(clock):
+    circuit = CircuitBreaker('db', failure_threshold=1, base_delay=1.0)
+    _fail(circuit)
+    clock.now += 1.0
+    circuit.before_call()
+    assert circuit.stats()['state'] == HALF_OPEN
+    # 探测进行中，其他请求被拒绝
+    with pytest.raises(CircuitOpenError):
+        circuit.before_call()
+    circuit.record_success()
+    assert circuit.stats()['state'] == CLOSED
+    assert circuit.call(lambda: 'ok') == 'ok'
+
+
+def test_failed_probe_backs_off_exponentially(clock):
+    circuit = CircuitBreaker('db', failure_threshold=1, base_delay=1.0, max_delay=3.0)
+    _fail(circuit)
+    for expected in (2.0, 3.0, 3.0):
+        clock.now += 10
+        _fail(circuit)
+        assert circuit.stats()['state'] == OPEN
+        assert circuit.stats()['retry_after'] == expected
@@ -0,0 +1,88 @@
+import csv
+
+import pytest
+
+from bulk_import import DUMP_NULL, BulkImportError, _read_header, load_paths, parse_mysql_dump, run_import
+
+DUMP = r"""
+INSERT INTO `users` VALUES (1, 'admin', 'secret', 'admin');
+INSERT INTO `order_list` VALUES (1, '张三 \'VIP\'', 199.00, 99.50, '2023-05-01', NULL, 'pending'),
+    (2, 'it''s;\n多行', 10.00, 10.00, '2023-05-02', '', 'used');
+INSERT INTO `item` (`item_id`, `record_id`, `item_name`) VALUES (7, 1, 'a,b');
+"""
+
+
+def read(table_file):
+    return list(csv.reader(table_file))
+
+
+def test_parse_mysql_dump_keeps_importable_tables():
+    files = parse_mysql_dump(DUMP)
+    assert sorted(files) == ['item', 'order_list']
+
+    rows = read(files['order_list'])
+    assert rows[0][0] == 'order_id'
+    assert rows[1] == ['1', "张三 'VIP'", '199.00', '99.50', '2023-05-01', DUMP_NULL, 'pending']
+    # '' 转义、\n 转义、字符串中的分号；空字符串与 NULL 区分
+    assert rows[2] == ['2', "it's;\n多行", '10.00', '10.00', '2023-05-02', '', 'used']
+
+
+def test_parse_mysql_dump_uses_explicit_column_list():
+    rows = read(parse_mysql_dump(DUMP)['item'])
+    assert rows == [['item_id', 'record_id', 'item_name'], ['7', '1', 'a,b']]
+
+
+def test_parse_mysql_dump_rejects_malformed_values():
+    with pytest.raises(BulkImportError):
+        parse_mysql_dump("INSERT INTO `order_list` VALUES (1, oops);")
+
+
+def test_read_header_strips_bom_from_bytes():
+    columns, body = _read_header('\ufefforder_id, order_info\n1,x\n'.encode('utf-8'))
+    assert columns == ['order_id', 'order_info']
+    assert body.read() == '1,x\n'
+
+
+def test_load_paths_rejects_unknown_files(tmp_path):
+    path = tmp_path / 'orders.xlsx'
+    path.write_bytes(b'')
+    with pytest.raises(BulkImportError):
+        load_paths([str(path)])
+
+
+def test_load_paths_reads_table_csv(tmp_path):
+    path = tmp_path / 'order_list.csv'
+    path.write_text('order_id\n1\n')
+    sources, null_marker = load_paths([str(path)])
+    try:
+        assert null_marker is None
+        assert _read_header(sources['order_list'])[0] == ['order_id']
+    finally:
+        sources['order_list'].close()
+
+
+def test_import_never_moves_order_sequence_back(db_conn):
+    cursor = db_conn.cursor()
+    cursor.execute("SELECT to_regclass('order_list')")
+    if cursor.fetchone()[0] is None:
+        pytest.skip('测试库中没有 order_list')
+    try:
+        cursor.execute("INSERT INTO order_list (order_info, order_price, order_disprice, order_buytime) "
+                       "VALUES ('seq-test-live', 1, 1, now()) RETURNING order_id")
+        live_id = cursor.fetchone()[0]
+        # 模拟其他事务已取走但尚未提交（或已删除）的编号：序列领先于表中最大编号
+        cursor.execute("SELECT setval(pg_get_serial_sequence('order_list', 'order_id'), %s)", (live_id + 500,))
+        db_conn.commit()
+
+        source = f"order_id,order_info,order_price,order_disprice\n{live_id},seq-test-imported,2,2\n"
+        report = run_import(db_conn, {'order_list': source.encode()})
+        assert report['remapped_orders'] == 1
+
+        cursor.execute("SELECT order_id FROM order_list WHERE order_info = 'seq-test-imported'")
+        assert cursor.fetchone()[0] > live_id + 500
+        cursor.execute("SELECT pg_sequence_last_value(pg_get_serial_sequence('order_list', 'order_id'))")
+        assert cursor.fetchone()[0] > live_id + 500
+    finally:
+        db_conn.rollback()
+        cursor.execute("DELETE FROM order_list WHERE order_info IN ('seq-test-live', 'seq-test-imported')")
+        db_conn.commit()
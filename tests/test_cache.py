@@ -0,0 +1,97 @@
+import threading
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+import cache as cache_module
+from cache import Cache, LRUBackend
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    class Clock:
+        now = 1000.0
+
+    monkeypatch.setattr(cache_module.time, 'monotonic', lambda: Clock.now)
+    return Clock
+
+
+def test_miss_and_hit_return_same_value():
+    cache = Cache(LRUBackend())
+    loader = lambda: {'day': date(2024, 1, 2), 'amount': Decimal('1.50'), 'ids': (1, 2)}
+    miss = cache.get_or_load('orders', 'k', loader)
+    hit = cache.get_or_load('orders', 'k', loader)
+    assert miss == hit
+    assert miss == {'day': '2024-01-02', 'amount': 1.5, 'ids': [1, 2]}
+
+
+def test_invalidate_bumps_version():
+    cache = Cache(LRUBackend())
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return len(calls)
+
+    assert cache.get_or_load('orders', 'k', loader) == 1
+    assert cache.get_or_load('orders', 'k', loader) == 1
+    cache.invalidate('orders')
+    assert cache.version('orders') == 1
+    assert cache.get_or_load('orders', 'k', loader) == 2
+    # 其他命名空间不受影响
+    assert cache.get_or_load('services', 'k', loader) == 3
+    cache.invalidate('orders')
+    assert cache.get_or_load('services', 'k', loader) == 3
+
+
+def test_no_fill_within_replica_lag_after_write(clock):
+    cache = Cache(LRUBackend(), fill_delay=5)
+    values = iter(['stale', 'fresh', 'later'])
+    loader = lambda: next(values)
+
+    cache.invalidate('orders')
+    # 写入后的复制延迟窗口内：每次都查库，结果不写入缓存
+    assert cache.get_or_load('orders', 'k', loader) == 'stale'
+    assert cache.get_or_load('orders', 'k', loader) == 'fresh'
+    clock.now += 5
+    assert cache.get_or_load('orders', 'k', loader) == 'later'
+    assert cache.get_or_load('orders', 'k', loader) == 'later'
+
+
+def test_concurrent_misses_run_loader_once():
+    cache = Cache(LRUBackend())
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        started.set()
+        release.wait(2)
+        return 'value'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_load('orders', 'k', loader)))
+               for _ in range(4)]
+    threads[0].start()
+    started.wait(2)
+    for thread in threads[1:]:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join(2)
+    assert results == ['value'] * 4
+    assert len(calls) == 1
+
+
+def test_lru_evicts_oldest_but_keeps_counters():
+    backend = LRUBackend(maxsize=2)
+    backend.incr('cache:orders:version')
+    backend.set('a', b'1')
+    backend.set('b', b'2')
+    backend.get('a')
+    backend.set('c', b'3')
+    assert backend.get('b') is None
+    assert backend.get('a') == b'1'
+    assert backend.get('cache:orders:version') == b'1'
@@ -0,0 +1,68 @@
+import changes
+from changes import ChangeLog, TABLE_SQL
+
+
+class FakeCursor:
+    """按顺序返回预设结果，记录执行过的 SQL"""
+
+    def __init__(self, results):
+        self.results = list(results)
+        self.executed = []
+        self.rowcount = 0
+
+    def execute(self, sql, params=None):
+        self.executed.append(sql)
+
+    def fetchone(self):
+        return self.results.pop(0)
+
+    def fetchall(self):
+        return self.results.pop(0)
+
+
+def test_missing_table_skips_recording_and_reads_reset(monkeypatch):
+    log = ChangeLog()
+    cursor = FakeCursor([(False,)])
+    log.record_orders(cursor, [1, 2])
+    log.record_item(cursor, 10, 1)
+    log.record_reset(cursor)
+    # 只检查了一次表是否存在
+    assert cursor.executed == [TABLE_SQL]
+
+    changeset = log.since(cursor, 5, 100)
+    assert changeset.reset and changeset.version == 0
+
+    # 超过重新检查间隔后发现表已创建
+    monkeypatch.setattr(changes, 'TABLE_RECHECK_INTERVAL', 0)
+    cursor = FakeCursor([(True,)])
+    log.record_orders(cursor, [3])
+    assert cursor.executed[0] == TABLE_SQL
+    assert changes.RECORD_ORDERS_SQL in cursor.executed
+
+
+def test_since_collects_changes():
+    log = ChangeLog()
+    log._table = True
+    rows = [
+        (11, 'order', 1, 1, False),
+        (12, 'item', 7, 1, False),
+        (13, 'order', 2, 2, True),
+        (14, 'order', 2, 2, False),
+    ]
+    changeset = log.since(FakeCursor([(10, 20), rows]), 10, 100)
+    assert not changeset.reset
+    assert changeset.version == 14
+    assert changeset.order_ids == [1]
+    assert changeset.deleted_ids == [2]
+    assert changeset.item_ids == [7]
+
+
+def test_since_resets_when_versions_purged_or_too_many():
+    log = ChangeLog()
+    log._table = True
+    assert log.since(FakeCursor([(50, 60)]), 10, 100).reset
+    assert log.since(FakeCursor([(1, 60)]), 70, 100).reset
+    too_many = [(version, 'order', version, version, False) for version in range(11, 14)]
+    assert log.since(FakeCursor([(1, 60), too_many]), 10, 2).reset
+    current = log.since(FakeCursor([(1, 60)]), None, 100)
+    assert current.version == 60 and not current.reset
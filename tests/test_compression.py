@@ -0,0 +1,77 @@
+import gzip
+
+import pytest
+from flask import Flask, Response
+from werkzeug.http import parse_accept_header
+
+from compression import (
+    _compress_stream, _make_encoder, brotli, compress_bytes, init_compression, negotiate_encoding,
+)
+
+CONFIG = {'COMPRESS_GZIP_LEVEL': 6, 'COMPRESS_BR_LEVEL': 4}
+
+
+def accept(value):
+    return parse_accept_header(value)
+
+
+def test_negotiate_prefers_brotli_then_gzip():
+    if brotli is not None:
+        assert negotiate_encoding(accept('gzip, deflate, br')) == 'br'
+    assert negotiate_encoding(accept('gzip, br;q=0')) == 'gzip'
+    assert negotiate_encoding(accept('identity')) is None
+    assert negotiate_encoding(accept('')) is None
+
+
+def test_compress_stream_round_trip_and_closes_source():
+    closed = []
+
+    class Chunks:
+        def __iter__(self):
+            yield '订单,'
+            yield b'a' * 10000
+            yield ''
+
+        def close(self):
+            closed.append(True)
+
+    body = b''.join(_compress_stream(Chunks(), _make_encoder('gzip', CONFIG)))
+    assert gzip.decompress(body) == '订单,'.encode('utf-8') + b'a' * 10000
+    assert closed == [True]
+
+
+@pytest.mark.skipif(brotli is None, reason='brotli 未安装')
+def test_compress_bytes_brotli():
+    data = b'{"code":0}' * 500
+    assert brotli.decompress(compress_bytes(data, 'br', CONFIG)) == data
+
+
+def make_app():
+    app = Flask(__name__)
+    init_compression(app)
+
+    @app.route('/big')
+    def big():
+        response = Response('x' * 5000, mimetype='application/json')
+        response.set_etag('abc')
+        return response
+
+    @app.route('/small')
+    def small():
+        return Response('{}', mimetype='application/json')
+
+    return app
+
+
+def test_large_response_is_gzipped_with_weak_etag():
+    response = make_app().test_client().get('/big', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert response.headers['ETag'] == 'W/"abc"'
+    assert gzip.decompress(response.get_data()) == b'x' * 5000
+
+
+def test_small_response_is_left_alone():
+    response = make_app().test_client().get('/small', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_data() == b'{}'
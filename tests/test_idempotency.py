@@ -0,0 +1,104 @@
+import os
+
+import pytest
+from flask import Flask
+
+import idempotency as idempotency_module
+from idempotency import Idempotency, IdempotencyError, RequestKey
+
+
+@pytest.fixture
+def key_conn(db_conn):
+    """idempotency_key 表（db/idempotency.sql）中的测试键，结束后删除"""
+    cursor = db_conn.cursor()
+    cursor.execute("SELECT to_regclass('idempotency_key')")
+    if cursor.fetchone()[0] is None:
+        pytest.skip('未执行 db/idempotency.sql')
+    keys = []
+    with Flask(__name__).app_context():
+        yield db_conn, keys
+    db_conn.rollback()
+    cursor.execute("DELETE FROM idempotency_key WHERE key_hash = ANY(%s)", (keys,))
+    db_conn.commit()
+
+
+def _key(keys, request_hash=b'request-1'):
+    key = RequestKey(os.urandom(20), request_hash)
+    keys.append(key.key_hash)
+    return key
+
+
+def _first_write(conn, store, key, payload):
+    """第一次请求：占用键、保存响应并提交"""
+    cursor = conn.cursor()
+    assert store.claim(cursor, key) is None
+    store.save(cursor, key, payload)
+    conn.commit()
+
+
+def test_retry_replays_stored_response(key_conn, monkeypatch):
+    conn, keys = key_conn
+    store = Idempotency()
+    key = _key(keys)
+    payload = {'code': 0, 'msg': '订单添加成功', 'data': {'order_id': 42}}
+    _first_write(conn, store, key, payload)
+
+    counted = []
+    monkeypatch.setattr(idempotency_module.metrics, 'incr', lambda name, *args: counted.append(name))
+    replay = store.claim(conn.cursor(), RequestKey(key.key_hash, key.request_hash))
+    conn.rollback()
+    assert replay is not None
+    assert replay.get_json() == payload
+    assert replay.headers['Idempotent-Replayed'] == 'true'
+    assert counted == ['idempotency.replayed']
+
+
+def test_same_key_other_request_is_rejected(key_conn):
+    conn, keys = key_conn
+    store = Idempotency()
+    key = _key(keys)
+    _first_write(conn, store, key, {'code': 0})
+
+    with pytest.raises(IdempotencyError) as e:
+        store.claim(conn.cursor(), RequestKey(key.key_hash, b'request-2'))
+    conn.rollback()
+    assert e.value.status == 422
+
+
+def test_expired_key_is_claimed_again(key_conn):
+    conn, keys = key_conn
+    store = Idempotency(ttl=60)
+    key = _key(keys)
+    _first_write(conn, store, key, {'code': 0, 'data': {'order_id': 1}})
+
+    cursor = conn.cursor()
+    cursor.execute(
+        "UPDATE idempotency_key SET created_at = now() - interval '61 seconds' WHERE key_hash = %s",
+        (key.key_hash,)
+    )
+    conn.commit()
+
+    # 过期后同一个键（即使请求体不同）视为新请求
+    other = RequestKey(key.key_hash, b'request-2')
+    _first_write(conn, store, other, {'code': 0, 'data': {'order_id': 2}})
+    cursor.execute("SELECT request_hash, response FROM idempotency_key WHERE key_hash = %s", (key.key_hash,))
+    request_hash, response = cursor.fetchone()
+    assert bytes(request_hash) == b'request-2'
+    assert response == {'code': 0, 'data': {'order_id': 2}}
+
+
+def test_uncommitted_claim_is_released_on_rollback(key_conn):
+    conn, keys = key_conn
+    store = Idempotency()
+    key = _key(keys)
+    # 第一次请求写入失败回滚：键没有被占用，重试正常写入
+    assert store.claim(conn.cursor(), key) is None
+    conn.rollback()
+    assert store.claim(conn.cursor(), key) is None
+    conn.rollback()
+
+
+def test_requests_without_key_skip_the_table():
+    store = Idempotency()
+    assert store.claim(None, None) is None
+    store.save(None, None, {'code': 0})
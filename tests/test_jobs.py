@@ -0,0 +1,63 @@
+import pytest
+
+import jobs
+from jobs import JobRunner
+
+
+@pytest.fixture
+def job_conn(db_conn):
+    """background_job 表（db/jobs.sql）中的测试任务，结束后删除"""
+    cursor = db_conn.cursor()
+    cursor.execute("SELECT to_regclass('background_job')")
+    if cursor.fetchone()[0] is None:
+        pytest.skip('未执行 db/jobs.sql')
+    yield db_conn
+    db_conn.rollback()
+    cursor.execute("DELETE FROM background_job WHERE cache_key LIKE 'test-heartbeat-%%'")
+    db_conn.commit()
+
+
+def _insert(conn, name, status, heartbeat_age):
+    cursor = conn.cursor()
+    cursor.execute(
+        "INSERT INTO background_job (kind, cache_key, status, heartbeat_at) "
+        "VALUES ('test', %s, %s, now() - %s * interval '1 second') RETURNING job_id",
+        (f'test-heartbeat-{name}', status, heartbeat_age)
+    )
+    job_id = cursor.fetchone()[0]
+    conn.commit()
+    return job_id
+
+
+def _status(conn, job_id):
+    cursor = conn.cursor()
+    cursor.execute("SELECT status, error FROM background_job WHERE job_id = %s", (job_id,))
+    return cursor.fetchone()
+
+
+def _reusable(conn, name):
+    cursor = conn.cursor()
+    cursor.execute(jobs.FIND_REUSABLE_SQL, (f'test-heartbeat-{name}', jobs.HEARTBEAT_TIMEOUT))
+    row = cursor.fetchone()
+    conn.rollback()
+    return row
+
+
+def test_heartbeat_fails_orphaned_jobs(job_conn):
+    orphaned = _insert(job_conn, 'orphaned', 'running', jobs.HEARTBEAT_TIMEOUT * 2)
+    local = _insert(job_conn, 'local', 'queued', jobs.HEARTBEAT_TIMEOUT * 2)
+    fresh = _insert(job_conn, 'fresh', 'queued', 0)
+    assert _reusable(job_conn, 'orphaned') is None
+
+    runner = JobRunner()
+    runner._get_connection = lambda readonly=False: job_conn
+    runner._release = lambda conn, close=False: None
+    # 本进程仍在执行的任务：心跳被刷新，不会被标记
+    runner._active.add(local)
+
+    assert runner.heartbeat() >= 1
+    assert _status(job_conn, orphaned) == ('failed', '任务已中断（执行进程已退出）')
+    assert _status(job_conn, local)[0] == 'queued'
+    assert _status(job_conn, fresh)[0] == 'queued'
+    assert _reusable(job_conn, 'local') is not None
+    assert _reusable(job_conn, 'fresh') is not None
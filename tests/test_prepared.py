@@ -0,0 +1,42 @@
+import pytest
+
+import prepared
+
+
+def test_numbered_converts_placeholders():
+    assert prepared.numbered("SELECT 1") == ("SELECT 1", 0)
+    assert prepared.numbered("SELECT * FROM t WHERE a = %s AND b IN (%s, %s)") == (
+        "SELECT * FROM t WHERE a = $1 AND b IN ($2, $3)", 3
+    )
+
+
+def test_register_validates_names_and_conflicts():
+    with pytest.raises(ValueError):
+        prepared.register('Bad-Name', "SELECT 1")
+    name = prepared.register('test_register_twice', "SELECT %s")
+    # 相同语句重复注册（模块重新加载）允许
+    assert prepared.register(name, "SELECT %s") == name
+    with pytest.raises(ValueError):
+        prepared.register(name, "SELECT %s + 1")
+
+
+def test_execute_checks_parameter_count():
+    name = prepared.register('test_param_count', "SELECT %s, %s")
+    with pytest.raises(ValueError):
+        prepared.execute(None, name, (1,))
+
+
+def test_execute_reprepares_after_session_reset(db_conn):
+    name = prepared.register('test_reprepare', "SELECT %s::int + 1")
+    cursor = db_conn.cursor()
+    prepared.execute(cursor, name, (1,))
+    assert cursor.fetchone() == (2,)
+    db_conn.rollback()
+
+    # 服务端丢失预编译语句（如连接池执行了 DISCARD ALL）
+    db_conn.autocommit = True
+    cursor.execute("DEALLOCATE ALL")
+    db_conn.autocommit = False
+
+    prepared.execute(cursor, name, (41,))
+    assert cursor.fetchone() == (42,)
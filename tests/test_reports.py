@@ -0,0 +1,113 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+import reports
+from reports import (
+    compute_liability, compute_revenue, compute_utilization, month_of, month_text, parse_month_range,
+)
+
+
+def _ints(*values):
+    return np.asarray(values, dtype=np.int64)
+
+
+def _floats(*values):
+    return np.asarray(values, dtype=np.float64)
+
+
+def test_month_index_round_trip():
+    index = month_of(date(2024, 12, 31))
+    assert index == 2024 * 12 + 11
+    assert month_text(index) == '2024-12'
+    assert month_text(index + 1) == '2025-01'
+
+
+def test_parse_month_range():
+    assert parse_month_range({'start': '2024-11-05', 'end': '2025-02-01'}) == (
+        month_of(date(2024, 11, 1)), month_of(date(2025, 2, 1))
+    )
+    first, last = parse_month_range({'end': '2025-03-10'}, default_months=12)
+    assert month_text(first) == '2024-04' and month_text(last) == '2025-03'
+    with pytest.raises(ValueError):
+        parse_month_range({'start': '2025-02-01', 'end': '2025-01-01'})
+
+
+def test_compute_revenue_fills_empty_months():
+    first, last = month_of(date(2024, 1, 1)), month_of(date(2024, 4, 1))
+    result = compute_revenue(
+        first, last,
+        _ints(first, first, first + 2), _floats(100, 50.555, 20),
+        _ints(first + 1), _floats(30),
+    )
+    assert result['months'] == ['2024-01', '2024-02', '2024-03', '2024-04']
+    assert result['revenue'] == [150.56, 0.0, 20.0, 0.0]
+    assert result['orders'] == [2, 0, 1, 0]
+    assert result['consumed'] == [0.0, 30.0, 0.0, 0.0]
+    assert result['items'] == [0, 1, 0, 0]
+    assert result['total_revenue'] == 170.56
+    assert result['total_consumed'] == 30.0
+
+
+def test_compute_revenue_without_rows():
+    month = month_of(date(2024, 1, 1))
+    empty = reports._column(None, np.int64)
+    result = compute_revenue(month, month, empty, empty.astype(np.float64), empty, empty.astype(np.float64))
+    assert result['revenue'] == [0.0] and result['orders'] == [0]
+
+
+def test_compute_utilization_by_service_and_package():
+    services = [
+        {'service_id': 1, 'desc': '洗护', 'package': 'A'},
+        {'service_id': 2, 'desc': '修剪', 'package': 'A'},
+        {'service_id': 3, 'desc': '体检', 'package': 'B'},
+        {'service_id': 4, 'desc': '未购买', 'package': 'B'},
+    ]
+    result = compute_utilization(_ints(1, 1, 2, 3), _ints(4, 2, 3, 1), _ints(4, 1, 0, 1), services)
+
+    by_service = {row['service_id']: row for row in result['services']}
+    assert by_service[1] == {
+        'purchases': 2, 'quantity': 6, 'completed': 5, 'remaining': 1, 'utilization': 83.3,
+        'service_id': 1, 'desc': '洗护', 'package': 'A',
+    }
+    assert by_service[4]['purchases'] == 0 and by_service[4]['utilization'] == 0
+    assert [row['service_id'] for row in result['services']][:2] == [1, 2]
+
+    by_package = {row['package']: row for row in result['packages']}
+    assert by_package['A']['quantity'] == 9 and by_package['A']['completed'] == 5
+    assert by_package['B']['purchases'] == 1
+    assert result['total_quantity'] == 10 and result['total_completed'] == 6
+
+
+def test_compute_utilization_unknown_service():
+    result = compute_utilization(_ints(9), _ints(1), _ints(0), [])
+    assert result['services'][0]['desc'] == '未命名服务'
+    assert result['services'][0]['service_id'] is None
+
+
+def test_compute_liability():
+    jan, feb = month_of(date(2024, 1, 1)), month_of(date(2024, 2, 1))
+    result = compute_liability(
+        _ints(10, 20, 30), _floats(100, 50, 80), _ints(jan, jan, feb),
+        _ints(20, 10, 20, 30), _floats(20, 30, 40, 10),
+        top=2,
+    )
+    assert result['open_orders'] == 3
+    assert result['prepaid'] == 230.0
+    assert result['consumed'] == 100.0
+    # 订单 20 消耗 60 > 50：余额按 0 计，计入超额订单
+    assert result['outstanding'] == 140.0
+    assert result['overdrawn_orders'] == 1
+    assert result['aging'] == [
+        {'month': '2024-01', 'orders': 2, 'outstanding': 70.0},
+        {'month': '2024-02', 'orders': 1, 'outstanding': 70.0},
+    ]
+    assert [row['order_id'] for row in result['top_orders']] == [10, 30]
+
+
+def test_compute_liability_without_orders():
+    empty = _ints()
+    result = compute_liability(empty, _floats(), empty, empty, _floats())
+    assert result['open_orders'] == 0
+    assert result['aging'] == [] and result['top_orders'] == []
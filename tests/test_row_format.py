@@ -0,0 +1,67 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+from flask import Flask
+
+from json_provider import init_json
+from row_format import (
+    as_float, as_price_text, as_text, as_time, fmt_time, map_rows, parse_fields,
+    record_mapper, record_type, row_mapper, select_fields, wants_flag, MINUTE_FMT,
+)
+
+
+def test_fmt_time():
+    assert fmt_time(datetime(2024, 3, 5, 8, 9, 10)) == '2024-03-05 08:09:10'
+    assert fmt_time(date(2024, 3, 5), MINUTE_FMT) == '2024-03-05 00:00'
+    assert fmt_time(None) == '-'
+    assert fmt_time('2024-03-05 08:09:10.123', MINUTE_FMT) == '2024-03-05 08:09'
+
+
+def test_row_mapper_converts_columns():
+    mapper = row_mapper(
+        ('id', 'order_id', None),
+        ('info', 'order_info', as_text('无')),
+        ('amount', 'amount', as_float()),
+        ('price', 'amount', as_price_text()),
+        ('time', 'created', as_time()),
+    )
+    rows = [
+        {'order_id': 1, 'order_info': '', 'amount': Decimal('199'), 'created': datetime(2024, 1, 2, 3, 4, 5)},
+        {'order_id': 2, 'order_info': 'x', 'amount': None, 'created': None},
+    ]
+    assert map_rows(rows, mapper) == [
+        {'id': 1, 'info': '无', 'amount': 199.0, 'price': '199.0', 'time': '2024-01-02 03:04:05'},
+        {'id': 2, 'info': 'x', 'amount': 0, 'price': '-', 'time': '-'},
+    ]
+
+
+def test_record_mapper_reads_plain_tuples():
+    Record = record_type('Record', ('order_id', 'amount'))
+    mapper = record_mapper(Record, ('id', 'order_id', None), ('amount', 'amount', as_float()))
+    assert mapper((7, Decimal('1.5'))) == {'id': 7, 'amount': 1.5}
+
+
+def test_parse_and_select_fields():
+    allowed = ('id', 'amount', 'status')
+    assert parse_fields({}, allowed) is None
+    fields = parse_fields({'fields': 'status, id,status'}, allowed)
+    assert fields == ('status', 'id')
+    assert select_fields([{'id': 1, 'amount': 2, 'status': 3}], fields) == [{'status': 3, 'id': 1}]
+    with pytest.raises(ValueError):
+        parse_fields({'fields': 'id,password'}, allowed)
+
+
+def test_wants_flag():
+    assert wants_flag({'summary': 'true'}, 'summary')
+    assert not wants_flag({'summary': '0'}, 'summary')
+    assert not wants_flag({}, 'summary')
+
+
+def test_json_provider_encodes_decimal_and_chinese():
+    app = Flask(__name__)
+    init_json(app)
+    with app.app_context():
+        body = app.json.response({'amount': Decimal('9.5'), 'msg': '成功'}).get_data(as_text=True)
+    assert app.json.loads(body) == {'amount': 9.5, 'msg': '成功'}
+    assert '成功' in body
@@ -0,0 +1,148 @@
+import itertools
+import threading
+import types
+
+import pytest
+
+import throttle
+from throttle import MemoryBucketStore, RedisBucketStore
+from redis_support import get_redis
+
+pytest.importorskip('redis')
+
+from scripts.resp_standin import Server  # noqa: E402
+
+_db = itertools.count()
+
+
+class FakeTime:
+    def __init__(self, now=1000.0):
+        self.now = now
+        self.on_time = None
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        if self.on_time is not None:
+            hook, self.on_time = self.on_time, None
+            hook()
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeTime()
+    monkeypatch.setattr(throttle, 'time', types.SimpleNamespace(monotonic=fake.monotonic, time=fake.time))
+    return fake
+
+
+@pytest.fixture
+def resp_server():
+    server = Server(('127.0.0.1', 0))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.server_address
+    server.shutdown()
+    server.server_close()
+
+
+def _client(address):
+    host, port = address
+    # 同一个 URL 的客户端会被复用，用不同的库号得到独立的连接（替身服务各库共享数据）
+    return get_redis(f"redis://{host}:{port}/{next(_db)}")
+
+
+def test_memory_bucket_burst_and_refill(clock):
+    store = MemoryBucketStore()
+    assert store.take('ip:1', capacity=2, rate=1) == (True, 0)
+    assert store.take('ip:1', capacity=2, rate=1) == (True, 0)
+    allowed, wait = store.take('ip:1', capacity=2, rate=1)
+    assert not allowed and wait == pytest.approx(1)
+    # 其他键互不影响
+    assert store.take('ip:2', capacity=2, rate=1)[0]
+    clock.now += 1
+    assert store.take('ip:1', capacity=2, rate=1)[0]
+
+
+def test_memory_bucket_prunes_full_buckets(clock, monkeypatch):
+    monkeypatch.setattr(MemoryBucketStore, 'MAX_KEYS', 2)
+    store = MemoryBucketStore()
+    store.take('a', capacity=1, rate=1)
+    store.take('b', capacity=1, rate=1)
+    clock.now += 5
+    store.take('c', capacity=1, rate=1)
+    assert set(store._buckets) == {'c'}
+
+
+def test_memory_prune_keeps_slow_user_buckets(clock, monkeypatch):
+    monkeypatch.setattr(MemoryBucketStore, 'MAX_KEYS', 3)
+    store = MemoryBucketStore()
+    # 用户名桶：容量 1，每 300 秒补充 1 个
+    assert store.take('user:admin', capacity=1, rate=1 / 300)[0]
+    assert not store.take('user:admin', capacity=1, rate=1 / 300)[0]
+
+    # 轮换 IP 触发清理：IP 桶 60 秒回满，用户名桶还要约 240 秒
+    clock.now += 60
+    for index in range(10):
+        store.take(f'ip:{index}', capacity=10, rate=10 / 60)
+    assert 'user:admin' in store._buckets
+    allowed, wait = store.take('user:admin', capacity=1, rate=1 / 300)
+    assert not allowed and wait == pytest.approx(240)
+
+
+def test_memory_prune_is_amortized(clock, monkeypatch):
+    monkeypatch.setattr(MemoryBucketStore, 'MAX_KEYS', 4)
+    store = MemoryBucketStore()
+    calls = []
+    prune = store._prune
+    monkeypatch.setattr(store, '_prune', lambda now: (calls.append(now), prune(now)))
+    # 桶都未回满：清理不掉，之后数量翻倍前不再清理
+    for index in range(8):
+        store.take(f'user:{index}', capacity=1, rate=1 / 300)
+    assert len(calls) == 1
+    assert store._prune_at == 10
+
+
+def test_redis_bucket_shares_state(clock, resp_server):
+    first = RedisBucketStore(_client(resp_server), 'test:')
+    second = RedisBucketStore(_client(resp_server), 'test:')
+    assert first.take('user:a', capacity=2, rate=1)[0]
+    assert second.take('user:a', capacity=2, rate=1)[0]
+    allowed, wait = first.take('user:a', capacity=2, rate=1)
+    assert not allowed and wait == pytest.approx(1)
+    clock.now += 1
+    assert second.take('user:a', capacity=2, rate=1)[0]
+
+
+def test_redis_bucket_retries_on_watch_conflict(clock, resp_server, monkeypatch):
+    client = _client(resp_server)
+    other = _client(resp_server)
+    store = RedisBucketStore(client, 'test:')
+    conflicts = []
+    monkeypatch.setattr(throttle.metrics, 'incr', lambda name, *args: conflicts.append(name))
+
+    # WATCH 之后、EXEC 之前另一个客户端写入同一个键：本次事务失败并重试
+    clock.on_time = lambda: other.set('test:user:b', f"0.0000:{clock.now:.3f}")
+    allowed, wait = store.take('user:b', capacity=3, rate=1)
+    assert conflicts == ['throttle.redis_conflict']
+    # 重试时读到另一个客户端写入的空桶
+    assert not allowed and wait == pytest.approx(1)
+    assert client.get('test:user:b').decode().startswith('0.0000:')
+
+
+def test_redis_bucket_gives_up_after_retries(clock, resp_server, monkeypatch):
+    client = _client(resp_server)
+    other = _client(resp_server)
+    store = RedisBucketStore(client, 'test:')
+    conflicts = []
+    monkeypatch.setattr(throttle.metrics, 'incr', lambda name, *args: conflicts.append(name))
+
+    def conflict():
+        other.set('test:user:c', f"3.0000:{clock.now:.3f}")
+        clock.on_time = conflict
+
+    clock.on_time = conflict
+    allowed, wait = store.take('user:c', capacity=3, rate=0.5)
+    assert not allowed and wait == pytest.approx(2)
+    assert conflicts == ['throttle.redis_conflict'] * RedisBucketStore.MAX_RETRIES
@@ -0,0 +1,150 @@
+"""登录限流（令牌桶）
+
+每个 IP、每个用户名各一个令牌桶：桶容量为允许的突发次数，按固定速率补充。
+登录请求在访问数据库之前先取令牌，取不到时直接拒绝，撞库脚本不会占用连接池。
+
+令牌桶状态默认保存在进程内；配置 REDIS_URL 后保存在 Redis 中，多个 gunicorn
+worker / 节点共享同一额度。Redis 不可用时退回进程内桶，不影响正常登录。
+"""
+import threading
+import time
+
+from metrics import metrics
+from redis_support import get_redis, redis_errors
+
+try:
+    from redis import WatchError
+except ImportError:  # pragma: no cover - 未安装 redis 时不会用到
+    WatchError = None
+
+
+class MemoryBucketStore:
+    """进程内令牌桶"""
+
+    # 超过该数量时清理已回满的桶，防止随机用户名撑大内存
+    MAX_KEYS = 10000
+
+    def __init__(self):
+        # key -> (剩余令牌, 更新时间, 回满时间)；各桶按自己的容量与速率记录回满时间，
+        # 清理时不会误删补充较慢的桶（如用户名桶）
+        self._buckets = {}
+        self._prune_at = self.MAX_KEYS
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate, cost=1):
+        """取 cost 个令牌，返回 (是否允许, 需等待的秒数)"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated, _ = self._buckets.get(key, (capacity, now, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+            if len(self._buckets) > self._prune_at:
+                self._prune(now)
+        return allowed, 0 if allowed else (cost - tokens) / rate
+
+    def _prune(self, now):
+        self._buckets = {
+            key: bucket for key, bucket in self._buckets.items()
+            if bucket[2] > now
+        }
+        # 清理后仍有大量未回满的桶时，等数量翻倍再清理，避免每次调用都遍历
+        self._prune_at = max(self.MAX_KEYS, len(self._buckets) * 2)
+
+
+class RedisBucketStore:
+    """Redis 中的令牌桶，值为 "剩余令牌:更新时间"，WATCH/MULTI 乐观并发更新"""
+
+    MAX_RETRIES = 5
+
+    def __init__(self, client, prefix='throttle:'):
+        self._client = client
+        self._prefix = prefix
+
+    def take(self, key, capacity, rate, cost=1):
+        key = self._prefix + key
+        # 桶回满后的状态等同于不存在，过期时间取回满所需时间
+        ttl_ms = int(capacity / rate * 1000) + 1000
+        with self._client.pipeline() as pipe:
+            for _ in range(self.MAX_RETRIES):
+                try:
+                    pipe.watch(key)
+                    now = time.time()
+                    raw = pipe.get(key)
+                    if raw:
+                        tokens, updated = (float(part) for part in raw.decode().split(':'))
+                    else:
+                        tokens, updated = capacity, now
+                    tokens = min(capacity, tokens + max(now - updated, 0) * rate)
+                    allowed = tokens >= cost
+                    if allowed:
+                        tokens -= cost
+                    pipe.multi()
+                    pipe.set(key, f"{tokens:.4f}:{now:.3f}", px=ttl_ms)
+                    pipe.execute()
+                    return allowed, 0 if allowed else (cost - tokens) / rate
+                except WatchError:
+                    metrics.incr('throttle.redis_conflict')
+                    continue
+        # 同一个键竞争激烈，本身就说明请求过多
+        return False, 1 / rate
+
+
+class LoginThrottle:
+    """按 IP 与用户名限制登录尝试次数"""
+
+    def __init__(self, ip_burst=10, ip_per_minute=10, user_burst=5, user_per_minute=1):
+        self.ip_burst = ip_burst
+        self.ip_rate = ip_per_minute / 60
+        self.user_burst = user_burst
+        self.user_rate = user_per_minute / 60
+        self._memory = MemoryBucketStore()
+        self._shared = None
+
+    def configure(self, ip_burst, ip_per_minute, user_burst, user_per_minute, redis_url=None):
+        self.ip_burst = ip_burst
+        self.ip_rate = ip_per_minute / 60
+        self.user_burst = user_burst
+        self.user_rate = user_per_minute / 60
+        client = get_redis(redis_url)
+        self._shared = RedisBucketStore(client, 'throttle:login:') if client is not None else None
+
+    def _take(self, key, capacity, rate):
+        if self._shared is not None:
+            try:
+                return self._shared.take(key, capacity, rate)
+            except redis_errors() as e:
+                metrics.incr('throttle.backend_error')
+                print(f"⚠️ Throttle backend unavailable, using local buckets: {e}")
+        return self._memory.take(key, capacity, rate)
+
+    def check(self, ip, username):
+        """检查并消耗令牌；被限流时返回需等待的秒数，否则返回 None"""
+        allowed, wait = self._take(f"ip:{ip}", self.ip_burst, self.ip_rate)
+        if not allowed:
+            metrics.incr('throttle.login.ip')
+            return wait
+
+        allowed, wait = self._take(f"user:{username.lower()}", self.user_burst, self.user_rate)
+        if not allowed:
+            metrics.incr('throttle.login.user')
+            return wait
+
+        metrics.incr('throttle.login.allowed')
+        return None
+
+
+login_throttle = LoginThrottle()
+
+
+def init_throttle(app):
+    """从配置读取登录限流参数，配置了 REDIS_URL 时使用共享令牌桶"""
+    login_throttle.configure(
+        app.config.setdefault('LOGIN_IP_BURST', 10),
+        app.config.setdefault('LOGIN_IP_PER_MINUTE', 10),
+        app.config.setdefault('LOGIN_USER_BURST', 5),
+        app.config.setdefault('LOGIN_USER_PER_MINUTE', 1),
+        app.config.get('REDIS_URL'),
+    )